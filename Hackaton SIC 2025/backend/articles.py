@@ -0,0 +1,117 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Sufijo del número: "12-A", "12A", "12 bis", "12-ter". Una letra suelta tras un espacio no cuenta:
+# "artículos 12 a 15" es un rango.
+_SUFFIX = r"(?:\s*-?\s*(?:bis|ter|qu[aá]ter|quinquies|sexies)|\s*-\s*[a-z]|[a-z])"
+# Romanos sin D ni M: "di", "mi" o "mil" no son números de artículo
+_NUMBER = rf"(?:\d+(?:{_SUFFIX})?|[ivxlc]+)\b"
+_SEPARATOR = r"\s*(?:,|-|\b(?:y|e|o|u|a|al|hasta)\b)\s*"
+
+# "artículo 45", "art. 12-A", "arts. 25 y 26", "artículos 10, 11 y 12", "artículos 10 al 12", "artículo IV"
+ARTICLE_REF = re.compile(
+    r"\bart(?:[íi]culos?|s?\.)\s*(?:n(?:[º°o]|úm\.?|um\.?)\s*)?"
+    rf"(?P<numbers>{_NUMBER}(?:{_SEPARATOR}{_NUMBER})*)",
+    re.IGNORECASE,
+)
+ARTICLE_NUMBER = re.compile(
+    r"\b(?:(?P<digits>\d+)(?:\s*-?\s*(?P<word>bis|ter|qu[aá]ter|quinquies|sexies)|\s*-\s*(?P<dashed>[a-z])|(?P<letter>[a-z]))?\b"
+    r"|(?P<roman>[ivxlc]+)\b)",
+    re.IGNORECASE,
+)
+# Entre dos números, "a", "al", "hasta" o "-" forman un rango
+RANGE_SEPARATOR = re.compile(r"^\s*(?:-|a|al|hasta)\s*$", re.IGNORECASE)
+# Un rango más largo no se expande: solo se toman sus extremos
+MAX_RANGE_ARTICLES = 20
+
+_ROMAN_VALUES = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+_ROMAN_DIGITS = ((100, "C"), (90, "XC"), (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I"))
+
+
+def roman_to_int(text: str) -> Optional[int]:
+    """"IV" -> 4; None si no es un romano bien formado (hasta 399)."""
+    text = text.upper()
+    if not text or any(c not in _ROMAN_VALUES for c in text):
+        return None
+    value = 0
+    for pos, char in enumerate(text):
+        current = _ROMAN_VALUES[char]
+        following = _ROMAN_VALUES[text[pos + 1]] if pos + 1 < len(text) else 0
+        value += -current if current < following else current
+    # Se rechaza lo que no se escribiría así ("IIII", "VX", "IC")
+    rebuilt, rest = "", value
+    for amount, digits in _ROMAN_DIGITS:
+        count, rest = divmod(rest, amount)
+        rebuilt += digits * count
+    return value if value > 0 and rebuilt == text else None
+
+
+def article_key(number: object) -> str:
+    """Forma canónica del número de artículo (también la de articles.json): "12-a" -> "12A"."""
+    text = str(number)
+    return canonical_number(text) or text.replace("-", "").replace(" ", "").upper()
+
+
+def _canonical(match: "re.Match[str]") -> Optional[str]:
+    if match.group("roman"):
+        value = roman_to_int(match.group("roman"))
+        return str(value) if value else None
+    suffix = match.group("word") or match.group("dashed") or match.group("letter") or ""
+    return f"{int(match.group('digits'))}{suffix.upper().replace('Á', 'A')}"
+
+
+def canonical_number(text: str) -> Optional[str]:
+    """"045" -> "45", "12-a" -> "12A", "12 bis" -> "12BIS", "IV" -> "4"; None si ``text`` no es un
+    número de artículo."""
+    match = ARTICLE_NUMBER.fullmatch(text.strip())
+    return _canonical(match) if match else None
+
+
+def parse_article_refs(question: str) -> List[str]:
+    """Números de artículo citados en la pregunta, en orden y sin repetir; los rangos se expanden."""
+    refs: Dict[str, None] = {}
+    for match in ARTICLE_REF.finditer(question):
+        numbers = match.group("numbers")
+        previous: Optional[str] = None
+        previous_end = 0
+        for number in ARTICLE_NUMBER.finditer(numbers):
+            current = _canonical(number)
+            if current is None:
+                previous = None
+                continue
+            if previous is not None and RANGE_SEPARATOR.match(numbers[previous_end : number.start()]):
+                for value in _expand_range(previous, current):
+                    refs[value] = None
+            refs[current] = None
+            previous, previous_end = current, number.end()
+    return list(refs)
+
+
+def _expand_range(start: str, end: str) -> List[str]:
+    """Números entre ``start`` y ``end`` (sin incluirlos); nada si alguno lleva sufijo o es muy largo."""
+    if not (start.isdigit() and end.isdigit()):
+        return []
+    first, last = int(start), int(end)
+    if not first < last <= first + MAX_RANGE_ARTICLES:
+        return []
+    return [str(value) for value in range(first + 1, last)]
+
+
+def build_article_map(docs: Sequence[dict]) -> Dict[str, List[int]]:
+    articles: Dict[str, List[int]] = {}
+    for row, doc in enumerate(docs):
+        articles.setdefault(article_key(doc.get("articulo", "")), []).append(row)
+    return articles
+
+
+def load_article_map(dir_path: Path, docs: Sequence[dict]) -> Dict[str, List[int]]:
+    """articles.json precalculado por la construcción; si falta o no cuadra con docs, se recorre docs."""
+    path = dir_path / "articles.json"
+    if path.exists():
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("count") == len(docs):
+            return data["articles"]
+        print(f"[WARN] {dir_path.name}: articles.json no coincide con docs; se recalcula.")
+    return build_article_map(docs)
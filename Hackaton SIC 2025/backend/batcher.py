@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from inference import PoolSaturated
+
+EncodeFn = Callable[[Sequence[str]], np.ndarray]
+
+
+class EmbeddingBatcher:
+    """Agrupa las preguntas que llegan casi a la vez y las codifica en un solo batch.
+
+    Cada llamada a ``encode`` encola su pregunta y espera su propio vector. Un hilo de fondo
+    junta hasta ``max_batch_size`` preguntas o espera como máximo ``max_wait_ms`` desde la
+    primera, y ejecuta una sola pasada del modelo para todo el grupo.
+
+    Como el pool de inferencia, admite como máximo ``max_pending`` preguntas entre encoladas y en
+    codificación: con más, ``submit`` lanza ``PoolSaturated`` (503 con Retry-After) en vez de dejar
+    crecer la cola hasta que las peticiones acaben en timeout.
+    """
+
+    def __init__(self, encode_fn: EncodeFn, max_batch_size: int = 32, max_wait_ms: float = 5.0, max_pending: int = 0):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_pending = max_pending or 4 * self.max_batch_size
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._sizes: Dict[int, int] = {}
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, text: str) -> np.ndarray:
+        """Devuelve el vector (1, dim) de ``text`` codificado junto con otras peticiones concurrentes."""
+        return self.submit(text).result()
+
+    def submit(self, text: str) -> Future:
+        """Encola ``text`` sin bloquear; el futuro se resuelve con su vector (1, dim).
+
+        Desde el event loop se espera con ``asyncio.wrap_future``: así las peticiones en espera no
+        ocupan hilos y el batch puede llenarse. Un futuro cancelado antes de su turno no se codifica.
+        Con ``max_pending`` preguntas pendientes lanza ``PoolSaturated``.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PoolSaturated(f"{self._pending} preguntas pendientes de codificar")
+            self._pending += 1
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _release(self, count: int) -> None:
+        with self._lock:
+            self._pending -= count
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            collected = self._collect()
+            batch = [(text, future) for text, future in collected if future.set_running_or_notify_cancel()]
+            self._release(len(collected) - len(batch))  # cancelados
+            if not batch:
+                continue
+            try:
+                vectors = np.asarray(self._encode_fn([text for text, _ in batch]), dtype="float32")
+            except Exception as exc:
+                self._release(len(batch))
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self._record(len(batch))
+            # Antes de resolver: quien recibe su vector ya no cuenta como pendiente
+            self._release(len(batch))
+            for row, (_, future) in enumerate(batch):
+                future.set_result(vectors[row : row + 1])
+
+    def _record(self, size: int) -> None:
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._max_seen = max(self._max_seen, size)
+            self._sizes[size] = self._sizes.get(size, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "rejected": self._rejected,
+                "batches": self._batches,
+                "requests": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "max_batch_seen": self._max_seen,
+                "batch_size_histogram": dict(sorted(self._sizes.items())),
+            }
@@ -0,0 +1,59 @@
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin tildes ("Adopción" -> "adopcion"); la ñ se conserva."""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c) or c == "\u0303")
+    return unicodedata.normalize("NFC", text)
+
+
+def load_keywords(path: Path) -> Dict[str, Dict[str, float]]:
+    """data/code_keywords.json: código -> {palabra clave: peso}. Las claves que empiezan por "_" son notas."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {code_id: keywords for code_id, keywords in data.items() if not code_id.startswith("_")}
+
+
+class CodeDetector:
+    """Detecta los códigos de una pregunta con una sola expresión regular compilada.
+
+    Todas las palabras clave van en una alternancia ``\\b(kw1|kw2|...)\\w*`` ordenada de la más
+    larga a la más corta, así que una pasada por la pregunta encuentra cada aparición y la palabra
+    clave más específica ("recursos minerales" antes que "recurso"). Cada código suma los pesos
+    de sus palabras encontradas (fila de ``weights`` por palabra clave, columna por código).
+    """
+
+    def __init__(self, keywords: Mapping[str, Mapping[str, float]]):
+        self.codes: List[str] = list(keywords)
+        terms = sorted({fold(k) for kws in keywords.values() for k in kws}, key=lambda k: (-len(k), k))
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        self.weights = np.zeros((len(terms), len(self.codes)), dtype=np.float32)
+        for col, code_id in enumerate(self.codes):
+            for keyword, weight in keywords[code_id].items():
+                self.weights[self._term_ids[fold(keyword)], col] = weight
+        alternation = "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in terms)
+        self._pattern = re.compile(rf"\b({alternation})\w*") if terms else None
+
+    def scores(self, question: str) -> np.ndarray:
+        """Peso acumulado de cada código (en el orden de ``codes``)."""
+        if self._pattern is None:
+            return np.zeros(len(self.codes), dtype=np.float32)
+        # " ".join(split()) deja las frases con espacios repetidos ("patria   potestad") como en la tabla
+        hits = [self._term_ids[" ".join(m.group(1).split())] for m in self._pattern.finditer(fold(question))]
+        return self.weights[hits].sum(axis=0) if hits else np.zeros(len(self.codes), dtype=np.float32)
+
+    def rank(self, question: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """Hasta ``limit`` códigos con algún acierto, de mayor a menor peso (empates: orden del fichero)."""
+        scores = self.scores(question)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.codes[i], float(scores[i])) for i in order if scores[i] > 0]
+
+    def detect(self, question: str) -> Optional[str]:
+        ranked = self.rank(question, limit=1)
+        return ranked[0][0] if ranked else None
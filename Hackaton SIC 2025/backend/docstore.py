@@ -0,0 +1,35 @@
+import json
+import mmap
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+
+class DocStore(Sequence):
+    """Artículos de un código leídos bajo demanda desde ``docs.jsonl`` mapeado en memoria.
+
+    ``docs.offsets.npy`` guarda el offset en bytes de cada línea, así que acceder a un
+    artículo es O(1) y solo se decodifica el JSON de los documentos que se devuelven.
+    Las páginas del fichero las comparte el caché del SO entre todos los workers.
+    """
+
+    def __init__(self, dir_path: Path):
+        self._offsets = np.load(dir_path / "docs.offsets.npy", mmap_mode="r")
+        with open(dir_path / "docs.jsonl", "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if len(self._offsets) > 1 else b""
+
+    @staticmethod
+    def available(dir_path: Path) -> bool:
+        return (dir_path / "docs.jsonl").exists() and (dir_path / "docs.offsets.npy").exists()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._blob[start:end])
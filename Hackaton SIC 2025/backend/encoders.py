@@ -0,0 +1,94 @@
+"""Backends intercambiables para el encoder de embeddings (mismo modelo, distinto runtime).
+
+- ``torch``: ``SentenceTransformer`` tal cual (referencia).
+- ``int8``:  el mismo modelo con ``torch.quantization.quantize_dynamic`` sobre las capas Linear.
+- ``onnx``:  modelo exportado con ``exportar_onnx.py`` (fp32 o int8) ejecutado con onnxruntime.
+
+Todos exponen ``encode(texts, batch_size=32, show_progress_bar=False) -> np.ndarray`` (float32).
+"""
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+ENCODER_BACKENDS = ("torch", "int8", "onnx")
+
+
+def cache_key(model_name: str, backend: str) -> str:
+    """Clave para cachés de embeddings: los vectores int8/onnx no se mezclan con los de torch."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+class OnnxEncoder:
+    """Tokenizer de HF + sesión de onnxruntime + mean pooling (+ normalización si el modelo la tenía).
+
+    ``model_dir`` es lo que escribe ``exportar_onnx.py``: ``model.onnx`` (o ``model_int8.onnx``),
+    el tokenizer y ``encoder.json`` con ``max_seq_length`` y ``normalize``.
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = True, threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:  # pragma: no cover - dependencia opcional
+            raise RuntimeError("El backend 'onnx' necesita onnxruntime (pip install onnxruntime)") from exc
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        config = json.loads((model_dir / "encoder.json").read_text(encoding="utf-8"))
+        self.max_seq_length = int(config["max_seq_length"])
+        self.normalize = bool(config["normalize"])
+        self.model_name = config["model"]
+        onnx_file = model_dir / ("model_int8.onnx" if quantized and (model_dir / "model_int8.onnx").exists() else "model.onnx")
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(onnx_file), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.onnx_file = onnx_file.name
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, show_progress_bar: bool = False, **_: object) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        out = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                list(texts[start : start + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            feeds = {name: batch[name].astype(np.int64) for name in batch if name in self._inputs}
+            tokens = self.session.run(None, feeds)[0]
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+def load_encoder(model_name: str, backend: str = "torch", onnx_dir: Optional[Path] = None):
+    """Devuelve un encoder con ``encode`` compatible con ``SentenceTransformer.encode``."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Backend de encoder desconocido: {backend} (opciones: {', '.join(ENCODER_BACKENDS)})")
+    if backend == "onnx":
+        if onnx_dir is None:
+            raise ValueError("El backend 'onnx' necesita el directorio del modelo exportado")
+        encoder = OnnxEncoder(onnx_dir)
+        if encoder.model_name != model_name:
+            raise ValueError(f"{onnx_dir} se exportó desde {encoder.model_name}, no {model_name}")
+        return encoder
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "int8":
+        import torch
+
+        # Pesos de las capas Linear en int8, activaciones cuantizadas al vuelo (solo CPU)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
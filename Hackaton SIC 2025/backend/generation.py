@@ -0,0 +1,36 @@
+from typing import Iterator, Sequence
+
+
+def build_prompt(question: str, evidences: Sequence[str], strict: bool) -> str:
+    """Prompt con las evidencias recuperadas como único contexto (mismas reglas que chatbot_legal_gemini.py)."""
+    context = "\n".join(evidences)
+    rule = (
+        "Responde solo con lo que dicen estos artículos; si no alcanzan, dilo."
+        if strict
+        else "Explica en lenguaje claro a partir de estos artículos, sin inventar otros."
+    )
+    return (
+        "Eres un asistente legal sobre los códigos de Panamá.\n"
+        f"{rule} Cita siempre el código y el número de artículo.\n\n"
+        f"ARTÍCULOS:\n{context}\n\nCONSULTA: {question}"
+    )
+
+
+class GeminiGenerator:
+    """Genera la respuesta con Gemini a partir de las evidencias, fragmento a fragmento."""
+
+    def __init__(self, model_name: str, api_key: str):
+        try:
+            import google.generativeai as genai
+        except ImportError as exc:  # pragma: no cover - dependencia opcional
+            raise RuntimeError("La capa LLM 'gemini' necesita google-generativeai") from exc
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    def stream(self, question: str, evidences: Sequence[str], strict: bool) -> Iterator[str]:
+        """Fragmentos de texto según llegan de la API (bloquea: llamar desde un hilo)."""
+        for chunk in self._model.generate_content(build_prompt(question, evidences, strict), stream=True):
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
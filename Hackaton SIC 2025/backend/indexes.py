@@ -0,0 +1,473 @@
+"""Carga de Dataset/FAISS/<código> y búsqueda vectorial/BM25 sobre los índices cargados.
+
+Lo comparten el backend (main.py, en local) y los procesos shard (shard_worker.py), que no
+necesitan la app, el modelo ni el pool de inferencia para servir sus códigos.
+"""
+import json
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from articles import load_article_map
+from docstore import DocStore
+from lexical import LexicalIndex
+from metrics import Histogram, timed
+from router import load_centroids
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# LEGALBOT_FAISS_ROOT: otra base construida (p. ej. con otro FAISS_INDEX_TYPE) sin tocar Dataset/FAISS
+FAISS_ROOT = Path(os.getenv("LEGALBOT_FAISS_ROOT", str(ROOT_DIR / "Dataset" / "FAISS")))
+GLOBAL_INDEX_DIR = FAISS_ROOT / "_global"  # generado por compactar_base.py
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Runtime del encoder de preguntas (ver encoders.py): "torch", "int8" u "onnx" (exportar_onnx.py).
+ENCODER_BACKEND = os.getenv("LEGALBOT_ENCODER_BACKEND", "torch")
+
+# Versión máxima de manifest.json que entiende este backend (ver indices_faiss.FORMATO_VERSION).
+INDEX_FORMAT_VERSION = 1
+# Métrica exigida a los índices ("l2" o "ip"); vacío = la que use la mayoría de los índices.
+INDEX_METRIC = os.getenv("LEGALBOT_INDEX_METRIC", "")
+
+# Abrir los índices con mmap para que los workers compartan páginas vía caché del SO.
+MMAP_INDEXES = os.getenv("LEGALBOT_MMAP_INDEXES", "1") == "1"
+
+# Índices comprimidos (sq8 / pq / ivf_pq): se piden RESCORE_FACTOR × candidatos y se re-puntúan
+# con la distancia exacta leyendo solo esas filas de vectors.npy (mmap).
+COMPRESSED_INDEX_TYPES = ("sq8", "pq", "ivf_pq")
+RESCORE_FACTOR = int(os.getenv("LEGALBOT_RESCORE_FACTOR", "8"))
+
+# Con índices troceados (chunks.npy) se piden más vecinos para quedarse con top_k artículos distintos.
+CHUNK_FETCH_FACTOR = int(os.getenv("LEGALBOT_CHUNK_FETCH_FACTOR", "4"))
+
+# build.json lo escriben los scripts de construcción al terminar; si existe, es lo único que se vigila.
+# WATCHED_FILES solo para bases anteriores a la marca.
+BUILD_MARKER = "build.json"
+WATCHED_FILES = ("manifest.json", "index.faiss", "docs.json", "docs.jsonl", "codes.json")
+
+# Lo registra main.py en /metrics; en un shard solo se acumula.
+search_seconds = Histogram(
+    "legalbot_search_seconds", "Duración de la búsqueda vectorial por índice (_global, código o shards).", ("index",)
+)
+
+
+@dataclass
+class LoadedIndex:
+    code_id: str
+    code_name: str
+    index: faiss.Index
+    docs: Sequence[dict]  # lista en memoria o DocStore mapeado
+    metric: str = "l2"  # "l2" (menor = mejor) o "ip" (mayor = mejor)
+    normalized: bool = False  # si la consulta debe normalizarse antes de buscar
+    parents: Optional[np.ndarray] = None  # fila del índice -> artículo en ``docs`` (solo si hay trozos)
+    lexical: Optional[LexicalIndex] = None  # BM25 sobre ``docs`` (una fila por artículo)
+    articles: Dict[str, List[int]] = field(default_factory=dict)  # número canónico -> filas de ``docs``
+    centroids: Optional[np.ndarray] = None  # centroides k-means (norma 1) para el enrutado
+    index_type: str = "flat"
+    vectors: Optional[np.ndarray] = None  # float32 exactos (mmap) para re-puntuar índices comprimidos
+    build_id: Optional[str] = None  # del manifest: cambia con cada construcción del código
+
+    @property
+    def compressed(self) -> bool:
+        return self.index_type in COMPRESSED_INDEX_TYPES
+
+    @property
+    def row_count(self) -> int:
+        return len(self.parents) if self.parents is not None else len(self.docs)
+
+    def doc_row(self, row: int) -> int:
+        return int(self.parents[row]) if self.parents is not None else int(row)
+
+
+@dataclass
+class GlobalIndex:
+    """Índice único con todos los artículos de Dataset/FAISS/* para la búsqueda global.
+
+    La fila ``i`` del índice corresponde a ``docs`` de ``codes[code_ids[i]]`` en la posición ``row_ids[i]``.
+    """
+
+    index: faiss.Index
+    codes: List[LoadedIndex]
+    code_ids: np.ndarray  # int16, posición en ``codes``
+    row_ids: np.ndarray  # int32, posición dentro de ``LoadedIndex.docs``
+    metric: str = "l2"
+    normalized: bool = False
+    chunked: bool = False  # varias filas pueden apuntar al mismo artículo
+
+    def resolve(self, row: int) -> Tuple[dict, LoadedIndex]:
+        item = self.codes[self.code_ids[row]]
+        return item.docs[self.row_ids[row]], item
+
+    def article_key(self, row: int) -> Tuple[str, int]:
+        return self.codes[self.code_ids[row]].code_id, int(self.row_ids[row])
+
+
+def read_faiss_index(path: Path) -> faiss.Index:
+    if MMAP_INDEXES:
+        # IO_FLAG_MMAP_IFC evita copiar los vectores de índices planos (FAISS >= 1.11).
+        flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(str(path), flag)
+        except RuntimeError as exc:
+            print(f"[WARN] mmap no disponible para {path.parent.name}, se lee en memoria: {exc}")
+    return faiss.read_index(str(path))
+
+
+def load_parents(dir_path: Path, doc_count: int) -> Optional[np.ndarray]:
+    """chunks.npy: artículo padre de cada fila cuando los artículos largos se indexaron en trozos."""
+    path = dir_path / "chunks.npy"
+    if not path.exists():
+        return None
+    parents = np.load(path, mmap_mode="r")
+    if len(parents) and int(parents.max()) >= doc_count:
+        raise ValueError("chunks.npy apunta a artículos que no existen en docs")
+    return parents
+
+
+def load_rescore_vectors(dir_path: Path, index: faiss.Index) -> Optional[np.ndarray]:
+    """vectors.npy con mmap: solo se leen del disco las filas de los candidatos a re-puntuar."""
+    path = dir_path / "vectors.npy"
+    if not path.exists():
+        print(f"[WARN] {dir_path.name}: índice comprimido sin vectors.npy; se usan las distancias aproximadas.")
+        return None
+    vectors = np.load(path, mmap_mode="r")
+    if vectors.shape != (index.ntotal, index.d) or vectors.dtype != np.float32:
+        print(f"[WARN] {dir_path.name}: vectors.npy {vectors.shape} no coincide con el índice; sin re-scoring.")
+        return None
+    return vectors
+
+
+def load_lexical(dir_path: Path, doc_count: int) -> Optional[LexicalIndex]:
+    """bm25.npz del código; sin él (o desfasado respecto a docs) la búsqueda queda solo vectorial."""
+    if not LexicalIndex.available(dir_path):
+        return None
+    try:
+        lexical = LexicalIndex(dir_path / LexicalIndex.FILENAME)
+    except Exception as exc:
+        print(f"[WARN] {dir_path.name}: bm25.npz ilegible ({exc}); solo búsqueda vectorial.")
+        return None
+    if lexical.n_docs != doc_count:
+        print(f"[WARN] {dir_path.name}: bm25.npz tiene {lexical.n_docs} artículos y docs {doc_count}; se ignora.")
+        return None
+    return lexical
+
+
+def load_docs(dir_path: Path) -> Sequence[dict]:
+    if DocStore.available(dir_path):
+        return DocStore(dir_path)
+    return json.loads((dir_path / "docs.json").read_text(encoding="utf-8"))
+
+
+def load_manifest(dir_path: Path, index: faiss.Index, row_count: int) -> dict:
+    """Lee manifest.json y comprueba que describe este índice; lanza ValueError si no es compatible."""
+    manifest_path = dir_path / "manifest.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    else:
+        # Índices anteriores al manifest: IndexFlatL2 sobre vectores sin normalizar.
+        print(f"[WARN] {dir_path.name} no tiene manifest.json; se asume L2 sin normalizar.")
+        manifest = {
+            "format_version": 0,
+            "model": EMBEDDING_MODEL,
+            "dim": index.d,
+            "metric": "l2",
+            "normalized": False,
+            "count": index.ntotal,
+        }
+
+    if manifest.get("format_version", 0) > INDEX_FORMAT_VERSION:
+        raise ValueError(f"formato {manifest['format_version']} no soportado (máximo {INDEX_FORMAT_VERSION})")
+    if manifest.get("model") != EMBEDDING_MODEL:
+        raise ValueError(f"construido con {manifest.get('model')}, el backend usa {EMBEDDING_MODEL}")
+    if manifest.get("encoder", "torch") != ENCODER_BACKEND:
+        # Mismo modelo con otro runtime: los vectores son casi iguales (ver test_paridad_encoder.py).
+        print(f"[WARN] {dir_path.name} se construyó con el encoder {manifest.get('encoder', 'torch')}, el backend usa {ENCODER_BACKEND}.")
+    if manifest.get("metric") not in ("l2", "ip"):
+        raise ValueError(f"métrica desconocida: {manifest.get('metric')}")
+    if manifest.get("dim") != index.d:
+        raise ValueError(f"dimensión {index.d} distinta de la del manifest ({manifest.get('dim')})")
+    if not manifest.get("count") == index.ntotal == row_count:
+        raise ValueError(
+            f"el manifest declara {manifest.get('count')} filas, el índice tiene {index.ntotal} y docs/trozos {row_count}"
+        )
+    return manifest
+
+
+def drop_mismatched_metrics(indexes: Dict[str, Any]) -> None:
+    """Deja solo los índices (``LoadedIndex`` o, en el coordinador, ``RemoteCode``) con la métrica
+    elegida; mezclar L2 e IP haría incomparables los scores."""
+    metric = INDEX_METRIC or Counter(item.metric for item in indexes.values()).most_common(1)[0][0]
+    for code_id in [code_id for code_id, item in indexes.items() if item.metric != metric]:
+        print(f"[WARN] {code_id} usa métrica {indexes[code_id].metric}, se esperaba {metric}; se descarta.")
+        del indexes[code_id]
+
+
+def load_indexes(only: Optional[Collection[str]] = None) -> Dict[str, LoadedIndex]:
+    """Índices de Dataset/FAISS/*; ``only`` limita la carga a esos códigos (procesos shard)."""
+    indexes: Dict[str, LoadedIndex] = {}
+    if not FAISS_ROOT.exists():
+        raise FileNotFoundError(f"No se encontró la ruta de índices FAISS: {FAISS_ROOT}")
+
+    for dir_path in FAISS_ROOT.iterdir():
+        if not dir_path.is_dir() or (only is not None and dir_path.name not in only):
+            continue
+        index_path = dir_path / "index.faiss"
+        if not index_path.exists():
+            continue
+        if not (dir_path / "docs.json").exists() and not DocStore.available(dir_path):
+            continue
+
+        try:
+            index = read_faiss_index(index_path)
+            docs = load_docs(dir_path)
+            if not docs:
+                continue
+            parents = load_parents(dir_path, len(docs))
+            manifest = load_manifest(dir_path, index, len(parents) if parents is not None else len(docs))
+            code_name = docs[0].get("codigo", dir_path.name)
+            indexes[dir_path.name] = LoadedIndex(
+                code_id=dir_path.name,
+                code_name=code_name,
+                index=index,
+                docs=docs,
+                metric=manifest["metric"],
+                normalized=bool(manifest.get("normalized", False)),
+                parents=parents,
+                lexical=load_lexical(dir_path, len(docs)),
+                articles=load_article_map(dir_path, docs),
+                centroids=load_centroids(dir_path, index.d),
+                index_type=manifest.get("index_type", "flat"),
+                vectors=load_rescore_vectors(dir_path, index) if manifest.get("index_type") in COMPRESSED_INDEX_TYPES else None,
+                build_id=manifest.get("build_id"),
+            )
+            print(f"[LOAD] {dir_path.name}: {len(docs)} artículos")
+        except Exception as exc:  # pragma: no cover - solo log
+            print(f"[WARN] No se pudo cargar {dir_path.name}: {exc}")
+
+    if indexes:
+        drop_mismatched_metrics(indexes)
+    if not indexes:
+        raise RuntimeError("No se cargó ningún índice FAISS. Revisa la carpeta Dataset/FAISS.")
+    return indexes
+
+
+def _reconstruct_all(index: faiss.Index, total: int) -> np.ndarray:
+    # Los índices IVF necesitan un mapa directo para reconstruir vectores por posición.
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, total)
+
+
+def build_global_index(indexes: Dict[str, LoadedIndex]) -> GlobalIndex:
+    """Fusiona los vectores de todos los índices por código en un solo índice plano."""
+    codes = list(indexes.values())
+    dim = codes[0].index.d
+    metric = codes[0].metric
+    index = faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+    code_ids: List[np.ndarray] = []
+    row_ids: List[np.ndarray] = []
+
+    for pos, item in enumerate(codes):
+        # Solo se indexan las filas que tienen documento asociado.
+        total = min(item.index.ntotal, item.row_count)
+        if total == 0:
+            continue
+        index.add(_reconstruct_all(item.index, total))
+        code_ids.append(np.full(total, pos, dtype=np.int16))
+        row_ids.append(
+            np.asarray(item.parents[:total], dtype=np.int32)
+            if item.parents is not None
+            else np.arange(total, dtype=np.int32)
+        )
+
+    print(f"[LOAD] índice global: {index.ntotal} artículos de {len(codes)} códigos")
+    return GlobalIndex(
+        index=index,
+        codes=codes,
+        code_ids=np.concatenate(code_ids),
+        row_ids=np.concatenate(row_ids),
+        metric=metric,
+        normalized=codes[0].normalized,
+        chunked=any(item.parents is not None for item in codes),
+    )
+
+
+def load_global_index(indexes: Dict[str, LoadedIndex]) -> GlobalIndex:
+    """Abre el índice global precalculado si coincide con los índices cargados; si no, lo fusiona en memoria."""
+    index_path = GLOBAL_INDEX_DIR / "index.faiss"
+    codes_path = GLOBAL_INDEX_DIR / "codes.json"
+    if index_path.exists() and codes_path.exists():
+        # [código, filas, build_id] por código fusionado; un _global anterior al build_id no lo lleva
+        entries = json.loads(codes_path.read_text(encoding="utf-8"))
+        layout = [(entry[0], entry[1]) for entry in entries]
+        builds = {entry[0]: entry[2] if len(entry) > 2 else None for entry in entries}
+        first = next(iter(indexes.values()))
+        # El build_id detecta un código reconstruido con el mismo número de filas (p. ej. una reforma)
+        consistent = set(builds) == set(indexes) and all(
+            indexes[code_id].index.ntotal == count == indexes[code_id].row_count
+            and indexes[code_id].build_id == builds[code_id]
+            for code_id, count in layout
+        )
+        if consistent:
+            index = read_faiss_index(index_path)
+            try:
+                manifest = load_manifest(GLOBAL_INDEX_DIR, index, sum(count for _, count in layout))
+                consistent = manifest["metric"] == first.metric
+            except ValueError as exc:
+                print(f"[WARN] Índice global incompatible: {exc}")
+                consistent = False
+            if consistent:
+                print(f"[LOAD] índice global precalculado: {index.ntotal} artículos")
+                return GlobalIndex(
+                    index=index,
+                    codes=[indexes[code_id] for code_id, _ in layout],
+                    code_ids=np.concatenate(
+                        [np.full(count, pos, dtype=np.int16) for pos, (_, count) in enumerate(layout)]
+                    ),
+                    row_ids=np.concatenate(
+                        [
+                            np.asarray(indexes[code_id].parents, dtype=np.int32)
+                            if indexes[code_id].parents is not None
+                            else np.arange(count, dtype=np.int32)
+                            for code_id, count in layout
+                        ]
+                    ),
+                    metric=first.metric,
+                    normalized=first.normalized,
+                    chunked=any(indexes[code_id].parents is not None for code_id, _ in layout),
+                )
+        print("[WARN] Dataset/FAISS/_global no coincide con los índices cargados; se fusiona en memoria.")
+    return build_global_index(indexes)
+
+
+def index_fingerprint() -> tuple:
+    """(fichero, mtime, tamaño) de la marca de construcción terminada o, en bases sin ella, de los
+    ficheros principales de cada índice: cambia con cada reconstrucción."""
+    if not FAISS_ROOT.exists():
+        return ()
+    marker = FAISS_ROOT / BUILD_MARKER
+    if marker.exists():
+        stat = marker.stat()
+        return ((BUILD_MARKER, stat.st_mtime_ns, stat.st_size),)
+    found = []
+    for dir_path in sorted(p for p in FAISS_ROOT.iterdir() if p.is_dir()):
+        for name in WATCHED_FILES:
+            path = dir_path / name
+            if path.exists():
+                stat = path.stat()
+                found.append((f"{dir_path.name}/{name}", stat.st_mtime_ns, stat.st_size))
+    return tuple(found)
+
+
+def prepare_query(vector: np.ndarray, normalized: bool) -> np.ndarray:
+    if not normalized:
+        return vector
+    vector = np.array(vector, dtype="float32")
+    faiss.normalize_L2(vector)
+    return vector
+
+
+def search_code_index(item: LoadedIndex, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """``(distancias, filas)`` (n × k) de los ``k`` vecinos de cada consulta en el índice de un código.
+
+    En índices comprimidos con vectors.npy la distancia es la exacta de los mejores
+    ``k × RESCORE_FACTOR`` candidatos aproximados; las posiciones sobrantes quedan con fila -1.
+    """
+    queries = prepare_query(vectors, item.normalized)
+    if item.vectors is None:
+        return item.index.search(queries, k)
+    _, candidates = item.index.search(queries, k * RESCORE_FACTOR)
+    distances = np.full((len(queries), k), -np.inf if item.metric == "ip" else np.inf, dtype="float32")
+    rows = np.full((len(queries), k), -1, dtype="int64")
+    for pos, (query, found) in enumerate(zip(queries, candidates)):
+        # Filas ordenadas: el mmap se lee casi secuencialmente
+        unique = np.unique(found[found >= 0])
+        exact = np.asarray(item.vectors[unique])
+        if item.metric == "ip":
+            scores = exact @ query
+            order = np.argsort(-scores, kind="stable")[:k]
+        else:
+            scores = ((exact - query) ** 2).sum(axis=1)
+            order = np.argsort(scores, kind="stable")[:k]
+        distances[pos, : len(order)] = scores[order]
+        rows[pos, : len(order)] = unique[order]
+    return distances, rows
+
+
+def lexical_search(
+    tokens: List[str], items: Sequence[LoadedIndex], k: int
+) -> List[Tuple[float, Tuple[str, int], LoadedIndex]]:
+    """Mejores ``k`` artículos por BM25 entre ``items``, de mayor a menor score."""
+    hits = []
+    for item in items:
+        if item.lexical is None:
+            continue
+        rows, scores = item.lexical.search(tokens, k)
+        hits.extend((float(score), (item.code_id, int(row)), item) for row, score in zip(rows, scores))
+    hits.sort(key=lambda h: h[0], reverse=True)
+    return hits[:k]
+
+
+def dense_search(
+    targets: Sequence[Sequence[LoadedIndex]],
+    vectors: np.ndarray,
+    depths: Sequence[int],
+    fused: Optional[GlobalIndex] = None,
+) -> List[Dict[Tuple[str, int], Tuple[float, dict, LoadedIndex]]]:
+    """Mejor fila de cada artículo para cada consulta, con una sola llamada a ``search`` por índice.
+
+    ``targets[i]`` son los índices de la consulta ``i`` (vacío = el índice global ``fused``) y
+    ``depths[i]`` cuántos artículos necesita. Cada índice se busca una vez con el mayor número de
+    vecinos que pide el lote y cada consulta se queda con los primeros que le tocan.
+    """
+    groups: Dict[Optional[str], Dict[int, int]] = {}  # código (None = global) -> {consulta: vecinos}
+    by_code: Dict[str, LoadedIndex] = {}
+    for pos, (items, depth) in enumerate(zip(targets, depths)):
+        # Con trozos, varias filas pueden ser el mismo artículo: se piden más y se agrupan por artículo.
+        if items:
+            for item in items:
+                by_code[item.code_id] = item
+                fetch = depth * CHUNK_FETCH_FACTOR if item.parents is not None else depth
+                groups.setdefault(item.code_id, {})[pos] = fetch
+        else:
+            fetch = depth * CHUNK_FETCH_FACTOR if fused.chunked else depth
+            groups.setdefault(None, {})[pos] = fetch
+
+    # Los resultados de FAISS ya vienen ordenados: la primera fila de cada artículo es la mejor.
+    dense: List[Dict[Tuple[str, int], Tuple[float, dict, LoadedIndex]]] = [{} for _ in targets]
+    for code_id, fetches in groups.items():
+        positions = list(fetches)
+        fetch = max(fetches.values())
+        if code_id is None:
+            # Sin código: una sola búsqueda sobre el índice global fusionado.
+            with timed(search_seconds, "search:_global", index="_global"):
+                distances, rows = fused.index.search(prepare_query(vectors[positions], fused.normalized), fetch)
+            for pos, row_distances, row_ids in zip(positions, distances, rows):
+                limit = fetches[pos]
+                for dist, row in zip(row_distances[:limit], row_ids[:limit]):
+                    if row < 0:
+                        continue
+                    key = fused.article_key(row)
+                    if key not in dense[pos]:
+                        doc, item = fused.resolve(row)
+                        dense[pos][key] = (float(dist), doc, item)
+        else:
+            # Códigos candidatos (o todos, con índices comprimidos): se mezclan después (misma métrica).
+            item = by_code[code_id]
+            with timed(search_seconds, f"search:{code_id}", index=code_id):
+                distances, rows = search_code_index(item, vectors[positions], fetch)
+            for pos, row_distances, row_ids in zip(positions, distances, rows):
+                limit = fetches[pos]
+                for dist, idx in zip(row_distances[:limit], row_ids[:limit]):
+                    if idx < 0 or idx >= item.row_count:
+                        continue
+                    key = (item.code_id, item.doc_row(idx))
+                    if key not in dense[pos]:
+                        dense[pos][key] = (float(dist), item.docs[key[1]], item)
+    return dense
@@ -0,0 +1,60 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class PoolSaturated(Exception):
+    """La cola de admisión está llena; el cliente debe reintentar más tarde."""
+
+
+class InferencePool:
+    """Executor acotado para el trabajo CPU (encode + FAISS) con cola de admisión.
+
+    Como máximo ``workers`` peticiones se ejecutan a la vez y ``queue_size`` esperan turno;
+    las demás se rechazan de inmediato con ``PoolSaturated``. Una petición que supera su
+    timeout sigue ocupando su plaza hasta que el hilo termina, para que la cola refleje
+    la carga real del CPU.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 32):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: float, **kwargs: Any) -> Any:
+        # Solo se toca desde el event loop, así que no necesita lock.
+        if self._pending >= self.capacity:
+            self.rejected += 1
+            raise PoolSaturated()
+
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        # Con una copia del contexto de la petición, como asyncio.to_thread (la traza de metrics.py)
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _release(self, _future: "asyncio.Future[Any]") -> None:
+        self._pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,87 @@
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9]+")
+SUPPORTED_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas sin tildes y solo alfanuméricos (también lo usa ``indice_lexico.py`` al construir)."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return TOKEN.findall(text)
+
+
+def reciprocal_rank_fusion(*rankings: Sequence[Hashable], k: float = 60) -> List[Tuple[float, Hashable]]:
+    """score(d) = Σ 1 / (k + rango); no depende de la escala de distancias ni de BM25.
+
+    Con el mismo score queda antes lo que apareció primero (en el primer ranking, a menor rango).
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(((score, key) for key, score in scores.items()), key=lambda r: r[0], reverse=True)
+
+
+class LexicalIndex:
+    """Índice invertido BM25 de un código (``bm25.npz`` escrito por ``indice_lexico.py``).
+
+    Los pesos BM25 vienen calculados de la construcción, así que una consulta solo suma
+    los pesos de las postings de sus términos por artículo (``np.bincount``) y elige los mejores.
+    """
+
+    FILENAME = "bm25.npz"
+
+    def __init__(self, path: Path):
+        with np.load(path) as data:
+            if int(data["version"]) > SUPPORTED_VERSION:
+                raise ValueError(f"bm25.npz versión {int(data['version'])} no soportada")
+            self.vocab: Dict[str, int] = {term: i for i, term in enumerate(data["terms"].tolist())}
+            self.indptr = data["indptr"]
+            self.postings = data["postings"]
+            self.weights = data["weights"]
+            self.stopwords = frozenset(data["stopwords"].tolist())
+            self.n_docs = int(data["n_docs"])
+
+    @classmethod
+    def available(cls, dir_path: Path) -> bool:
+        return (dir_path / cls.FILENAME).exists()
+
+    def query_terms(self, tokens: Sequence[str]) -> List[int]:
+        terms = dict.fromkeys(t for t in tokens if t not in self.stopwords)
+        return [self.vocab[t] for t in terms if t in self.vocab]
+
+    def search(self, tokens: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve ``(filas, scores)`` de los ``k`` mejores artículos para la consulta ya tokenizada."""
+        return self.search_terms(self.query_terms(tokens), k)
+
+    def search_terms(self, term_ids: Sequence[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not term_ids or k <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        spans = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        if len(spans) == 1:
+            rows, weights = self.postings[spans[0]], self.weights[spans[0]]
+            # Un solo término: las postings ya son los candidatos, sin acumular
+            order = np.argsort(-weights, kind="stable")[:k]
+            return rows[order], weights[order]
+        scores = np.bincount(
+            np.concatenate([self.postings[s] for s in spans]),
+            weights=np.concatenate([self.weights[s] for s in spans]),
+            minlength=self.n_docs,
+        )
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        # argpartition elige los empates del corte al azar: entran los de fila más baja, y los
+        # empates se ordenan por fila, como en la vía de un solo término (postings en orden de fila)
+        kth = scores[top].min()
+        above = np.flatnonzero(scores > kth)
+        top = np.concatenate([above, np.flatnonzero(scores == kth)[: k - len(above)]])
+        top = top[np.lexsort((top, -scores[top]))]
+        return top.astype(np.int32), scores[top].astype(np.float32)
@@ -1,20 +1,126 @@
+import asyncio
+import hmac
+import ipaddress
 import json
-from dataclasses import dataclass
-from functools import lru_cache
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
-import faiss
 import numpy as np
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import CrossEncoder
+
+from articles import canonical_number, parse_article_refs
+from batcher import EmbeddingBatcher
+from cache import TTLCache, normalize_question
+from code_detector import CodeDetector, load_keywords
+from encoders import ENCODER_BACKENDS, load_encoder
+from generation import GeminiGenerator
+from inference import InferencePool, PoolSaturated
+from indexes import (
+    EMBEDDING_MODEL,
+    ENCODER_BACKEND,
+    GlobalIndex,
+    LoadedIndex,
+    dense_search,
+    drop_mismatched_metrics,
+    index_fingerprint,
+    lexical_search,
+    load_global_index,
+    load_indexes,
+    search_code_index,
+    search_seconds,
+)
+from lexical import reciprocal_rank_fusion, tokenize
+from metrics import Registry, start_trace, timed
+from rerank import Reranker
+from router import CentroidRouter
+from shards import ShardError, ShardPool, parse_address, require_authkey
+from snapshots import SnapshotManager
 
 # Directorios base (backend está en /Hackaton SIC 2025/backend)
 BACKEND_DIR = Path(__file__).resolve().parent
 ROOT_DIR = BACKEND_DIR.parent
-FAISS_ROOT = ROOT_DIR / "Dataset" / "FAISS"
+CODE_KEYWORDS_PATH = ROOT_DIR / "data" / "code_keywords.json"
+# Índices, modelo de embeddings y búsqueda sobre Dataset/FAISS: ver indexes.py (LEGALBOT_FAISS_ROOT, ...)
+ONNX_MODEL_DIR = Path(os.getenv("LEGALBOT_ONNX_DIR", str(ROOT_DIR / "Dataset" / "Modelos" / "all-MiniLM-L6-v2-onnx")))
+
+# Búsqueda híbrida: los candidatos vectoriales y BM25 (bm25.npz) se fusionan con reciprocal rank fusion.
+HYBRID_SEARCH = os.getenv("LEGALBOT_HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("LEGALBOT_HYBRID_CANDIDATES", "20"))
+RRF_K = float(os.getenv("LEGALBOT_RRF_K", "60"))
+
+# Sin código explícito se busca solo en los códigos detectados con al menos RATIO × el peso del mejor.
+DETECT_MAX_CANDIDATES = int(os.getenv("LEGALBOT_DETECT_MAX_CANDIDATES", "3"))
+DETECT_CANDIDATE_RATIO = float(os.getenv("LEGALBOT_DETECT_CANDIDATE_RATIO", "0.5"))
+
+# Enrutado de la búsqueda sin código explícito: "keywords" (palabras clave; sin aciertos = global),
+# "centroids" (los ROUTER_TOP_N códigos con centroides más cercanos al vector de la pregunta)
+# o "fallback" (palabras clave y, si no hay aciertos, centroides).
+CODE_ROUTER = os.getenv("LEGALBOT_CODE_ROUTER", "keywords")
+ROUTER_TOP_N = int(os.getenv("LEGALBOT_ROUTER_TOP_N", "3"))
+
+# Micro-batching de embeddings: preguntas que llegan dentro de la ventana se codifican juntas.
+EMBED_BATCH_MAX_SIZE = int(os.getenv("LEGALBOT_EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("LEGALBOT_EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+# Caché de consultas repetidas (vector de la pregunta + respuesta final).
+CACHE_MAX_ENTRIES = int(os.getenv("LEGALBOT_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("LEGALBOT_CACHE_TTL_SECONDS", "600"))
+
+# Pool de inferencia: hilos dedicados a encode + búsqueda, cola de admisión y timeout por petición.
+INFERENCE_WORKERS = int(os.getenv("LEGALBOT_INFERENCE_WORKERS", "4"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("LEGALBOT_INFERENCE_QUEUE_SIZE", "32"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LEGALBOT_REQUEST_TIMEOUT_SECONDS", "15"))
+RETRY_AFTER_SECONDS = int(os.getenv("LEGALBOT_RETRY_AFTER_SECONDS", "2"))
+# Preguntas pendientes en el micro-batcher (fuera del pool): por defecto la misma capacidad que el pool.
+EMBED_QUEUE_SIZE = int(os.getenv("LEGALBOT_EMBED_QUEUE_SIZE", str(INFERENCE_WORKERS + INFERENCE_QUEUE_SIZE)))
+
+# Modo distribuido: con LEGALBOT_SHARDS="host:puerto,..." este proceso no carga índices y reparte cada
+# búsqueda entre procesos shard_worker.py (cada uno con parte de Dataset/FAISS/<código>).
+SHARD_ADDRESSES = [parse_address(a) for a in os.getenv("LEGALBOT_SHARDS", "").split(",") if a.strip()]
+SHARD_AUTHKEY = require_authkey() if SHARD_ADDRESSES else b""  # sin LEGALBOT_SHARD_AUTHKEY no se arranca
+SHARD_TIMEOUT_MS = float(os.getenv("LEGALBOT_SHARD_TIMEOUT_MS", "500"))
+SHARD_RELOAD_TIMEOUT_SECONDS = float(os.getenv("LEGALBOT_SHARD_RELOAD_TIMEOUT_SECONDS", "300"))
+
+# Recarga en caliente de Dataset/FAISS: cada LEGALBOT_RELOAD_POLL_SECONDS se miran los ficheros de los
+# índices y, si cambiaron, se carga un snapshot nuevo (0 = solo con POST /api/admin/reload).
+RELOAD_POLL_SECONDS = float(os.getenv("LEGALBOT_RELOAD_POLL_SECONDS", "0"))
+ADMIN_TOKEN = os.getenv("LEGALBOT_ADMIN_TOKEN", "")  # vacío = /api/admin/* solo desde loopback
+
+# Precarga del modelo e índices al arrancar (en segundo plano) para que /api/ready refleje el estado real.
+EAGER_WARMUP = os.getenv("LEGALBOT_EAGER_WARMUP", "1") == "1"
+
+# Rerank opcional con cross-encoder: se recuperan RERANK_CANDIDATES y se reordenan dentro del presupuesto.
+# Por petición con ``rerank`` en ChatRequest; LEGALBOT_RERANK=1 lo activa por defecto (y lo precarga).
+RERANK_DEFAULT = os.getenv("LEGALBOT_RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("LEGALBOT_RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_CANDIDATES = int(os.getenv("LEGALBOT_RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("LEGALBOT_RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("LEGALBOT_RERANK_BUDGET_MS", "250"))
+RERANK_MAX_LENGTH = int(os.getenv("LEGALBOT_RERANK_MAX_LENGTH", "256"))
+
+# /api/chat/batch: preguntas por lote y tiempo máximo del lote completo.
+BATCH_MAX_QUESTIONS = int(os.getenv("LEGALBOT_BATCH_MAX_QUESTIONS", "256"))
+BATCH_TIMEOUT_SECONDS = float(os.getenv("LEGALBOT_BATCH_TIMEOUT_SECONDS", "120"))
+
+# Capa LLM opcional sobre las evidencias: "" (desactivada, solo fragmentos) o "gemini" (GEMINI_API_KEY).
+# /api/chat/stream emite su texto fragmento a fragmento; /api/chat lo devuelve completo.
+LLM_PROVIDER = os.getenv("LEGALBOT_LLM", "")
+LLM_MODEL = os.getenv("LEGALBOT_LLM_MODEL", "gemini-1.5-flash")
+LLM_BATCH_CONCURRENCY = max(1, int(os.getenv("LEGALBOT_LLM_BATCH_CONCURRENCY", "4")))  # generaciones a la vez en /api/chat/batch
+
+# Cabecera X-Timing (desglose por etapa en ms) en todas las respuestas; sin esto, solo en las
+# peticiones que la piden con "X-Timing: 1". Las métricas agregadas están siempre en /metrics.
+TIMING_HEADER = os.getenv("LEGALBOT_TIMING_HEADER", "0") == "1"
 
 
 # ------------------------------------------------------------
@@ -26,6 +132,7 @@ class ChatRequest(BaseModel):
     citations: bool = True
     top_k: int = 3
     codigo: Optional[str] = None  # Permite forzar un código específico opcionalmente.
+    rerank: Optional[bool] = None  # None = valor del servidor (LEGALBOT_RERANK)
 
 
 class Source(BaseModel):
@@ -34,192 +141,1149 @@ class Source(BaseModel):
     document: str
 
 
+class RerankInfo(BaseModel):
+    status: str  # completed | budget_exceeded | error | loading (cross-encoder aún sin cargar)
+    candidates: int
+    scored: int
+    ms: float
+
+
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Source]
+    rerank: Optional[RerankInfo] = None  # solo si se pidió rerank
+    missing_shards: List[str] = []  # modo distribuido: shards que no respondieron (resultado parcial)
+
+
+class ArticleResponse(BaseModel):
+    code: str
+    code_name: str
+    article: str
+    text: str
+    duplicates: List[str] = []  # textos de otros artículos con el mismo número en el código
+
+
+# ------------------------------------------------------------
+# Caché de consultas
+# ------------------------------------------------------------
+vector_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+answer_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+
+def invalidate_caches() -> None:
+    vector_cache.clear()
+    answer_cache.clear()
 
 
 # ------------------------------------------------------------
-# Carga de índices FAISS + docs
+# Métricas (/metrics) y desglose por petición (X-Timing)
+# ------------------------------------------------------------
+metrics_registry = Registry()
+stage_seconds = metrics_registry.histogram(
+    "legalbot_stage_seconds", "Duración de cada etapa de la respuesta.", ("stage",)
+)
+metrics_registry.register(search_seconds)  # indexes.py: también lo usan los shards
+request_seconds = metrics_registry.histogram(
+    "legalbot_http_request_seconds", "Latencia HTTP hasta la cabecera de respuesta.", ("method", "path")
+)
+requests_total = metrics_registry.counter(
+    "legalbot_http_requests_total", "Peticiones HTTP por endpoint y status.", ("method", "path", "status")
+)
+queries_total = metrics_registry.counter(
+    "legalbot_queries_total",
+    "Consultas buscadas por vía: direct (mapa de artículos), code, routed (centroides), all_codes o global.",
+    ("route",),
+)
+errors_total = metrics_registry.counter(
+    "legalbot_errors_total", "Errores por tipo (saturated, timeout, generation, shard, exception).", ("kind",)
+)
+metrics_registry.callback(
+    "legalbot_cache_requests_total",
+    "Consultas a las cachés de respuestas y vectores.",
+    "counter",
+    lambda: {
+        (name, result): getattr(cache, result)
+        for name, cache in (("answers", answer_cache), ("vectors", vector_cache))
+        for result in ("hits", "misses")
+    },
+    ("cache", "result"),
+)
+metrics_registry.callback(
+    "legalbot_cache_entries",
+    "Entradas en cada caché.",
+    "gauge",
+    lambda: {("answers",): answer_cache.stats()["size"], ("vectors",): vector_cache.stats()["size"]},
+    ("cache",),
+)
+
+
+def stage(name: str):
+    """Mide un bloque (o, como decorador, una función) como etapa ``name`` del histograma y de la
+    traza de la petición, si la hay."""
+    return timed(stage_seconds, name, stage=name)
+
+
+# ------------------------------------------------------------
+# Índices: locales (indexes.py) o servidos por shards
 # ------------------------------------------------------------
 @dataclass
-class LoadedIndex:
+class RemoteCode:
+    """Código servido por un shard: lo que el coordinador necesita para enrutar, buscar y citar."""
+
     code_id: str
     code_name: str
-    index: faiss.Index
-    docs: List[dict]
-
-
-# Palabras clave para detección rápida (ampliadas con todos los códigos disponibles).
-CODE_KEYWORDS: Dict[str, List[str]] = {
-    "codigo_trabajo": ["trabajo", "laboral", "empleador", "empleado", "licencia", "fuero", "despido"],
-    "codigo_penal": ["penal", "delito", "pena", "hurto", "robo", "homicidio", "estafa"],
-    "codigo_civil": ["civil", "contrato", "obligacion", "obligación", "responsabilidad", "daños", "perjuicios"],
-    "codigo_familia": ["familia", "matrimonio", "divorcio", "adopcion", "adopción", "guarda", "menor", "patria potestad"],
-    "codigo_electoral": ["electoral", "eleccion", "elección", "partido", "voto", "campaña"],
-    "codigo_comercio": ["comercio", "mercantil", "sociedad", "empresa", "firma", "accionista", "accionistas"],
-    "codigo_fiscal": ["fiscal", "impuesto", "tributo", "declaracion", "declaración", "renta", "iva"],
-    "codigo_judicial": ["judicial", "proceso", "demanda", "recurso", "apelacion", "apelación", "tribunal"],
-    "codigo_sanitario": ["sanitario", "salud", "hospital", "medico", "médico", "farmacia"],
-    "codigo_agrario": ["agrario", "agricola", "agrícola", "tierra", "finca", "agro"],
-    "codigo_recursos_minerales": ["mineria", "minería", "mineral", "concesion", "concesión", "yacimientos"],
-}
-
-
-def detect_code(question: str) -> Optional[str]:
-    q = question.lower()
-    for code_id, keywords in CODE_KEYWORDS.items():
-        if any(k in q for k in keywords):
-            return code_id
-    return None
-
-
-def load_indexes() -> Dict[str, LoadedIndex]:
-    indexes: Dict[str, LoadedIndex] = {}
-    if not FAISS_ROOT.exists():
-        raise FileNotFoundError(f"No se encontró la ruta de índices FAISS: {FAISS_ROOT}")
-
-    for dir_path in FAISS_ROOT.iterdir():
-        if not dir_path.is_dir():
-            continue
-        index_path = dir_path / "index.faiss"
-        docs_path = dir_path / "docs.json"
-        if not index_path.exists() or not docs_path.exists():
-            continue
+    shard: str  # "host:puerto"
+    metric: str = "l2"
+    lexical: bool = False
+    centroids: Optional[np.ndarray] = None
 
-        try:
-            index = faiss.read_index(str(index_path))
-            docs = json.loads(docs_path.read_text(encoding="utf-8"))
-            if not docs:
-                continue
-            code_name = docs[0].get("codigo", dir_path.name)
-            indexes[dir_path.name] = LoadedIndex(
-                code_id=dir_path.name,
-                code_name=code_name,
-                index=index,
-                docs=docs,
-            )
-            print(f"[LOAD] {dir_path.name}: {len(docs)} artículos")
-        except Exception as exc:  # pragma: no cover - solo log
-            print(f"[WARN] No se pudo cargar {dir_path.name}: {exc}")
 
-    if not indexes:
-        raise RuntimeError("No se cargó ningún índice FAISS. Revisa la carpeta Dataset/FAISS.")
-    return indexes
+# Detección de código: tabla compartida con detectar_codigo.py / config.py, compilada en una sola regex.
+code_detector = CodeDetector(load_keywords(CODE_KEYWORDS_PATH))
+
+
+def detect_codes(question: str) -> List[str]:
+    """Códigos candidatos de la pregunta: el más probable y los que se le acercan en peso."""
+    with stage("detect_code"):
+        ranked = code_detector.rank(question, limit=DETECT_MAX_CANDIDATES)
+    if not ranked:
+        return []
+    best = ranked[0][1]
+    return [code_id for code_id, score in ranked if score >= best * DETECT_CANDIDATE_RATIO]
 
 
 @lru_cache(maxsize=1)
-def get_model() -> SentenceTransformer:
-    print("[INIT] Cargando modelo de embeddings (sentence-transformers/all-MiniLM-L6-v2)...")
-    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+def get_model():
+    if ENCODER_BACKEND not in ENCODER_BACKENDS:
+        raise ValueError(f"LEGALBOT_ENCODER_BACKEND={ENCODER_BACKEND} no es válido ({', '.join(ENCODER_BACKENDS)})")
+    print(f"[INIT] Cargando modelo de embeddings ({EMBEDDING_MODEL}, {ENCODER_BACKEND})...")
+    return load_encoder(EMBEDDING_MODEL, ENCODER_BACKEND, ONNX_MODEL_DIR)
 
 
 @lru_cache(maxsize=1)
+def get_batcher() -> EmbeddingBatcher:
+    model = get_model()
+    return EmbeddingBatcher(
+        lambda texts: model.encode(list(texts)),
+        max_batch_size=EMBED_BATCH_MAX_SIZE,
+        max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+        max_pending=EMBED_QUEUE_SIZE,
+    )
+
+
+@dataclass
+class IndexSet:
+    """Todo lo que depende de Dataset/FAISS; se carga y se sustituye entero (ver ``index_snapshots``)."""
+
+    indexes: Dict[str, LoadedIndex]
+    global_index: Optional[GlobalIndex] = None  # None con índices comprimidos
+    router: Optional[CentroidRouter] = None  # solo si CODE_ROUTER lo usa
+    shard_codes: Optional[Dict[str, RemoteCode]] = None  # modo distribuido (``indexes`` queda vacío)
+    unloaded_shards: Tuple[str, ...] = ()  # shards que no respondieron al cargar (hasta la próxima recarga)
+
+
+@lru_cache(maxsize=1)
+def get_shard_pool() -> ShardPool:
+    return ShardPool(SHARD_ADDRESSES, SHARD_AUTHKEY, SHARD_TIMEOUT_MS)
+
+
+def load_shard_codes(reload_workers: bool) -> Tuple[Dict[str, RemoteCode], List[str]]:
+    """Pregunta a cada shard qué códigos sirve; en una recarga, antes les pide recargar sus índices.
+
+    Devuelve los códigos y los shards que no respondieron (sus códigos faltan hasta otra recarga).
+    """
+    pool = get_shard_pool()
+    if reload_workers:
+        for name, client in pool.clients.items():
+            try:
+                client.call("reload", timeout=SHARD_RELOAD_TIMEOUT_SECONDS)
+            except ShardError as exc:
+                print(f"[WARN] {name} no recargó, sigue con sus índices anteriores: {exc}")
+    infos, failed = pool.scatter({name: ("info", ()) for name in pool.clients})
+    if failed:
+        print(f"[WARN] Shards sin respuesta al cargar, sus códigos no se buscarán: {', '.join(failed)}")
+    codes: Dict[str, RemoteCode] = {}
+    for name in pool.clients:
+        for code_id, meta in infos.get(name, {}).items():
+            if code_id in codes:
+                print(f"[WARN] {code_id} está en {codes[code_id].shard} y {name}; se usa {codes[code_id].shard}.")
+                continue
+            codes[code_id] = RemoteCode(code_id=code_id, shard=name, **meta)
+    if codes:
+        drop_mismatched_metrics(codes)
+    if not codes:
+        raise RuntimeError("Ningún shard devolvió índices. Revisa LEGALBOT_SHARDS y los procesos shard_worker.py.")
+    print(f"[LOAD] {len(codes)} códigos en {len(pool.clients) - len(failed)} shards")
+    return codes, failed
+
+
+def build_router(indexes: Dict[str, "LoadedIndex | RemoteCode"]) -> Optional[CentroidRouter]:
+    missing = [code_id for code_id, item in indexes.items() if item.centroids is None]
+    if missing:
+        # Un código sin centroides nunca se elegiría: mejor no enrutar que perderlo.
+        print(f"[WARN] Sin centroids.npy en {', '.join(missing)}; enrutado por centroides desactivado.")
+        return None
+    return CentroidRouter({code_id: item.centroids for code_id, item in indexes.items()})
+
+
+def load_index_set() -> IndexSet:
+    if SHARD_ADDRESSES:
+        # Con un snapshot ya publicado esto es una recarga: los shards también recargan.
+        shard_codes, unloaded = load_shard_codes(reload_workers=index_snapshots.loaded)
+        return IndexSet(
+            indexes={},
+            router=build_router(shard_codes) if CODE_ROUTER != "keywords" else None,
+            shard_codes=shard_codes,
+            unloaded_shards=tuple(unloaded),
+        )
+    indexes = load_indexes()
+    # Con algún índice comprimido no se monta el índice global plano (desharía la compresión).
+    compressed = any(item.compressed for item in indexes.values())
+    return IndexSet(
+        indexes=indexes,
+        global_index=None if compressed else load_global_index(indexes),
+        router=build_router(indexes) if CODE_ROUTER != "keywords" else None,
+    )
+
+
+# Snapshot vigente de los índices. Cada petición fija uno al empezar (``pinned_snapshot``) y lo usa
+# hasta terminar; una recarga publica el nuevo de forma atómica y las respuestas cacheadas se vacían.
+index_snapshots: SnapshotManager[IndexSet] = SnapshotManager(load_index_set, index_fingerprint, invalidate_caches)
+
+
+def pinned_snapshot(fn):
+    """Ejecuta ``fn`` con el snapshot de índices fijado: toda la petición ve los mismos índices."""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with index_snapshots.pin():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
 def get_indexes() -> Dict[str, LoadedIndex]:
-    return load_indexes()
+    return index_snapshots.current().value.indexes
+
+
+def uses_global_index() -> bool:
+    return index_snapshots.current().value.global_index is not None
+
+
+def get_global_index() -> GlobalIndex:
+    return index_snapshots.current().value.global_index
+
+
+def get_router() -> Optional[CentroidRouter]:
+    return index_snapshots.current().value.router
+
+
+def get_shard_codes() -> Optional[Dict[str, RemoteCode]]:
+    return index_snapshots.current().value.shard_codes
+
+
+@lru_cache(maxsize=1)
+def get_generator() -> Optional[GeminiGenerator]:
+    if not LLM_PROVIDER:
+        return None
+    if LLM_PROVIDER != "gemini":
+        raise ValueError(f"LEGALBOT_LLM desconocido: {LLM_PROVIDER} (opciones: gemini)")
+    return GeminiGenerator(LLM_MODEL, os.getenv("GEMINI_API_KEY", ""))
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> Reranker:
+    print(f"[INIT] Cargando cross-encoder ({RERANK_MODEL})...")
+    model = CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH)
+    return Reranker(
+        lambda pairs: model.predict(pairs, batch_size=RERANK_BATCH_SIZE),
+        batch_size=RERANK_BATCH_SIZE,
+        budget_ms=RERANK_BUDGET_MS,
+    )
+
+
+_reranker_loading = threading.Lock()
+
+
+def preload_reranker() -> bool:
+    """Carga el cross-encoder en un hilo aparte, una sola vez; False si ya está cargado o cargándose.
+
+    La carga tarda segundos: dentro de una petición no cabría en LEGALBOT_RERANK_BUDGET_MS.
+    """
+    if get_reranker.cache_info().currsize or not _reranker_loading.acquire(blocking=False):
+        return False
+
+    def load() -> None:
+        try:
+            get_reranker()
+        except Exception as exc:  # pragma: no cover - solo log; la próxima petición lo reintenta
+            print(f"[WARN] No se pudo cargar el cross-encoder: {exc}")
+        finally:
+            _reranker_loading.release()
+
+    threading.Thread(target=load, name="reranker-load", daemon=True).start()
+    return True
+
+
+# ------------------------------------------------------------
+# Arranque: precarga y readiness
+# ------------------------------------------------------------
+class Readiness:
+    """Progreso de la precarga por etapa (pending → loading → ready | error) con sus tiempos."""
+
+    STAGES = ("model", "indexes", "warmup")  # "indexes" incluye el índice global
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stages = {name: {"status": "pending", "seconds": None} for name in self.STAGES}
+
+    def run(self, name: str, fn) -> None:
+        with self._lock:
+            self.stages[name]["status"] = "loading"
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as exc:
+            with self._lock:
+                self.stages[name].update(status="error", error=str(exc))
+            raise
+        finally:
+            with self._lock:
+                self.stages[name]["seconds"] = round(time.perf_counter() - start, 3)
+        with self._lock:
+            self.stages[name]["status"] = "ready"
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(stage["status"] == "ready" for stage in self.stages.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(stage) for name, stage in self.stages.items()}
+
+
+readiness = Readiness()
+
+
+def warm_up() -> None:
+    """Carga modelo e índices y ejecuta un encode + búsqueda de prueba para calentar caches y páginas."""
+
+    def _warmup_query() -> None:
+        vector = get_model().encode(["warm-up"]).astype("float32")
+        if uses_global_index():
+            get_global_index().index.search(vector, 1)
+        else:
+            for item in get_indexes().values():
+                search_code_index(item, vector, 1)
+        if RERANK_DEFAULT:
+            with _reranker_loading:
+                get_reranker()
+
+    try:
+        readiness.run("model", get_model)
+        readiness.run("indexes", get_indexes)
+        readiness.run("warmup", _warmup_query)
+        print(f"[INIT] Backend listo: {readiness.snapshot()}")
+    except Exception as exc:  # pragma: no cover - solo log
+        print(f"[WARN] Falló la precarga: {exc}")
 
 
 # ------------------------------------------------------------
 # Búsqueda
 # ------------------------------------------------------------
-def search_indexes(
-    question: str, code_hint: Optional[str], top_k: int
-) -> Tuple[List[Tuple[float, dict, LoadedIndex]], np.ndarray]:
-    model = get_model()
-    vector = model.encode([question]).astype("float32")
-    results: List[Tuple[float, dict, LoadedIndex]] = []
-    used_indexes: List[LoadedIndex] = []
+def embed_questions(questions: Sequence[str]) -> np.ndarray:
+    """Vectores (n × dim) de ``questions``: los que no están en caché se codifican en una sola pasada.
+
+    Para lotes explícitos (/api/chat/batch); las peticiones sueltas pasan por el micro-batcher.
+    """
+    normalized = [normalize_question(question) for question in questions]
+    vectors: Dict[str, np.ndarray] = {}
+    for text in normalized:
+        cached = vector_cache.get(text)
+        if cached is not None:
+            vectors[text] = cached
+    missing = [text for text in dict.fromkeys(normalized) if text not in vectors]
+    if missing:
+        with stage("encode"):
+            encoded = np.asarray(get_model().encode(missing), dtype="float32")
+        for row, text in enumerate(missing):
+            vectors[text] = encoded[row : row + 1]
+            vector_cache.put(text, vectors[text])
+    return np.concatenate([vectors[text] for text in normalized])
+
+
+class Retrieved(NamedTuple):
+    hits: List[Tuple[float, dict, "LoadedIndex | RemoteCode"]]
+    missing_shards: Tuple[str, ...] = ()  # modo distribuido: shards que no respondieron
+
+
+def select_indexes(codes: Sequence[str], vector: np.ndarray, available: Dict[str, LoadedIndex]) -> List[LoadedIndex]:
+    """Índices por código donde buscar; vacío = índice global."""
+    selected = [available[code_id] for code_id in codes if code_id in available]
+    route = "code"
+    if not selected and CODE_ROUTER in ("centroids", "fallback"):
+        router = get_router()
+        if router is not None:
+            # El vector ya está calculado: enrutar cuesta un producto con ~40 centroides.
+            selected = [available[code_id] for code_id, _ in router.route(vector, ROUTER_TOP_N)]
+            route = "routed"
+    if not selected and not uses_global_index():
+        # Con vectores comprimidos (o shards) no hay índice global: se busca código a código.
+        selected = list(available.values())
+        route = "all_codes"
+    queries_total.inc(route=route if selected else "global")
+    return selected
+
+
+def search_many(
+    questions: Sequence[str], code_lists: Sequence[Sequence[str]], vectors: np.ndarray, top_ks: Sequence[int]
+) -> List[Retrieved]:
+    """``search_indexes`` para varias preguntas ya codificadas (``vectors``, n × dim), en orden.
+
+    Cada ``LoadedIndex``, o el índice global, recibe una sola llamada a ``search`` con todas sus
+    consultas (``dense_search``). En modo distribuido la búsqueda se reparte entre los shards.
+    """
+    if get_shard_codes() is not None:
+        return search_shards(questions, code_lists, vectors, top_ks)
 
     available = get_indexes()
-    targets = (
-        [available[code_hint]]
-        if code_hint and code_hint in available
-        else list(available.values())
-    )
+    plans = []  # (selected, searched, hybrid, depth) por pregunta
+    for pos, codes in enumerate(code_lists):
+        selected = select_indexes(codes, vectors[pos : pos + 1], available)
+        searched: Sequence[LoadedIndex] = selected or get_global_index().codes
+        hybrid = HYBRID_SEARCH and any(item.lexical is not None for item in searched)
+        depth = max(top_ks[pos], HYBRID_CANDIDATES) if hybrid else top_ks[pos]
+        plans.append((selected, searched, hybrid, depth))
 
-    for item in targets:
-        distances, idxs = item.index.search(vector, top_k)
-        for dist, idx in zip(distances[0], idxs[0]):
-            if idx < 0 or idx >= len(item.docs):
-                continue
-            results.append((float(dist), item.docs[idx], item))
-        used_indexes.append(item)
+    fused = get_global_index() if any(not selected for selected, *_ in plans) else None
+    dense = dense_search([selected for selected, *_ in plans], vectors, [depth for *_, depth in plans], fused)
+    results = []
+    for pos, (selected, searched, hybrid, depth) in enumerate(plans):
+        metric = selected[0].metric if selected else fused.metric
+        lexical = None
+        if hybrid:
+            with stage("bm25"):
+                lexical = [(score, key, item, None) for score, key, item in lexical_search(tokenize(questions[pos]), searched, depth)]
+        with stage("merge"):
+            results.append(Retrieved(rank_hits(dense[pos], metric, lexical, depth, top_ks[pos])))
+    return results
+
+
+def search_shards(
+    questions: Sequence[str], code_lists: Sequence[Sequence[str]], vectors: np.ndarray, top_ks: Sequence[int]
+) -> List[Retrieved]:
+    """Scatter-gather: cada shard recibe en una sola llamada las consultas que tocan sus códigos y
+    devuelve sus mejores artículos (vectoriales y BM25); aquí se mezclan y se fusionan como en local.
+
+    Un shard que falla o supera LEGALBOT_SHARD_TIMEOUT_MS no bloquea la respuesta: se sigue con el
+    resto y la respuesta lista ``missing_shards``.
+    """
+    codes = get_shard_codes()
+    # Los códigos de un shard caído al cargar no se pueden elegir: toda respuesta es parcial.
+    unloaded = set(index_snapshots.current().value.unloaded_shards)
+    plans = []  # (selected, hybrid, depth) por pregunta
+    per_shard: Dict[str, List[Tuple[int, dict]]] = {}
+    for pos, wanted in enumerate(code_lists):
+        selected = select_indexes(wanted, vectors[pos : pos + 1], codes)
+        hybrid = HYBRID_SEARCH and any(code.lexical for code in selected)
+        depth = max(top_ks[pos], HYBRID_CANDIDATES) if hybrid else top_ks[pos]
+        plans.append((selected, hybrid, depth))
+        tokens = tokenize(questions[pos]) if hybrid else None
+        owned: Dict[str, List[str]] = {}
+        for code in selected:
+            owned.setdefault(code.shard, []).append(code.code_id)
+        for shard, code_ids in owned.items():
+            per_shard.setdefault(shard, []).append((pos, {"codes": code_ids, "depth": depth, "tokens": tokens}))
+
+    with timed(search_seconds, "search:shards", index="shards"):
+        replies, failed = get_shard_pool().scatter(
+            {
+                shard: ("search", (vectors[[pos for pos, _ in queries]], [query for _, query in queries]))
+                for shard, queries in per_shard.items()
+            }
+        )
+    if failed:
+        errors_total.inc(len(failed), kind="shard")
+
+    dense: List[Dict[Tuple[str, int], Tuple[float, dict, RemoteCode]]] = [{} for _ in questions]
+    lexical: List[list] = [[] for _ in questions]
+    for shard, queries in per_shard.items():
+        for (pos, _), reply in zip(queries, replies.get(shard, [])):
+            for dist, code_id, row, doc in reply["dense"]:
+                dense[pos][(code_id, row)] = (dist, doc, codes[code_id])
+            lexical[pos].extend((score, (code_id, row), codes[code_id], doc) for score, code_id, row, doc in reply["lexical"])
+
+    results = []
+    for pos, (selected, hybrid, depth) in enumerate(plans):
+        missing = tuple(sorted(({code.shard for code in selected} & set(failed)) | unloaded))
+        if not selected:
+            results.append(Retrieved([], missing))
+            continue
+        with stage("merge"):
+            merged = sorted(lexical[pos], key=lambda hit: hit[0], reverse=True)[:depth] if hybrid else None
+            results.append(Retrieved(rank_hits(dense[pos], selected[0].metric, merged, depth, top_ks[pos]), missing))
+    return results
+
+
+def rank_hits(
+    dense: Dict[Tuple[str, int], Tuple[float, dict, "LoadedIndex | RemoteCode"]],
+    metric: str,
+    lexical: Optional[Sequence[Tuple[float, Tuple[str, int], "LoadedIndex | RemoteCode", Optional[dict]]]],
+    depth: int,
+    top_k: int,
+) -> List[Tuple[float, dict, "LoadedIndex | RemoteCode"]]:
+    """Top ``top_k`` de los candidatos vectoriales o, con ``lexical`` (BM25: score, clave, código y
+    documento si ya se tiene), de su fusión RRF."""
+    # L2: menor distancia = más similar; IP (coseno): mayor score = más similar
+    dense_ranking = sorted(dense, key=lambda key: dense[key][0], reverse=metric == "ip")[:depth]
+    if lexical is None:
+        return [dense[key] for key in dense_ranking[:top_k]]
 
-    # Menor distancia = más similar en L2
-    results.sort(key=lambda r: r[0])
-    return results[:top_k], vector
+    by_key = {key: (item, doc) for _, key, item, doc in lexical}
+    results = []
+    for score, key in reciprocal_rank_fusion(dense_ranking, [key for _, key, _, _ in lexical], k=RRF_K)[:top_k]:
+        if key in dense:
+            _, doc, item = dense[key]
+        else:
+            item, doc = by_key[key]
+            if doc is None:
+                doc = item.docs[key[1]]
+        results.append((score, doc, item))
+    return results
+
+
+def search_indexes(
+    question: str, codes: Sequence[str], top_k: int, vector: Optional[np.ndarray] = None
+) -> Tuple[Retrieved, np.ndarray]:
+    """Artículos más cercanos a ``question`` dentro de ``codes`` (vacío = todos los códigos).
+
+    ``vector`` es el de ``question_vector`` si ya se codificó desde el event loop.
+    Sin índices BM25 (o con LEGALBOT_HYBRID_SEARCH=0) el score es la distancia/similitud de FAISS;
+    en modo híbrido es el score RRF de la fusión vectorial + léxica (mayor = mejor).
+    """
+    # Cargar índices primero: la carga invalida la caché de vectores.
+    get_indexes()
+
+    if vector is None:
+        normalized = normalize_question(question)
+        vector = vector_cache.get(normalized)
+        if vector is None:
+            with stage("encode"):
+                vector = get_batcher().encode(normalized)
+            vector_cache.put(normalized, vector)
+    return search_many([question], [codes], vector, [top_k])[0], vector
+
+
+async def question_vector(question: str) -> Optional[np.ndarray]:
+    """Vector de ``question`` esperado desde el event loop, antes de pedir plaza en el pool.
+
+    Una petición en espera solo deja un futuro en la cola del micro-batcher, no un hilo del pool
+    bloqueado: el batch puede llegar a LEGALBOT_EMBED_BATCH_MAX_SIZE aunque el pool tenga
+    LEGALBOT_INFERENCE_WORKERS hilos. None si la pregunta cita artículos: la vía directa no usa
+    vector (si no acierta, ``search_indexes`` codifica dentro del pool).
+    """
+    if parse_article_refs(question):
+        return None
+    normalized = normalize_question(question)
+    vector = vector_cache.get(normalized)
+    if vector is None:
+        # La primera llamada carga el modelo: fuera del event loop
+        batcher = get_batcher() if get_batcher.cache_info().currsize else await asyncio.to_thread(get_batcher)
+        with stage("encode"):
+            vector = await asyncio.wrap_future(batcher.submit(normalized))
+        vector_cache.put(normalized, vector)
+    return vector
+
+
+def remote_articles(code: RemoteCode, numbers: Sequence[str]) -> Dict[str, List[dict]]:
+    """Documentos de los artículos ``numbers`` (canónicos) pedidos al shard que sirve el código."""
+    try:
+        return get_shard_pool().clients[code.shard].call("articles", code.code_id, list(numbers))
+    except ShardError as exc:
+        errors_total.inc(kind="shard")
+        print(f"[WARN] Consulta de artículos sin respuesta: {exc}")
+        return {}
+
+
+def lookup_articles(code_id: Optional[str], numbers: Sequence[str]) -> List[Tuple[dict, LoadedIndex]]:
+    """Artículos citados por número en ``code_id`` vía el mapa precalculado, sin modelo ni FAISS."""
+    if not code_id or not numbers:
+        return []
+    shard_codes = get_shard_codes()
+    if shard_codes is not None:
+        code = shard_codes.get(code_id)
+        found = remote_articles(code, numbers) if code is not None else {}
+        return [(found[n][0], code) for n in numbers if found.get(n)]
+    item = get_indexes().get(code_id)
+    if item is None:
+        return []
+    # Con números repetidos en el código se toma la primera aparición
+    return [(item.docs[item.articles[n][0]], item) for n in numbers if n in item.articles]
 
 
 def truncate_text(text: str, limit: int = 420) -> str:
     return text if len(text) <= limit else text[:limit].rstrip() + "..."
 
 
-def build_answer(question: str, strict: bool, include_citations: bool, code_hint: Optional[str], top_k: int) -> ChatResponse:
-    detected = detect_code(question)
-    code_to_use = code_hint or detected
+@dataclass
+class Evidence:
+    codes: List[str]  # códigos en los que se buscó ([] = global o centroides)
+    hits: List[Tuple[float, dict, LoadedIndex]]
+    direct: bool = False  # respondida con el mapa de artículos
+    rerank: Optional[RerankInfo] = None
+    missing_shards: List[str] = field(default_factory=list)
+    unavailable: bool = False  # el código pedido está en un shard sin cargar: no se busca
+
 
-    hits, _ = search_indexes(question, code_to_use, top_k)
-    if not hits:
+def select_codes(detected: Sequence[str], code_hint: Optional[str]) -> List[str]:
+    if code_hint:
+        return [code_hint]
+    return [] if CODE_ROUTER == "centroids" else list(detected)
+
+
+def offline_shards_for(code_id: str) -> List[str]:
+    """Modo distribuido: shards sin cargar que pueden tener ``code_id`` si ningún shard cargado lo sirve."""
+    codes = get_shard_codes()
+    if codes is None or code_id in codes:
+        return []
+    return list(index_snapshots.current().value.unloaded_shards)
+
+
+def plan_evidence(question: str, code_hint: Optional[str], detected: Optional[List[str]] = None) -> Evidence:
+    """Códigos donde buscar y, si la pregunta cita artículos del código, la respuesta directa."""
+    offline = offline_shards_for(code_hint) if code_hint else []
+    if offline:
+        # Buscar en todos los demás códigos daría artículos de otro código como si fueran del pedido
+        print(f"[WARN] {code_hint} no está en los shards cargados; sin respuesta de {', '.join(offline)}.")
+        errors_total.inc(kind="shard")
+        return Evidence([code_hint], [], missing_shards=offline, unavailable=True)
+    if detected is None:
+        detected = detect_codes(question)
+    codes_to_use = select_codes(detected, code_hint)
+
+    # Vía rápida: "artículo 25 del Código de la Familia" se responde con el mapa de artículos.
+    direct = lookup_articles(code_hint or (detected[0] if detected else None), parse_article_refs(question))
+    if direct:
+        queries_total.inc(route="direct")
+    return Evidence(codes_to_use, [(0.0, doc, item) for doc, item in direct], direct=bool(direct))
+
+
+def search_depth(top_k: int, rerank: bool) -> int:
+    # Con rerank, primera etapa amplia y el cross-encoder decide el top_k
+    return max(top_k, RERANK_CANDIDATES) if rerank else top_k
+
+
+def finish_evidence(evidence: Evidence, question: str, found: Retrieved, top_k: int, rerank: bool) -> Evidence:
+    candidates = found.hits
+    evidence.missing_shards = list(found.missing_shards)
+    if not rerank:
+        evidence.hits = candidates
+        return evidence
+    # Si el rerank no se completa se queda el orden original
+    if not get_reranker.cache_info().currsize:
+        # Cargar el modelo no cabe en el presupuesto: esta petición sigue sin rerank (y no se cachea)
+        preload_reranker()
+        evidence.hits = candidates[:top_k]
+        evidence.rerank = RerankInfo(status="loading", candidates=len(candidates), scored=0, ms=0.0)
+        return evidence
+    with stage("rerank"):
+        reranked, info = get_reranker().rerank(question, candidates, [doc.get("texto", "") for _, doc, _ in candidates], top_k)
+    evidence.hits = [(score if score is not None else first, doc, item) for score, (first, doc, item) in reranked]
+    evidence.rerank = RerankInfo(**info)
+    return evidence
+
+
+@pinned_snapshot
+@stage("collect_evidence")
+def collect_evidence(
+    question: str,
+    code_hint: Optional[str],
+    top_k: int,
+    rerank: bool = False,
+    detected: Optional[List[str]] = None,
+    vector: Optional[np.ndarray] = None,
+) -> Evidence:
+    """Recuperación sin formato: lo comparten /api/chat y /api/chat/stream."""
+    evidence = plan_evidence(question, code_hint, detected)
+    if evidence.direct or evidence.unavailable:
+        return evidence
+    found, _ = search_indexes(question, evidence.codes, search_depth(top_k, rerank), vector)
+    return finish_evidence(evidence, question, found, top_k, rerank)
+
+
+def evidence_bullet(doc: dict, item: LoadedIndex) -> str:
+    return f"- {item.code_name}, Art. {doc.get('articulo', 's/n')}: {truncate_text(doc.get('texto', ''))}"
+
+
+def evidence_source(doc: dict, item: LoadedIndex) -> Source:
+    return Source(
+        code=item.code_name,
+        article=f"Artículo {doc.get('articulo', 's/n')}",
+        document=f"Dataset/FAISS/{item.code_id}/docs.json",
+    )
+
+
+def evidence_hint(evidence: Evidence) -> str:
+    if evidence.direct:
+        return f"Artículo citado: consulta directa en {evidence.hits[0][2].code_name}."
+    if evidence.codes:
+        return f"Código detectado: {', '.join(evidence.codes)}"
+    if CODE_ROUTER != "keywords" and get_router() is not None:
+        return "Búsqueda en los códigos más cercanos a la pregunta (centroides)."
+    return "Sin código detectado, búsqueda global."
+
+
+def compose_answer(evidence: Evidence, strict: bool, include_citations: bool, generated: str = "") -> ChatResponse:
+    if evidence.unavailable:
+        msg = (
+            f"El código {evidence.codes[0]} no está disponible ahora: el shard que lo sirve no respondió "
+            f"({', '.join(evidence.missing_shards)}). Intenta de nuevo en unos minutos."
+        )
+        return ChatResponse(answer=msg, sources=[], missing_shards=evidence.missing_shards)
+    if not evidence.hits:
         msg = (
             "No encontré evidencia suficiente en los códigos cargados. "
             "Prueba especificar el código o artículo, o revisa que la base esté construida."
         )
-        return ChatResponse(answer=msg, sources=[])
-
-    bullets = []
-    sources: List[Source] = []
-
-    for dist, doc, idx_info in hits:
-        article = doc.get("articulo", "s/n")
-        code_name = idx_info.code_name
-        snippet = truncate_text(doc.get("texto", ""))
-        bullets.append(f"- {code_name}, Art. {article}: {snippet}")
-        if include_citations:
-            sources.append(
-                Source(
-                    code=code_name,
-                    article=f"Artículo {article}",
-                    document=f"Dataset/FAISS/{idx_info.code_id}/docs.json",
-                )
-            )
+        if evidence.missing_shards:
+            msg += f" (Resultado parcial: sin respuesta de {', '.join(evidence.missing_shards)}.)"
+        return ChatResponse(answer=msg, sources=[], rerank=evidence.rerank, missing_shards=evidence.missing_shards)
 
-    hint_txt = f"Código detectado: {detected}" if detected else "Sin código detectado, búsqueda global."
+    bullets = [evidence_bullet(doc, item) for _, doc, item in evidence.hits]
+    sources = [evidence_source(doc, item) for _, doc, item in evidence.hits] if include_citations else []
     mode_txt = "Modo estricto: se devuelven solo fragmentos recuperados." if strict else "Modo flexible: puedes extender la explicación sobre estos fragmentos."
-    answer = f"{hint_txt}\n{mode_txt}\n\nEvidencias:\n" + "\n".join(bullets)
+    if evidence.missing_shards:
+        mode_txt += f"\nResultado parcial: sin respuesta de {', '.join(evidence.missing_shards)}."
+    generated_txt = f"{generated.strip()}\n\n" if generated.strip() else ""
+    answer = f"{evidence_hint(evidence)}\n{mode_txt}\n\n{generated_txt}Evidencias:\n" + "\n".join(bullets)
+    return ChatResponse(answer=answer, sources=sources, rerank=evidence.rerank, missing_shards=evidence.missing_shards)
+
+
+def answer_cache_key(
+    question: str, strict: bool, include_citations: bool, code_hint: Optional[str], top_k: int, rerank: bool = False
+) -> Optional[tuple]:
+    # Con la versión del snapshot, una petición que termina sobre índices ya sustituidos no deja
+    # su respuesta para los nuevos. Se llama en el event loop: no carga índices ni espera a que
+    # terminen de cargarse; hasta entonces (None) no se usa la caché de respuestas.
+    version = index_snapshots.current_version()
+    if version is None:
+        return None
+    return (version, normalize_question(question), code_hint, top_k, strict, include_citations, rerank)
+
+
+def generate_text(question: str, evidence: Evidence, strict: bool) -> str:
+    """Respuesta del LLM sobre las evidencias ("" sin LEGALBOT_LLM o si falla). Bloquea: va en un hilo
+    aparte (``generate_answer``), no en el pool de inferencia."""
+    generator = get_generator()
+    if generator is None or not evidence.hits:
+        return ""
+    try:
+        with stage("generate"):
+            return "".join(generator.stream(question, [evidence_bullet(doc, item) for _, doc, item in evidence.hits], strict))
+    except Exception as exc:  # pragma: no cover - solo log
+        errors_total.inc(kind="generation")
+        print(f"[WARN] Falló la generación, se devuelven solo las evidencias: {exc}")
+        return ""
+
+
+async def generate_answer(question: str, evidence: Evidence, strict: bool) -> str:
+    if get_generator() is None or not evidence.hits:
+        return ""
+    return await asyncio.to_thread(generate_text, question, evidence, strict)
+
+
+def finish_answer(cache_key: Optional[tuple], evidence: Evidence, strict: bool, include_citations: bool, generated: str = "") -> ChatResponse:
+    response = compose_answer(evidence, strict, include_citations, generated)
+    # Un rerank que no cupo en el presupuesto o un resultado parcial no se cachean: la próxima vez
+    # pueden completarse.
+    complete = (evidence.rerank is None or evidence.rerank.status == "completed") and not evidence.missing_shards
+    if cache_key is not None and complete:
+        answer_cache.put(cache_key, response)
+    return response
 
-    return ChatResponse(answer=answer, sources=sources)
+
+@pinned_snapshot
+@stage("collect_evidence")
+def collect_evidences(requests: Sequence[dict]) -> List[Evidence]:
+    """``collect_evidence`` para un lote (argumentos de ``chat_arguments``), en el mismo orden.
+
+    Las preguntas sin cita directa se codifican en una sola pasada y se buscan con
+    ``search_many``: una llamada a ``search`` por índice para todo el lote.
+    """
+    # Cargar índices primero: la carga invalida la caché de vectores.
+    get_indexes()
+    plans = [plan_evidence(args["question"], args["code_hint"]) for args in requests]
+
+    pending = [pos for pos, evidence in enumerate(plans) if not (evidence.direct or evidence.unavailable)]
+    if pending:
+        questions = [requests[pos]["question"] for pos in pending]
+        found = search_many(
+            questions,
+            [plans[pos].codes for pos in pending],
+            embed_questions(questions),
+            [search_depth(requests[pos]["top_k"], requests[pos]["rerank"]) for pos in pending],
+        )
+        for pos, retrieved in zip(pending, found):
+            args = requests[pos]
+            finish_evidence(plans[pos], args["question"], retrieved, args["top_k"], args["rerank"])
+    return plans
+
+
+def sse_event(event: str, data: object) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 # ------------------------------------------------------------
 # FastAPI
 # ------------------------------------------------------------
-app = FastAPI(title="LegalBot Panamá Backend", version="0.2.0")
+inference_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE)
+
+metrics_registry.callback(
+    "legalbot_inference_pending",
+    "Peticiones en el pool de inferencia (ejecutándose + en cola).",
+    "gauge",
+    lambda: {(): inference_pool.stats()["pending"]},
+)
+metrics_registry.callback(
+    "legalbot_index_snapshot_version",
+    "Versión del snapshot de índices publicado (sube con cada recarga).",
+    "gauge",
+    lambda: {(): index_snapshots.stats()["version"] or 0},
+)
+metrics_registry.callback(
+    "legalbot_shard_calls_total",
+    "Llamadas RPC a cada shard por resultado (calls incluye errores, timeouts y reintentos).",
+    "counter",
+    lambda: {
+        (name, result): stats[result]
+        for name, stats in (get_shard_pool().stats() if SHARD_ADDRESSES else {}).items()
+        for result in ("calls", "errors", "timeouts", "retries")
+    },
+    ("shard", "result"),
+)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # LEGALBOT_LLM mal escrito o sin google-generativeai: que falle el arranque, no la primera
+    # petición (en /api/chat/stream ya con las cabeceras SSE enviadas).
+    if get_generator() is not None:
+        print(f"[INIT] Generación con {LLM_PROVIDER} ({LLM_MODEL})")
+    if EAGER_WARMUP:
+        # En un hilo aparte: /api/live responde mientras se carga.
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    elif RERANK_DEFAULT:
+        preload_reranker()
+    stop_watching = threading.Event()
+    if RELOAD_POLL_SECONDS > 0:
+        threading.Thread(
+            target=index_snapshots.watch, args=(RELOAD_POLL_SECONDS, stop_watching), name="index-watch", daemon=True
+        ).start()
+    yield
+    stop_watching.set()
+    inference_pool.shutdown()
+
+
+app = FastAPI(title="LegalBot Panamá Backend", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Timing"],
 )
 
 
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """Latencia y status por endpoint y, con X-Timing, el desglose por etapa de esta petición."""
+    trace = start_trace()  # la heredan el endpoint y los hilos del pool de inferencia
+    try:
+        response = await call_next(request)
+    except Exception:
+        errors_total.inc(kind="exception")
+        raise
+    # Plantilla de la ruta ("/api/articles/{code}/{number}"), no la URL: etiquetas acotadas.
+    path = getattr(request.scope.get("route"), "path", "unmatched")
+    request_seconds.observe(time.perf_counter() - trace.started, method=request.method, path=path)
+    requests_total.inc(method=request.method, path=path, status=str(response.status_code))
+    if TIMING_HEADER or request.headers.get("x-timing") == "1":
+        response.headers["X-Timing"] = trace.header()
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+def export_metrics():
+    """Métricas en formato de texto de Prometheus (histogramas por etapa e índice, contadores)."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/live")
+def live():
+    return {"status": "alive"}
+
+
+@app.get("/api/ready")
+def ready():
+    """200 cuando el modelo y los índices están cargados y calentados; 503 mientras tanto.
+    Sin precarga (LEGALBOT_EAGER_WARMUP=0) el worker se considera listo y carga en la primera consulta.
+    """
+    body = {"ready": readiness.ready or not EAGER_WARMUP, "stages": readiness.snapshot()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "indexes": list(get_indexes().keys())}
+    # No fuerza la carga: solo reporta lo que ya está en memoria.
+    indexes_loaded = index_snapshots.loaded
+    batcher_loaded = get_batcher.cache_info().currsize > 0
+    return {
+        "status": "ok",
+        "ready": readiness.ready,
+        "indexes": list(get_shard_codes() or get_indexes()) if indexes_loaded else [],
+        "shards": get_shard_pool().stats() if SHARD_ADDRESSES else None,
+        "unloaded_shards": list(index_snapshots.current().value.unloaded_shards) if indexes_loaded else [],
+        "embedding_batches": get_batcher().stats() if batcher_loaded else None,
+        "snapshots": index_snapshots.stats(),
+        "cache": {"answers": answer_cache.stats(), "vectors": vector_cache.stats()},
+        "inference": inference_pool.stats(),
+        "rerank": get_reranker().stats() if get_reranker.cache_info().currsize > 0 else None,
+        "llm": {"provider": LLM_PROVIDER, "model": LLM_MODEL} if LLM_PROVIDER else None,
+    }
+
+
+def is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+@app.post("/api/admin/reload", status_code=202)
+async def reload_indexes(request: Request, wait: bool = False, x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Recarga Dataset/FAISS sin reiniciar: el snapshot nuevo se carga en segundo plano y se publica de
+    forma atómica; las consultas en curso terminan sobre el anterior, que se libera al drenarse.
+    Con ``?wait=true`` responde al terminar (200, o 500 si la carga falla y sigue el anterior).
+    Exige ``X-Admin-Token`` si hay LEGALBOT_ADMIN_TOKEN; sin él, solo se acepta desde loopback.
+    """
+    if ADMIN_TOKEN:
+        if not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Token de administración inválido.")
+    elif not is_loopback(request.client.host if request.client else ""):
+        raise HTTPException(status_code=403, detail="Sin LEGALBOT_ADMIN_TOKEN solo se acepta desde localhost.")
+    if wait:
+        try:
+            await asyncio.to_thread(index_snapshots.reload)
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"Falló la recarga, se mantiene el snapshot anterior: {exc}")
+        return JSONResponse(index_snapshots.stats(), status_code=200)
+    return {"started": index_snapshots.reload_in_background(), **index_snapshots.stats()}
+
+
+@app.get("/api/articles/{code}/{number}", response_model=ArticleResponse)
+def get_article(code: str, number: str):
+    """Texto de un artículo por código y número ("45", "12-A"), sin pasar por el modelo."""
+    shard_codes = get_shard_codes()
+    item = (shard_codes if shard_codes is not None else get_indexes()).get(code)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Código desconocido: {code}")
+    canonical = canonical_number(number)
+    if not canonical:
+        docs = []
+    elif shard_codes is not None:
+        try:
+            docs = get_shard_pool().clients[item.shard].call("articles", code, [canonical]).get(canonical, [])
+        except ShardError as exc:
+            raise HTTPException(status_code=503, detail=f"El shard de {item.code_name} no respondió: {exc}")
+    else:
+        docs = [item.docs[row] for row in item.articles.get(canonical, [])]
+    if not docs:
+        raise HTTPException(status_code=404, detail=f"{item.code_name} no tiene artículo {number}")
+    return ArticleResponse(
+        code=code,
+        code_name=item.code_name,
+        article=f"Artículo {canonical}",
+        text=docs[0].get("texto", ""),
+        duplicates=[doc.get("texto", "") for doc in docs[1:]],
+    )
+
+
+def chat_arguments(request: ChatRequest) -> dict:
+    """Argumentos de ``answer_cache_key`` para una petición (top_k acotado, rerank por defecto del servidor)."""
+    return {
+        "question": request.question,
+        "strict": request.strict,
+        "include_citations": request.citations,
+        "code_hint": request.codigo,
+        "top_k": max(1, min(request.top_k, 5)),
+        "rerank": RERANK_DEFAULT if request.rerank is None else request.rerank,
+    }
 
 
 @app.post("/api/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     """
     Usa la base existente (Dataset/FAISS + Dataset/JSON) para devolver los artículos más cercanos.
-    Sustituye build_answer por tu pipeline Gemini si quieres generación neural encima de las evidencias.
-    """
-    return build_answer(
-        question=request.question,
-        strict=request.strict,
-        include_citations=request.citations,
-        code_hint=request.codigo,
-        top_k=max(1, min(request.top_k, 5)),
+    Con LEGALBOT_LLM=gemini se genera además una respuesta sobre las evidencias (ver /api/chat/stream).
+    La pregunta se codifica en el micro-batcher y la búsqueda corre en el pool de inferencia; si la
+    cola está llena responde 503 con Retry-After. La generación espera en un hilo aparte, sin
+    ocupar plaza en el pool ni contar para LEGALBOT_REQUEST_TIMEOUT_SECONDS.
+    """
+    args = chat_arguments(request)
+    cache_key = answer_cache_key(**args)
+    cached = answer_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        return cached
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + REQUEST_TIMEOUT_SECONDS
+    try:
+        vector = await asyncio.wait_for(question_vector(args["question"]), REQUEST_TIMEOUT_SECONDS)
+        evidence = await inference_pool.run(
+            collect_evidence,
+            question=args["question"],
+            code_hint=args["code_hint"],
+            top_k=args["top_k"],
+            rerank=args["rerank"],
+            vector=vector,
+            timeout=max(0.0, deadline - loop.time()),
+        )
+    except PoolSaturated:
+        errors_total.inc(kind="saturated")
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, intenta de nuevo en unos segundos.",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    except asyncio.TimeoutError:
+        errors_total.inc(kind="timeout")
+        raise HTTPException(status_code=504, detail="La consulta superó el tiempo máximo de respuesta.")
+    generated = await generate_answer(args["question"], evidence, args["strict"])
+    return finish_answer(cache_key, evidence, args["strict"], args["include_citations"], generated)
+
+
+@app.post("/api/chat/batch", response_model=List[ChatResponse])
+async def chat_batch(requests: List[ChatRequest]):
+    """
+    Varias consultas en una sola petición (FAQ, auditorías de recuperación); respuestas en el mismo orden.
+    Las preguntas se codifican en un solo batch y cada índice recibe una única búsqueda multi-fila,
+    así que el coste crece con el tamaño del lote y no con el número de peticiones. La recuperación
+    ocupa una plaza del pool de inferencia y tiene su propio timeout (LEGALBOT_BATCH_TIMEOUT_SECONDS);
+    con LEGALBOT_LLM se generan después, fuera del pool, como mucho LEGALBOT_LLM_BATCH_CONCURRENCY a la vez.
+    """
+    if len(requests) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_MAX_QUESTIONS} preguntas por lote.")
+    if not requests:
+        return []
+    arguments = [chat_arguments(request) for request in requests]
+    keys = [answer_cache_key(**args) for args in arguments]
+    responses: List[Optional[ChatResponse]] = [answer_cache.get(key) if key is not None else None for key in keys]
+    pending = [pos for pos, response in enumerate(responses) if response is None]
+    evidences: List[Evidence] = []
+    try:
+        if pending:
+            evidences = await inference_pool.run(
+                collect_evidences, [arguments[pos] for pos in pending], timeout=BATCH_TIMEOUT_SECONDS
+            )
+    except PoolSaturated:
+        errors_total.inc(kind="saturated")
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, intenta de nuevo en unos segundos.",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    except asyncio.TimeoutError:
+        errors_total.inc(kind="timeout")
+        raise HTTPException(status_code=504, detail="El lote superó el tiempo máximo de respuesta.")
+
+    slots = asyncio.Semaphore(LLM_BATCH_CONCURRENCY)
+
+    async def finish(pos: int, evidence: Evidence) -> None:
+        args = arguments[pos]
+        async with slots:
+            generated = await generate_answer(args["question"], evidence, args["strict"])
+        responses[pos] = finish_answer(keys[pos], evidence, args["strict"], args["include_citations"], generated)
+
+    await asyncio.gather(*(finish(pos, evidence) for pos, evidence in zip(pending, evidences)))
+    return responses
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    /api/chat por server-sent events, para mostrar la respuesta según se construye:
+    ``code`` (códigos detectados, al instante), un ``evidence`` por artículo en cuanto termina la
+    recuperación, ``token`` por fragmento generado (solo con LEGALBOT_LLM) y ``done`` con la
+    ChatResponse completa. Saturación o timeout llegan como ``error`` (status 503/504) y cierran el stream.
+    """
+    args = chat_arguments(request)
+    question = args["question"]
+
+    async def events() -> AsyncIterator[str]:
+        detected = detect_codes(question)
+        yield sse_event("code", {"codes": select_codes(detected, request.codigo), "detected": detected})
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REQUEST_TIMEOUT_SECONDS
+        try:
+            vector = await asyncio.wait_for(question_vector(question), REQUEST_TIMEOUT_SECONDS)
+            evidence = await inference_pool.run(
+                collect_evidence,
+                question=question,
+                code_hint=request.codigo,
+                top_k=args["top_k"],
+                rerank=args["rerank"],
+                detected=detected,
+                vector=vector,
+                timeout=max(0.0, deadline - loop.time()),
+            )
+        except PoolSaturated:
+            errors_total.inc(kind="saturated")
+            yield sse_event(
+                "error",
+                {"status": 503, "detail": "Servidor ocupado, intenta de nuevo en unos segundos.", "retry_after": RETRY_AFTER_SECONDS},
+            )
+            return
+        except asyncio.TimeoutError:
+            errors_total.inc(kind="timeout")
+            yield sse_event("error", {"status": 504, "detail": "La consulta superó el tiempo máximo de respuesta."})
+            return
+
+        bullets = []
+        for rank, (score, doc, item) in enumerate(evidence.hits, start=1):
+            bullets.append(evidence_bullet(doc, item))
+            yield sse_event(
+                "evidence",
+                {
+                    "rank": rank,
+                    "score": float(score),
+                    "bullet": bullets[-1],
+                    "source": evidence_source(doc, item).model_dump() if request.citations else None,
+                },
+            )
+
+        generated: List[str] = []
+        generator = get_generator()
+        if generator is not None and evidence.hits:
+            chunks = generator.stream(question, bullets, request.strict)
+            try:
+                # Cada fragmento se espera en un hilo: la API del LLM es bloqueante y no usa el pool de CPU.
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    generated.append(chunk)
+                    yield sse_event("token", {"text": chunk})
+            except Exception as exc:
+                errors_total.inc(kind="generation")
+                print(f"[WARN] Falló la generación en streaming: {exc}")
+                yield sse_event("error", {"status": 502, "detail": "Falló la generación; se mantienen las evidencias."})
+
+        response = compose_answer(evidence, request.strict, request.citations, "".join(generated))
+        yield sse_event("done", response.model_dump())
+
+    # X-Accel-Buffering: que un nginx delante no acumule los eventos
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
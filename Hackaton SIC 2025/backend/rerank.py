@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+class Reranker:
+    """Reordena candidatos con un cross-encoder, por lotes y con presupuesto de tiempo.
+
+    Los candidatos se puntúan en el orden de la primera etapa. Antes de cada lote se estima si
+    cabe en el presupuesto (con lo que tardó el anterior); si no cabe, o si algo falla, se devuelve
+    el orden original. Así la latencia queda acotada por el presupuesto más, como mucho, la
+    desviación de un lote.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[Tuple[str, str]]], Any], batch_size: int = 16, budget_ms: float = 250):
+        self._predict = predict_fn
+        self.batch_size = max(1, batch_size)
+        self.budget_ms = budget_ms
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "completed": 0, "budget_exceeded": 0, "error": 0}
+
+    def rerank(
+        self, question: str, candidates: Sequence[T], texts: Sequence[str], top_k: int
+    ) -> Tuple[List[Tuple[Optional[float], T]], Dict[str, Any]]:
+        """Devuelve ``(score, candidato)`` de los ``top_k`` mejores y la información del paso.
+
+        Si no se completa, el score es ``None`` y el orden es el de ``candidates``.
+        """
+        start = time.perf_counter()
+        budget = self.budget_ms / 1000
+        scores: List[float] = []
+        status = "completed"
+        last_batch = 0.0
+        try:
+            for offset in range(0, len(candidates), self.batch_size):
+                elapsed = time.perf_counter() - start
+                if elapsed + last_batch > budget:
+                    status = "budget_exceeded"
+                    break
+                batch_start = time.perf_counter()
+                pairs = [(question, text) for text in texts[offset : offset + self.batch_size]]
+                scores.extend(float(s) for s in np.asarray(self._predict(pairs)).reshape(-1))
+                last_batch = time.perf_counter() - batch_start
+        except Exception as exc:  # pragma: no cover - solo log
+            print(f"[WARN] Falló el rerank, se usa el orden original: {exc}")
+            status = "error"
+
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts[status] += 1
+
+        info = {
+            "status": status,
+            "candidates": len(candidates),
+            "scored": len(scores),
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        if status != "completed":
+            return [(None, c) for c in candidates[:top_k]], info
+        order = np.argsort(-np.asarray(scores), kind="stable")[:top_k]
+        return [(scores[i], candidates[i]) for i in order], info
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "batch_size": self.batch_size, "budget_ms": self.budget_ms}
@@ -0,0 +1,44 @@
+from pathlib import Path
+from typing import List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+def load_centroids(dir_path: Path, dim: int) -> Optional[np.ndarray]:
+    """centroids.npy (k × dim, norma 1) escrito por la construcción; None si falta o no cuadra."""
+    path = dir_path / "centroids.npy"
+    if not path.exists():
+        return None
+    centroids = np.load(path)
+    if centroids.ndim != 2 or centroids.shape[1] != dim:
+        print(f"[WARN] {dir_path.name}: centroids.npy con forma {centroids.shape}; se ignora.")
+        return None
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+
+class CentroidRouter:
+    """Elige los códigos más parecidos a la pregunta por coseno contra los centroides de cada código.
+
+    Todos los centroides van en una matriz (``owners`` dice de qué código es cada fila), así que
+    enrutar es un producto matriz-vector de ~40 × 384 más un máximo por código.
+    """
+
+    def __init__(self, centroids: Mapping[str, np.ndarray]):
+        self.codes: List[str] = list(centroids)
+        self.matrix = np.concatenate([centroids[code_id] for code_id in self.codes]).astype(np.float32)
+        self.owners = np.concatenate(
+            [np.full(len(centroids[code_id]), pos, dtype=np.int32) for pos, code_id in enumerate(self.codes)]
+        )
+
+    def scores(self, vector: np.ndarray) -> np.ndarray:
+        """Similitud de cada código (mejor centroide) con ``vector``, en el orden de ``codes``."""
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        best = np.full(len(self.codes), -np.inf, dtype=np.float32)
+        np.maximum.at(best, self.owners, self.matrix @ query)
+        return best
+
+    def route(self, vector: np.ndarray, limit: int = 3) -> List[Tuple[str, float]]:
+        scores = self.scores(vector)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.codes[i], float(scores[i])) for i in order]
@@ -0,0 +1,161 @@
+"""
+Proceso shard del modo distribuido: carga parte de Dataset/FAISS/<código> y atiende por RPC las
+búsquedas del coordinador (main.py con LEGALBOT_SHARDS). No carga el modelo: recibe los vectores.
+
+    python shard_worker.py --codes codigo_penal,codigo_civil --port 9101
+    python shard_worker.py --local 3 --base-port 9101   # todos los códigos repartidos en 3 procesos
+
+LEGALBOT_SHARD_AUTHKEY es obligatoria (la misma en todos los procesos). Con --local, si no está
+definida, se genera una aleatoria para los shards lanzados. En los dos casos se imprimen las
+variables para arrancar el coordinador, p. ej.:
+
+    LEGALBOT_SHARD_AUTHKEY=... LEGALBOT_SHARDS=127.0.0.1:9101,127.0.0.1:9102 uvicorn main:app --port 8000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import indexes
+from indexes import LoadedIndex, dense_search, index_fingerprint, lexical_search, load_indexes
+from shards import AUTHKEY_ENV, ShardServer, new_authkey, require_authkey
+from snapshots import SnapshotManager
+
+# Como en main.py: sondeo de Dataset/FAISS para recargar sin el coordinador (0 = solo por RPC "reload")
+RELOAD_POLL_SECONDS = float(os.getenv("LEGALBOT_RELOAD_POLL_SECONDS", "0"))
+
+
+def split_codes(faiss_root: Path, shards: int) -> List[List[str]]:
+    """Reparte los códigos en ``shards`` grupos de tamaño parecido (por bytes de index.faiss)."""
+    sizes = {
+        d.name: (d / "index.faiss").stat().st_size
+        for d in faiss_root.iterdir()
+        if d.is_dir() and not d.name.startswith("_") and (d / "index.faiss").exists()
+    }
+    groups: List[List[str]] = [[] for _ in range(shards)]
+    loads = [0] * shards
+    for code_id in sorted(sizes, key=lambda c: -sizes[c]):
+        target = loads.index(min(loads))
+        groups[target].append(code_id)
+        loads[target] += sizes[code_id]
+    return [group for group in groups if group]
+
+
+class ShardHandlers:
+    """Métodos RPC de un shard sobre su propio snapshot de índices (recargable como el del backend)."""
+
+    def __init__(self, codes: Optional[Sequence[str]]):
+        self.snapshots: SnapshotManager[Dict[str, LoadedIndex]] = SnapshotManager(
+            lambda: load_indexes(only=codes), index_fingerprint
+        )
+
+    def methods(self) -> dict:
+        return {"info": self.info, "search": self.search, "articles": self.articles, "reload": self.reload}
+
+    def info(self) -> Dict[str, dict]:
+        return {
+            code_id: {
+                "code_name": item.code_name,
+                "metric": item.metric,
+                "lexical": item.lexical is not None,
+                "centroids": item.centroids,
+            }
+            for code_id, item in self.snapshots.current().value.items()
+        }
+
+    def search(self, vectors: np.ndarray, queries: List[dict]) -> List[dict]:
+        """Por consulta: los ``depth`` mejores artículos de sus códigos y, con ``tokens``, los de BM25."""
+        with self.snapshots.pin() as snapshot:
+            indexes = snapshot.value
+            targets = [[indexes[code_id] for code_id in query["codes"] if code_id in indexes] for query in queries]
+            searchable = [pos for pos, items in enumerate(targets) if items]
+            found = dense_search(
+                [targets[pos] for pos in searchable], vectors[searchable], [queries[pos]["depth"] for pos in searchable]
+            )
+            dense = dict(zip(searchable, found))
+
+            replies = []
+            for pos, query in enumerate(queries):
+                candidates = dense.get(pos, {})
+                reverse = bool(targets[pos]) and targets[pos][0].metric == "ip"
+                ranking = sorted(candidates, key=lambda key: candidates[key][0], reverse=reverse)[: query["depth"]]
+                lexical = lexical_search(query["tokens"], targets[pos], query["depth"]) if query["tokens"] else []
+                replies.append(
+                    {
+                        "dense": [(candidates[key][0], key[0], key[1], candidates[key][1]) for key in ranking],
+                        "lexical": [(score, key[0], key[1], item.docs[key[1]]) for score, key, item in lexical],
+                    }
+                )
+            return replies
+
+    def articles(self, code_id: str, numbers: List[str]) -> Dict[str, List[dict]]:
+        item = self.snapshots.current().value.get(code_id)
+        if item is None:
+            return {}
+        return {n: [item.docs[row] for row in item.articles[n]] for n in numbers if n in item.articles}
+
+    def reload(self) -> int:
+        return self.snapshots.reload().version
+
+
+def launch_local(shards: int, host: str, base_port: int, faiss_root: Path) -> None:
+    """Arranca un proceso por grupo de códigos en este equipo y espera (Ctrl+C los detiene)."""
+    groups = split_codes(faiss_root, shards)
+    env = dict(os.environ)
+    generated = not env.get(AUTHKEY_ENV)
+    if generated:
+        env[AUTHKEY_ENV] = new_authkey()
+    processes = []
+    addresses = []
+    for pos, codes in enumerate(groups):
+        port = base_port + pos
+        addresses.append(f"{host}:{port}")
+        print(f"[SHARD] {host}:{port} -> {', '.join(codes)}")
+        processes.append(
+            subprocess.Popen(
+                [sys.executable, __file__, "--codes", ",".join(codes), "--host", host, "--port", str(port),
+                 "--faiss-root", str(faiss_root)],
+                env=env,
+            )
+        )
+    key = f"{AUTHKEY_ENV}={env[AUTHKEY_ENV]} " if generated else ""  # la del entorno no se imprime
+    print(f"\n{key}LEGALBOT_SHARDS={','.join(addresses)}\n")
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proceso shard de búsqueda (modo distribuido).")
+    parser.add_argument("--codes", default="", help="códigos separados por comas (vacío = todos)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--local", type=int, default=0, help="lanzar N shards locales con todos los códigos")
+    parser.add_argument("--base-port", type=int, default=9101)
+    parser.add_argument("--faiss-root", type=Path, default=indexes.FAISS_ROOT)
+    args = parser.parse_args()
+
+    indexes.FAISS_ROOT = args.faiss_root
+    if args.local:
+        launch_local(args.local, args.host, args.base_port, args.faiss_root)
+        sys.exit(0)
+
+    authkey = require_authkey()
+    handlers = ShardHandlers([c for c in args.codes.split(",") if c] or None)
+    handlers.snapshots.current()  # cargar antes de aceptar conexiones
+    if RELOAD_POLL_SECONDS > 0:
+        threading.Thread(
+            target=handlers.snapshots.watch,
+            args=(RELOAD_POLL_SECONDS, threading.Event()),
+            name="index-watch",
+            daemon=True,
+        ).start()
+    ShardServer((args.host, args.port), authkey, handlers.methods()).serve_forever()
@@ -0,0 +1,314 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from queue import Empty, SimpleQueue
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+Address = Tuple[str, int]
+
+# Clave HMAC de las tramas; la misma en el coordinador (main.py) y en todos los shard_worker.py.
+# Sin valor por defecto: una clave conocida dejaría a cualquiera con acceso al puerto hablar con
+# los shards. ``require_authkey`` corta el arranque si falta.
+AUTHKEY_ENV = "LEGALBOT_SHARD_AUTHKEY"
+SHARD_AUTHKEY = os.getenv(AUTHKEY_ENV, "").encode("utf-8")
+
+# Trama: longitud (8 bytes) + HMAC-SHA256 del cuerpo + cuerpo. El cuerpo es longitud del JSON
+# (4 bytes) + JSON + bytes crudos de los arrays numpy, que en el JSON van como
+# {"__ndarray__": [dtype, forma, offset]}. Nada se deserializa como objeto Python: sin la clave
+# solo se puede enviar JSON, y con ella tampoco se ejecuta código. La firma se comprueba igual
+# antes de decodificar.
+_HEADER = struct.Struct("!Q")
+_JSON_HEADER = struct.Struct("!I")
+_DIGEST_SIZE = hashlib.sha256().digest_size
+_ARRAY_KEY = "__ndarray__"
+_ARRAY_DTYPES = {"float32", "float64", "int32", "int64", "bool"}
+
+
+# Errores de un socket del pool que el otro extremo ya cerró; firma incorrecta o trama rota no entran
+_STALE_ERRORS = (EOFError, ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+
+class ShardError(Exception):
+    """El shard devolvió un error, cerró la conexión o no respondió a tiempo."""
+
+
+def parse_address(text: str) -> Address:
+    """"host:puerto" o ":puerto" (localhost)."""
+    host, _, port = text.strip().rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def require_authkey() -> bytes:
+    """La clave de ``LEGALBOT_SHARD_AUTHKEY``; sin ella no arranca ni un shard ni el coordinador."""
+    if not SHARD_AUTHKEY:
+        raise RuntimeError(
+            f"{AUTHKEY_ENV} no está definida: es obligatoria en el modo distribuido "
+            f"(la misma en main.py y en todos los shard_worker.py)."
+        )
+    return SHARD_AUTHKEY
+
+
+def new_authkey() -> str:
+    """Clave aleatoria para los shards que lanza ``shard_worker.py --local``."""
+    return secrets.token_urlsafe(32)
+
+
+def encode_body(obj: Any) -> bytes:
+    """JSON + bytes de los arrays. Las tuplas llegan como listas y los escalares numpy como números."""
+    blobs: List[bytes] = []
+    offset = 0
+
+    def default(value: Any) -> Any:
+        nonlocal offset
+        if isinstance(value, np.ndarray):
+            data = np.ascontiguousarray(value)
+            if data.dtype.name not in _ARRAY_DTYPES:
+                raise TypeError(f"array de tipo {data.dtype} no admitido en las tramas")
+            marker = {_ARRAY_KEY: [data.dtype.name, list(data.shape), offset]}
+            blobs.append(data.tobytes())
+            offset += data.nbytes
+            return marker
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"{type(value).__name__} no se puede enviar a un shard")
+
+    header = json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _JSON_HEADER.pack(len(header)) + header + b"".join(blobs)
+
+
+def decode_body(body: bytes) -> Any:
+    (size,) = _JSON_HEADER.unpack_from(body)
+    start = _JSON_HEADER.size + size
+    data = memoryview(body)[start:]
+
+    def hook(value: dict) -> Any:
+        if _ARRAY_KEY not in value:
+            return value
+        dtype, shape, offset = value[_ARRAY_KEY]
+        if dtype not in _ARRAY_DTYPES:
+            raise ValueError(f"array de tipo {dtype} no admitido en las tramas")
+        count = int(np.prod(shape, dtype=np.int64))
+        # copy(): el array no se queda atado al búfer de la trama y se puede escribir
+        return np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape).copy()
+
+    return json.loads(bytes(body[_JSON_HEADER.size:start]).decode("utf-8"), object_hook=hook)
+
+
+def send_frame(sock: socket.socket, authkey: bytes, obj: Any) -> None:
+    body = encode_body(obj)
+    digest = hmac.new(authkey, body, hashlib.sha256).digest()
+    sock.sendall(_HEADER.pack(len(body)) + digest + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError("conexión cerrada")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket, authkey: bytes) -> Any:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    digest = _recv_exact(sock, _DIGEST_SIZE)
+    body = _recv_exact(sock, size)
+    if not hmac.compare_digest(digest, hmac.new(authkey, body, hashlib.sha256).digest()):
+        raise ConnectionError(f"firma incorrecta (¿{AUTHKEY_ENV} distinta?)")
+    try:
+        return decode_body(body)
+    except (ValueError, TypeError, struct.error) as exc:
+        raise ConnectionError(f"trama mal formada ({exc})") from exc
+
+
+class ShardClient:
+    """Llamadas RPC a un shard sobre TCP (tramas JSON + arrays firmadas con la authkey).
+
+    Las conexiones se reutilizan desde un pool; una conexión que falla o se queda sin respuesta
+    se cierra, para no leer después la respuesta de otra llamada. Conectar, enviar y recibir
+    tienen todos el mismo timeout: un shard colgado nunca bloquea el hilo más de eso. Si un socket
+    del pool resulta estar cerrado por el shard, se reintenta una vez con uno nuevo (``retries``).
+    """
+
+    def __init__(self, address: Address, authkey: bytes, timeout: float):
+        self.address = address
+        self.name = f"{address[0]}:{address[1]}"
+        self._authkey = authkey
+        self.timeout = timeout
+        self._idle: "SimpleQueue[socket.socket]" = SimpleQueue()
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "errors": 0, "timeouts": 0, "retries": 0}
+        self.last_ms = 0.0
+
+    def _connection(self, timeout: float, fresh: bool = False) -> Tuple[socket.socket, bool]:
+        """Un socket del pool (``True``) o uno nuevo (``False``)."""
+        if not fresh:
+            try:
+                sock = self._idle.get_nowait()
+                sock.settimeout(timeout)
+                return sock, True
+            except Empty:
+                pass
+        sock = socket.create_connection(self.address, timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, False
+
+    def _drop_idle(self) -> None:
+        """Cierra las conexiones del pool: tras un reinicio del shard todas están muertas."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+    def call(self, method: str, *args: Any, timeout: float = 0) -> Any:
+        """Un socket reutilizado que el shard ya cerró (se reinició) falla al instante con EOF o
+        reset: en ese caso se reintenta una vez con una conexión nueva. Las llamadas son idempotentes."""
+        start = time.perf_counter()
+        timeout = timeout or self.timeout
+        self._count("calls")
+        fresh = False
+        while True:
+            try:
+                sock, reused = self._connection(timeout, fresh)
+            except socket.timeout as exc:
+                self._count("timeouts")
+                raise ShardError(f"{self.name}: sin conexión en {timeout}s") from exc
+            except OSError as exc:
+                self._count("errors")
+                raise ShardError(f"{self.name}: sin conexión ({exc})") from exc
+            try:
+                send_frame(sock, self._authkey, (method, args))
+                status, result = recv_frame(sock, self._authkey)
+            except socket.timeout as exc:
+                self._count("timeouts")
+                sock.close()
+                raise ShardError(f"{self.name}: sin respuesta en {timeout}s") from exc
+            except (OSError, EOFError) as exc:
+                sock.close()
+                if reused and isinstance(exc, _STALE_ERRORS):
+                    self._drop_idle()
+                    self._count("retries")
+                    fresh = True
+                    continue
+                self._count("errors")
+                raise ShardError(f"{self.name}: conexión perdida ({exc})") from exc
+            break
+        self._idle.put(sock)
+        self.last_ms = round((time.perf_counter() - start) * 1000, 2)
+        if status != "ok":
+            self._count("errors")
+            raise ShardError(f"{self.name}: {result}")
+        return result
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "last_ms": self.last_ms}
+
+
+class ShardPool:
+    """Clientes de todos los shards y un executor para consultarlos en paralelo (scatter-gather)."""
+
+    def __init__(self, addresses: Sequence[Address], authkey: bytes, timeout_ms: float):
+        self.timeout = timeout_ms / 1000
+        self.clients = {client.name: client for client in (ShardClient(a, authkey, self.timeout) for a in addresses)}
+        # Varias peticiones concurrentes hacen scatter a la vez: si los hilos no alcanzaran, una
+        # llamada esperaría en cola y se contaría como timeout sin que el shard tuviera la culpa
+        self._executor = ThreadPoolExecutor(max_workers=8 * max(1, len(self.clients)), thread_name_prefix="shard")
+
+    def scatter(self, calls: Dict[str, Tuple[str, tuple]]) -> Tuple[Dict[str, Any], List[str]]:
+        """Lanza ``{shard: (método, args)}`` a la vez y espera como máximo el timeout por shard.
+
+        Devuelve las respuestas recibidas y los shards que fallaron o no llegaron a tiempo.
+        """
+        futures = {
+            name: self._executor.submit(self.clients[name].call, method, *args) for name, (method, args) in calls.items()
+        }
+        # Pequeño margen sobre el timeout del cliente, que es quien cierra la conexión
+        wait(futures.values(), timeout=self.timeout + 0.05)
+        results: Dict[str, Any] = {}
+        failed: List[str] = []
+        for name, future in futures.items():
+            if not future.done():
+                failed.append(name)
+                continue
+            try:
+                results[name] = future.result()
+            except ShardError as exc:
+                print(f"[WARN] Shard sin resultado: {exc}")
+                failed.append(name)
+        return results, failed
+
+    def stats(self) -> dict:
+        return {name: client.stats() for name, client in self.clients.items()}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ShardRequestHandler(socketserver.BaseRequestHandler):
+    server: "_ThreadingServer"
+
+    def handle(self) -> None:
+        sock: socket.socket = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        authkey, handlers = self.server.authkey, self.server.handlers
+        while True:
+            try:
+                method, args = recv_frame(sock, authkey)
+            except ConnectionError as exc:  # firma incorrecta o trama rota: se corta la conexión
+                print(f"[WARN] Conexión rechazada de {self.client_address[0]}: {exc}")
+                return
+            except (EOFError, OSError):
+                return
+            handler = handlers.get(method)
+            try:
+                if handler is None:
+                    raise ValueError(f"método desconocido: {method}")
+                reply = ("ok", handler(*args))
+            except Exception as exc:
+                reply = ("error", f"{type(exc).__name__}: {exc}")
+            try:
+                send_frame(sock, authkey, reply)
+            except OSError:
+                return
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Address, authkey: bytes, handlers: Dict[str, Callable[..., Any]]):
+        self.authkey = authkey
+        self.handlers = handlers
+        super().__init__(address, _ShardRequestHandler)
+
+
+class ShardServer:
+    """Atiende ``(método, args)`` -> ``("ok", resultado)`` o ``("error", mensaje)``, un hilo por conexión."""
+
+    def __init__(self, address: Address, authkey: bytes, handlers: Dict[str, Callable[..., Any]]):
+        self.address = address
+        self._authkey = authkey
+        self._handlers = handlers
+
+    def serve_forever(self) -> None:
+        with _ThreadingServer(self.address, self._authkey, self._handlers) as server:
+            print(f"[SHARD] Escuchando en {self.address[0]}:{self.address[1]}")
+            server.serve_forever()
@@ -0,0 +1,174 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Hashable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(eq=False)
+class Snapshot(Generic[T]):
+    version: int
+    value: T
+    fingerprint: Hashable = None
+    loaded_at: float = field(default_factory=time.time)
+    active: int = 0  # peticiones que lo tienen fijado
+
+
+class SnapshotManager(Generic[T]):
+    """Versiones inmutables de un estado cargado (los índices) con cambio atómico.
+
+    Cada petición fija el snapshot vigente al empezar (``pin``) y lo usa hasta el final, aunque
+    mientras tanto se publique otro: ``reload`` carga el nuevo aparte y solo entonces cambia la
+    referencia. El anterior queda "drenando" hasta que la última petición que lo fijó termina y,
+    sin más referencias, Python lo libera.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], T],
+        fingerprint: Optional[Callable[[], Hashable]] = None,
+        on_publish: Optional[Callable[[], None]] = None,
+    ):
+        self._loader = loader
+        self._fingerprint = fingerprint or (lambda: None)
+        self._on_publish = on_publish
+        self._current: Optional[Snapshot[T]] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()  # contadores y referencia actual
+        self._load_lock = threading.Lock()  # una carga a la vez
+        self._draining: "weakref.WeakSet[Snapshot[T]]" = weakref.WeakSet()
+        self._reloader: Optional[threading.Thread] = None
+        self._version = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    def current(self) -> Snapshot[T]:
+        """El snapshot fijado en este hilo o, si no hay, el vigente (se carga la primera vez)."""
+        pinned = getattr(self._local, "snapshot", None)
+        if pinned is not None:
+            return pinned
+        current = self._current
+        if current is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._publish(self._load())
+            current = self._current
+        return current
+
+    def current_version(self) -> Optional[int]:
+        """Versión del snapshot fijado o vigente, sin cargar ni esperar a una carga (None si aún no
+        hay ninguno). Apta para el event loop, donde ``current`` podría bloquear."""
+        pinned = getattr(self._local, "snapshot", None)
+        if pinned is not None:
+            return pinned.version
+        current = self._current
+        return current.version if current is not None else None
+
+    @contextmanager
+    def pin(self) -> Iterator[Snapshot[T]]:
+        """Fija el snapshot vigente en el hilo; las llamadas anidadas reutilizan el mismo."""
+        if getattr(self._local, "snapshot", None) is not None:
+            yield self._local.snapshot
+            return
+        snapshot = self.current()
+        with self._lock:
+            snapshot.active += 1
+        self._local.snapshot = snapshot
+        try:
+            yield snapshot
+        finally:
+            self._local.snapshot = None
+            with self._lock:
+                snapshot.active -= 1
+
+    def _load(self) -> Snapshot[T]:
+        fingerprint = self._fingerprint()  # antes de leer: un cambio durante la carga se vuelve a detectar
+        start = time.perf_counter()
+        value = self._loader()
+        self.last_seconds = round(time.perf_counter() - start, 3)
+        self._version += 1
+        return Snapshot(self._version, value, fingerprint)
+
+    def _publish(self, snapshot: Snapshot[T]) -> None:
+        with self._lock:
+            previous, self._current = self._current, snapshot
+            if previous is not None:
+                self._draining.add(previous)
+        if self._on_publish is not None:
+            self._on_publish()
+
+    def reload(self) -> Snapshot[T]:
+        """Carga un snapshot nuevo y lo publica; si la carga falla, el vigente sigue sirviendo."""
+        with self._load_lock:
+            try:
+                snapshot = self._load()
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = str(exc)
+                raise
+            self._publish(snapshot)
+            self.reloads += 1
+            self.last_error = None
+            return snapshot
+
+    def reload_in_background(self) -> bool:
+        """Lanza ``reload`` en un hilo; False si ya hay una recarga en curso."""
+        with self._lock:
+            if self._reloader is not None and self._reloader.is_alive():
+                return False
+            self._reloader = threading.Thread(target=self._reload_logged, name="index-reload", daemon=True)
+            self._reloader.start()
+        return True
+
+    def _reload_logged(self) -> None:
+        try:
+            snapshot = self.reload()
+            print(f"[RELOAD] Snapshot {snapshot.version} publicado en {self.last_seconds}s")
+        except Exception as exc:  # pragma: no cover - solo log
+            print(f"[WARN] Falló la recarga, se mantiene el snapshot anterior: {exc}")
+
+    def watch(self, interval: float, stop: threading.Event) -> None:
+        """Sondea ``fingerprint`` cada ``interval`` s y recarga cuando cambia y se mantiene estable
+        dos sondeos seguidos (que no se recargue a mitad de una escritura)."""
+        previous = None
+        while not stop.wait(interval):
+            current = self._current
+            try:
+                fingerprint = self._fingerprint()
+            except OSError as exc:  # pragma: no cover - solo log
+                print(f"[WARN] No se pudieron leer los ficheros vigilados: {exc}")
+                continue
+            if current is not None and fingerprint != current.fingerprint and fingerprint == previous:
+                self._reload_logged()
+                previous = None
+                continue
+            previous = fingerprint
+
+    def stats(self) -> dict:
+        with self._lock:
+            current = self._current
+            draining = [
+                {"version": snapshot.version, "active": snapshot.active}
+                for snapshot in sorted(self._draining, key=lambda s: s.version)
+            ]
+            reloading = self._reloader is not None and self._reloader.is_alive()
+        return {
+            "version": current.version if current else None,
+            "loaded_at": current.loaded_at if current else None,
+            "active": current.active if current else 0,
+            "draining": draining,
+            "reloading": reloading,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_load_seconds": self.last_seconds,
+        }
@@ -0,0 +1,77 @@
+"""
+Pruebas de las citas de artículos (articles.py): números canónicos y ``parse_article_refs`` con
+romanos, bis/ter, rangos y listas.
+
+    python test_articles.py
+    python -m pytest test_articles.py
+"""
+from articles import article_key, build_article_map, canonical_number, parse_article_refs, roman_to_int
+
+
+def test_canonical_number():
+    assert canonical_number("045") == "45"
+    assert canonical_number("12-a") == canonical_number("12 - A") == canonical_number("12a") == "12A"
+    assert canonical_number("12 bis") == canonical_number("12-BIS") == "12BIS"
+    assert canonical_number("7 ter") == "7TER" and canonical_number("3 quáter") == "3QUATER"
+    assert canonical_number("IV") == canonical_number("iv") == "4"
+    for text in ("", "artículo", "12 ab", "IIII", "VX", "x12"):
+        assert canonical_number(text) is None, text
+
+
+def test_roman_to_int():
+    assert [roman_to_int(t) for t in ("I", "IX", "XIV", "XL", "XCIX", "CCCXCIX")] == [1, 9, 14, 40, 99, 399]
+    assert [roman_to_int(t) for t in ("", "IC", "IIX", "VV", "LL", "D")] == [None] * 6
+
+
+def test_article_key_matches_canonical_number():
+    # articles.json y las consultas tienen que usar la misma clave
+    for stored in ("12-a", "12 bis", "045", "7"):
+        assert article_key(stored) == canonical_number(stored)
+    assert article_key("Transitorio único") == "TRANSITORIOÚNICO"
+    assert build_article_map([{"articulo": "1"}, {"articulo": "1-A"}, {"articulo": "1"}]) == {"1": [0, 2], "1A": [1]}
+
+
+def test_single_references():
+    assert parse_article_refs("¿Qué dice el artículo 25 del Código de la Familia?") == ["25"]
+    assert parse_article_refs("art. 12-A del código") == ["12A"]
+    assert parse_article_refs("Art. Nº 045") == ["45"]
+    assert parse_article_refs("artículo 12 bis del Código de Comercio") == ["12BIS"]
+    assert parse_article_refs("articulo 7-ter") == ["7TER"]
+    assert parse_article_refs("¿Qué dice el artículo XIV?") == ["14"]
+    assert parse_article_refs("artículo vi del código civil") == ["6"]
+
+
+def test_lists():
+    assert parse_article_refs("arts. 25 y 26") == ["25", "26"]
+    assert parse_article_refs("artículos 10, 11 y 12 y de nuevo el artículo 10") == ["10", "11", "12"]
+    assert parse_article_refs("artículo 3 o 4") == ["3", "4"]
+    assert parse_article_refs("artículos 5-A e 8 bis") == ["5A", "8BIS"]
+
+
+def test_ranges():
+    assert parse_article_refs("artículos 10 al 13") == ["10", "11", "12", "13"]
+    assert parse_article_refs("artículos 10 a 12 y 20") == ["10", "11", "12", "20"]
+    assert parse_article_refs("arts. 5-8") == ["5", "6", "7", "8"]
+    assert parse_article_refs("artículos I a III") == ["1", "2", "3"]
+    # Rangos demasiado largos, al revés o con sufijo: solo los extremos
+    assert parse_article_refs("artículos 1 a 500") == ["1", "500"]
+    assert parse_article_refs("artículos 12 a 10") == ["12", "10"]
+    assert parse_article_refs("artículos 4 bis a 6") == ["4BIS", "6"]
+
+
+def test_text_without_references():
+    for question in (
+        "¿Qué derechos tengo si me quieren quitar mi casa?",
+        "el artículo de la ley",
+        "artículo di",
+        "artículos mil",
+        "hola",
+    ):
+        assert parse_article_refs(question) == [], question
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
@@ -0,0 +1,124 @@
+"""
+Pruebas del micro-batcher de embeddings (batcher.py): agrupación de preguntas concurrentes,
+errores repartidos a todos los futuros del batch y límite de preguntas pendientes.
+
+El "modelo" es una función que devuelve la longitud de cada texto y puede quedarse esperando
+a un evento, para acumular preguntas en la cola de forma determinista.
+
+    python test_batcher.py
+    python -m pytest test_batcher.py
+"""
+import threading
+
+import numpy as np
+
+from batcher import EmbeddingBatcher
+from inference import PoolSaturated
+
+
+class FakeModel:
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.fail_on = fail_on
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        if self.fail_on in texts:
+            raise RuntimeError("modelo roto")
+        return np.asarray([[len(text), 1.0] for text in texts])
+
+
+def hold_first_batch(model, batcher):
+    """Deja un batch de una pregunta en el modelo, bloqueado, y devuelve su futuro."""
+    model.release.clear()
+    first = batcher.submit("primera")
+    assert model.started.wait(5)
+    return first
+
+
+def test_concurrent_questions_share_a_batch():
+    model = FakeModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=50)
+    first = hold_first_batch(model, batcher)
+    futures = [batcher.submit("x" * n) for n in range(1, 6)]
+    model.release.set()
+
+    assert first.result(5).tolist() == [[7.0, 1.0]]
+    for n, future in enumerate(futures, start=1):
+        vector = future.result(5)
+        assert vector.shape == (1, 2) and vector.dtype == np.float32 and vector[0, 0] == n
+    assert model.batches == [["primera"], ["x", "xx", "xxx", "xxxx", "xxxxx"]]
+    assert batcher.encode("abc").tolist() == [[3.0, 1.0]]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["requests"], stats["max_batch_seen"]) == (3, 7, 5)
+
+
+def test_max_batch_size_splits_the_queue():
+    model = FakeModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=2, max_wait_ms=50)
+    hold_first_batch(model, batcher)
+    futures = [batcher.submit(str(n)) for n in range(5)]
+    model.release.set()
+    for future in futures:
+        future.result(5)
+    assert [len(batch) for batch in model.batches] == [1, 2, 2, 1]
+
+
+def test_error_reaches_every_future_in_the_batch():
+    model = FakeModel(fail_on="rota")
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=50)
+    hold_first_batch(model, batcher)
+    futures = [batcher.submit(text) for text in ("a", "rota", "b")]
+    model.release.set()
+    for future in futures:
+        try:
+            future.result(5)
+        except RuntimeError as exc:
+            assert str(exc) == "modelo roto"
+        else:
+            raise AssertionError("todas las preguntas del batch debían fallar")
+    # El hilo del batcher sigue vivo para las siguientes
+    assert batcher.encode("ok").tolist() == [[2.0, 1.0]]
+
+
+def test_cancelled_future_is_not_encoded():
+    model = FakeModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=50)
+    hold_first_batch(model, batcher)
+    cancelled, kept = batcher.submit("cancelada"), batcher.submit("sigue")
+    assert cancelled.cancel()
+    model.release.set()
+    kept.result(5)
+    assert ["sigue"] in model.batches and all("cancelada" not in batch for batch in model.batches)
+
+
+def test_pending_limit_raises_pool_saturated():
+    model = FakeModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=50, max_pending=2)
+    first = hold_first_batch(model, batcher)
+    second = batcher.submit("segunda")
+    try:
+        batcher.submit("tercera")
+    except PoolSaturated:
+        pass
+    else:
+        raise AssertionError("con 2 pendientes la tercera debía rechazarse")
+    model.release.set()
+    first.result(5)
+    second.result(5)
+    # Las plazas se liberan al resolverse los futuros
+    assert batcher.encode("cuarta").shape == (1, 2)
+    stats = batcher.stats()
+    assert (stats["pending"], stats["rejected"]) == (0, 1)
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
@@ -0,0 +1,62 @@
+"""
+Pruebas de la caché de consultas (cache.py): expiración por TTL, desalojo LRU y normalización
+de preguntas.
+
+    python test_cache.py
+    python -m pytest test_cache.py
+"""
+import time
+
+from cache import TTLCache, normalize_question
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=4, ttl_seconds=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    # La entrada caducada se borra al leerla
+    assert cache.stats()["size"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_put_renews_ttl():
+    cache = TTLCache(maxsize=4, ttl_seconds=0.1)
+    cache.put("a", 1)
+    time.sleep(0.06)
+    cache.put("a", 2)
+    time.sleep(0.06)
+    assert cache.get("a") == 2
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" pasa a ser la más reciente
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.put("a", 10)  # reescribir también cuenta como uso
+    cache.put("d", 4)
+    assert cache.get("c") is None and cache.get("a") == 10
+    assert cache.stats()["size"] == 2
+
+
+def test_zero_maxsize_disables_cache():
+    cache = TTLCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and cache.stats()["size"] == 0
+
+
+def test_normalize_question():
+    assert normalize_question("  ¿Qué   dice el Artículo 25?  ") == "qué dice el artículo 25"
+    assert normalize_question("¡Hola!") == normalize_question("hola")
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
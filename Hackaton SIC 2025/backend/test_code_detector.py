@@ -0,0 +1,70 @@
+"""
+Pruebas del detector de códigos (code_detector.py): tildes, límites de palabra, frases con
+espacios y orden de ``rank`` sobre una tabla de palabras clave escrita a mano.
+
+    python test_code_detector.py
+    python -m pytest test_code_detector.py
+"""
+from code_detector import CodeDetector, fold
+
+KEYWORDS = {
+    "codigo_familia": {"adopción": 3, "divorcio": 3, "pensión alimenticia": 4, "niño": 1},
+    "codigo_trabajo": {"despido": 3, "salario": 2, "año": 1},
+    "codigo_penal": {"robo": 3, "pena": 2},
+    "codigo_recursos_minerales": {"recursos minerales": 4, "recurso": 1},
+}
+
+detector = CodeDetector(KEYWORDS)
+
+
+def test_fold_removes_accents_but_keeps_enie():
+    assert fold("Adopción PENSIÓN") == "adopcion pension"
+    assert fold("Niño AÑO") == "niño año"
+
+
+def test_accents_and_case_do_not_matter():
+    assert detector.rank("ADOPCION de un menor") == [("codigo_familia", 3.0)]
+    assert detector.rank("adopción") == detector.rank("Adopcion")
+    assert detector.rank("¿Cómo pido la Pensión   Alimenticia?") == [("codigo_familia", 4.0)]
+
+
+def test_enie_is_not_folded_to_n():
+    assert detector.rank("un año de trabajo") == [("codigo_trabajo", 1.0)]
+    assert detector.rank("el ano") == []
+
+
+def test_keywords_match_from_a_word_start():
+    # Al principio de palabra y con sufijos ("robos", "despidos"), nunca dentro de otra palabra
+    assert detector.rank("robos y despidos") == [("codigo_trabajo", 3.0), ("codigo_penal", 3.0)]
+    assert detector.rank("un microbo") == []
+    assert detector.rank("apenas") == []
+
+
+def test_longest_keyword_wins():
+    # "recursos minerales" no suma además "recurso"
+    assert detector.rank("concesión de recursos minerales") == [("codigo_recursos_minerales", 4.0)]
+    assert detector.rank("un recurso") == [("codigo_recursos_minerales", 1.0)]
+
+
+def test_rank_orders_by_weight_then_file_order():
+    question = "divorcio con pensión alimenticia tras un despido y un robo"
+    assert detector.rank(question) == [("codigo_familia", 7.0), ("codigo_trabajo", 3.0), ("codigo_penal", 3.0)]
+    assert detector.rank(question, limit=1) == [("codigo_familia", 7.0)]
+    assert detector.detect(question) == "codigo_familia"
+    assert detector.detect("hola") is None
+
+
+def test_repeated_keywords_add_up():
+    assert detector.rank("robo, robo y más robo") == [("codigo_penal", 9.0)]
+
+
+def test_empty_table():
+    empty = CodeDetector({})
+    assert empty.rank("robo") == [] and empty.detect("robo") is None
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
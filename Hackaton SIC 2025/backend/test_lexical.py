@@ -0,0 +1,92 @@
+"""
+Pruebas de la búsqueda léxica (lexical.py): orden BM25 y desempates de ``LexicalIndex.search``
+sobre un bm25.npz escrito a mano, y el rango fusionado de ``reciprocal_rank_fusion``.
+
+    python test_lexical.py
+    python -m pytest test_lexical.py
+"""
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from lexical import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+# término -> [(fila, peso BM25)], postings en orden de fila como las escribe indice_lexico.py
+POSTINGS = {
+    "contrato": [(0, 1.0), (1, 3.0), (2, 1.0), (4, 2.0)],
+    "despido": [(1, 0.5), (2, 2.5), (3, 1.5)],
+    "nulidad": [(0, 2.0), (3, 1.0), (4, 1.0)],
+    "de": [(0, 9.0), (1, 9.0)],
+}
+
+
+def build_index(directory: Path) -> LexicalIndex:
+    terms = sorted(POSTINGS)
+    indptr = np.cumsum([0] + [len(POSTINGS[t]) for t in terms]).astype(np.int64)
+    rows = [row for t in terms for row, _ in POSTINGS[t]]
+    weights = [weight for t in terms for _, weight in POSTINGS[t]]
+    path = directory / LexicalIndex.FILENAME
+    np.savez(
+        path,
+        terms=np.asarray(terms, dtype=str),
+        indptr=indptr,
+        postings=np.asarray(rows, dtype=np.int32),
+        weights=np.asarray(weights, dtype=np.float32),
+        stopwords=np.asarray(["de", "la"], dtype=str),
+        n_docs=np.int64(5),
+        k1=np.float32(1.5),
+        b=np.float32(0.75),
+        version=np.int64(1),
+    )
+    return LexicalIndex(path)
+
+
+def search(tokens, k):
+    with tempfile.TemporaryDirectory() as directory:
+        rows, scores = build_index(Path(directory)).search(tokens, k)
+    return rows.tolist(), [round(float(s), 4) for s in scores]
+
+
+def test_single_term_orders_by_weight_and_row():
+    # contrato: fila 1 (3.0), fila 4 (2.0) y el empate a 1.0 entre filas 0 y 2 por fila
+    assert search(["contrato"], 10) == ([1, 4, 0, 2], [3.0, 2.0, 1.0, 1.0])
+    assert search(["contrato"], 2) == ([1, 4], [3.0, 2.0])
+
+
+def test_several_terms_add_weights():
+    # Sumas: fila 0 = 3.0, 1 = 3.5, 2 = 3.5, 3 = 2.5, 4 = 3.0
+    rows, scores = search(["contrato", "despido", "nulidad"], 10)
+    assert rows == [1, 2, 0, 4, 3] and scores == [3.5, 3.5, 3.0, 3.0, 2.5]
+
+
+def test_ties_at_the_cut_keep_lowest_rows():
+    # Cortar dentro de un empate se queda siempre con las filas más bajas
+    for _ in range(20):
+        assert search(["contrato", "despido", "nulidad"], 3) == ([1, 2, 0], [3.5, 3.5, 3.0])
+    assert search(["despido", "nulidad"], 2) == ([2, 3], [2.5, 2.5])
+
+
+def test_query_terms_ignore_stopwords_repeats_and_unknown_words():
+    assert search(["de", "despido", "despido", "inexistente"], 10) == search(["despido"], 10)
+    assert search(["de", "la"], 10) == ([], [])
+    assert search(["contrato"], 0) == ([], [])
+    assert search(tokenize("¿Nulidad del CONTRATO?"), 1) == ([0], [3.0])
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion(["a", "b", "c"], ["c", "d", "a"], k=10)
+    scores = {key: score for score, key in fused}
+    assert [key for _, key in fused] == ["a", "c", "b", "d"]
+    assert abs(scores["a"] - (1 / 11 + 1 / 13)) < 1e-12
+    assert abs(scores["c"] - (1 / 13 + 1 / 11)) < 1e-12
+    # Mismo score: queda antes lo que apareció primero; lo que solo está en un ranking va detrás
+    assert reciprocal_rank_fusion(["x"], ["y"]) == [(1 / 61, "x"), (1 / 61, "y")]
+    assert reciprocal_rank_fusion() == []
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
@@ -0,0 +1,90 @@
+"""
+Pruebas de las métricas (metrics.py): formato de texto de Prometheus de ``Registry.render``,
+buckets acumulados de los histogramas y desglose por etapas de ``timed``.
+
+    python test_metrics.py
+    python -m pytest test_metrics.py
+"""
+import contextvars
+
+from metrics import Histogram, Registry, start_trace, timed
+
+
+def test_counter_and_labels():
+    registry = Registry()
+    requests = registry.counter("legalbot_requests_total", "Peticiones.", ("route",))
+    requests.inc(route="chat")
+    requests.inc(2, route="chat")
+    requests.inc(route='a"b\\c')
+    assert registry.render().splitlines() == [
+        "# HELP legalbot_requests_total Peticiones.",
+        "# TYPE legalbot_requests_total counter",
+        'legalbot_requests_total{route="a\\"b\\\\c"} 1',
+        'legalbot_requests_total{route="chat"} 3',
+    ]
+    assert requests.value(route="chat") == 3
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = Registry()
+    latency = registry.histogram("legalbot_latency_seconds", "Latencia.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP legalbot_latency_seconds Latencia.",
+        "# TYPE legalbot_latency_seconds histogram",
+        'legalbot_latency_seconds_bucket{le="0.1"} 2',  # le incluye el propio límite
+        'legalbot_latency_seconds_bucket{le="1.0"} 3',
+        'legalbot_latency_seconds_bucket{le="+Inf"} 4',
+        "legalbot_latency_seconds_sum 3.65",
+        "legalbot_latency_seconds_count 4",
+    ]
+
+
+def test_histogram_series_per_label():
+    histogram = Histogram("stage_seconds", "Etapas.", ("stage",), buckets=(1.0,))
+    histogram.observe(0.5, stage="search")
+    histogram.observe(2.0, stage="encode")
+    lines = histogram.render()
+    assert 'stage_seconds_bucket{stage="encode",le="1.0"} 0' in lines
+    assert 'stage_seconds_bucket{stage="search",le="1.0"} 1' in lines
+    assert 'stage_seconds_count{stage="encode"} 1' in lines
+
+
+def test_registered_and_callback_metrics_render_in_order():
+    registry = Registry()
+    registry.register(Histogram("external_seconds", "Creada fuera.", buckets=(1.0,)))
+    registry.callback("cache_size", "Entradas.", "gauge", lambda: {("answers",): 7}, ("cache",))
+    registry.callback("broken", "Rota.", "gauge", lambda: 1 / 0)
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP external_seconds Creada fuera.", "# TYPE external_seconds histogram"]
+    assert lines[2:5] == ["# HELP cache_size Entradas.", "# TYPE cache_size gauge", 'cache_size{cache="answers"} 7']
+    # Una métrica que falla deja un comentario y no rompe el resto
+    assert lines[5].startswith("# broken: ZeroDivisionError")
+
+
+def test_timed_adds_to_trace_only_inside_a_request():
+    histogram = Histogram("stage_seconds", "Etapas.", ("stage",))
+
+    def request():
+        trace = start_trace()
+        for _ in range(2):
+            with timed(histogram, "search", stage="search"):
+                pass
+        return trace
+
+    trace = contextvars.copy_context().run(request)
+    assert list(trace.stages) == ["search"]
+    header = trace.header()
+    assert header.startswith("search;dur=") and ", total;dur=" in header
+
+    with timed(histogram, "search", stage="search"):  # sin traza: solo el histograma
+        pass
+    assert 'stage_seconds_count{stage="search"} 3' in histogram.render()
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
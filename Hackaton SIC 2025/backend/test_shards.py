@@ -0,0 +1,139 @@
+"""
+Pruebas del RPC de los shards (shards.py): scatter-gather con un shard lento y otro con error,
+reintento sobre una conexión muerta del pool, firma de las tramas y codificación JSON + arrays.
+
+Los servidores escuchan en 127.0.0.1 con puerto libre, en hilos de este mismo proceso.
+
+    python test_shards.py
+    python -m pytest test_shards.py
+"""
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import shards
+from shards import ShardClient, ShardError, ShardPool, _ThreadingServer, recv_frame, send_frame
+
+AUTHKEY = b"clave-de-prueba"
+
+
+@contextmanager
+def running_servers(*handler_sets):
+    servers = [_ThreadingServer(("127.0.0.1", 0), AUTHKEY, handlers) for handlers in handler_sets]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield [server.server_address for server in servers]
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+def test_scatter_returns_partial_result():
+    release = threading.Event()
+
+    def stall():
+        release.wait(5)
+        return "tarde"
+
+    def broken():
+        raise RuntimeError("índice roto")
+
+    handlers = [{"search": lambda: "a tiempo"}, {"search": stall}, {"search": broken}]
+    with running_servers(*handlers) as addresses:
+        pool = ShardPool(addresses, AUTHKEY, timeout_ms=200)
+        fast, slow, failing = pool.clients
+        try:
+            start = time.perf_counter()
+            results, failed = pool.scatter({name: ("search", ()) for name in pool.clients})
+            elapsed = time.perf_counter() - start
+        finally:
+            release.set()
+            pool.shutdown()
+
+    assert results == {fast: "a tiempo"}
+    assert sorted(failed) == sorted([slow, failing])
+    # Se espera al shard lento solo hasta el timeout, no a que termine
+    assert elapsed < 1.0
+    stats = pool.stats()
+    assert stats[slow]["timeouts"] == 1 and stats[failing]["errors"] == 1 and stats[fast]["errors"] == 0
+
+
+def test_bad_hmac_rejected_before_decoding():
+    decoded = []
+    original = shards.decode_body
+    shards.decode_body = lambda body: decoded.append(body) or original(body)
+    left, right = socket.socketpair()
+    try:
+        send_frame(left, b"otra-clave", {"method": "search"})
+        try:
+            recv_frame(right, AUTHKEY)
+        except ConnectionError as exc:
+            assert "firma incorrecta" in str(exc)
+        else:
+            raise AssertionError("la trama con otra clave debía rechazarse")
+        assert decoded == []
+    finally:
+        shards.decode_body = original
+        left.close()
+        right.close()
+
+
+def test_server_drops_client_with_wrong_key():
+    calls = []
+    with running_servers({"info": lambda: calls.append(1)}) as (address,):
+        client = ShardClient(address, b"otra-clave", timeout=1.0)
+        try:
+            client.call("info")
+        except ShardError:
+            pass
+        else:
+            raise AssertionError("el shard debía cortar la conexión")
+    assert calls == [] and client.stats()["errors"] == 1
+
+
+def test_stale_pooled_socket_is_retried_once():
+    with running_servers({"info": lambda: "vivo"}) as (address,):
+        client = ShardClient(address, AUTHKEY, timeout=1.0)
+        # Conexión del pool cuyo otro extremo ya cerró, como tras reiniciar el shard
+        stale, peer = socket.socketpair()
+        peer.close()
+        client._idle.put(stale)
+        assert client.call("info") == "vivo"
+        assert client.stats()["retries"] == 1 and client.stats()["errors"] == 0
+        # La conexión nueva vuelve al pool y se reutiliza
+        assert client.call("info") == "vivo" and client.stats()["retries"] == 1
+
+
+def test_frames_carry_json_and_raw_arrays():
+    vectors = np.arange(12, dtype="float32").reshape(3, 4) / 7
+    payload = ("search", (vectors, [{"codes": ["codigo_penal"], "depth": np.int64(5), "tokens": ["robo"]}]))
+    left, right = socket.socketpair()
+    try:
+        send_frame(left, AUTHKEY, payload)
+        method, (received, queries) = recv_frame(right, AUTHKEY)
+    finally:
+        left.close()
+        right.close()
+    assert method == "search" and received.dtype == np.float32
+    assert np.array_equal(received, vectors)
+    assert queries == [{"codes": ["codigo_penal"], "depth": 5, "tokens": ["robo"]}]
+
+    # Solo JSON y arrays numéricos: cualquier otro objeto Python no se puede enviar
+    for value in (object(), np.array([object()])):
+        try:
+            shards.encode_body(value)
+        except TypeError:
+            continue
+        raise AssertionError(f"{value!r} no debía codificarse")
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
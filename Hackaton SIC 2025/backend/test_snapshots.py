@@ -0,0 +1,122 @@
+"""
+Pruebas de SnapshotManager (snapshots.py): fijado durante una recarga, drenado y liberación del
+snapshot anterior, carga fallida que deja el vigente y versión consultable sin bloquear.
+
+    python test_snapshots.py
+    python -m pytest test_snapshots.py
+"""
+import gc
+import threading
+import weakref
+
+from snapshots import SnapshotManager
+
+
+class State:
+    """Valor cargado; objeto propio para poder seguirlo con weakref."""
+
+    def __init__(self, number: int):
+        self.number = number
+
+
+def counting_loader(fail_on=()):
+    calls = {"n": 0}
+
+    def load() -> State:
+        calls["n"] += 1
+        if calls["n"] in fail_on:
+            raise OSError(f"carga {calls['n']} rota")
+        return State(calls["n"])
+
+    return load
+
+
+def test_pin_keeps_snapshot_across_reload():
+    manager = SnapshotManager(counting_loader())
+    with manager.pin() as pinned:
+        manager.reload()
+        # El hilo que fijó sigue viendo su snapshot; los demás ya ven el nuevo
+        assert manager.current() is pinned and pinned.value.number == 1
+        seen = []
+        other = threading.Thread(target=lambda: seen.append(manager.current().value.number))
+        other.start()
+        other.join()
+        assert seen == [2]
+        with manager.pin() as nested:
+            assert nested is pinned
+    assert manager.current().value.number == 2
+
+
+def test_old_snapshot_drains_and_is_freed():
+    manager = SnapshotManager(counting_loader())
+    pinned, release = threading.Event(), threading.Event()
+
+    def request() -> None:
+        with manager.pin():
+            pinned.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=request)
+    worker.start()
+    assert pinned.wait(5)
+    old_value = weakref.ref(manager.current().value)
+    manager.reload()
+    assert manager.stats()["draining"] == [{"version": 1, "active": 1}]
+
+    release.set()
+    worker.join(5)
+    gc.collect()
+    # Sin peticiones ni referencias, el snapshot anterior desaparece
+    assert old_value() is None
+    assert manager.stats()["draining"] == []
+    assert manager.current().value.number == 2
+
+
+def test_failed_load_keeps_current_snapshot():
+    manager = SnapshotManager(counting_loader(fail_on={2}))
+    first = manager.current()
+    try:
+        manager.reload()
+    except OSError:
+        pass
+    else:
+        raise AssertionError("la recarga debía fallar")
+    assert manager.current() is first
+    stats = manager.stats()
+    assert (stats["version"], stats["failures"], stats["reloads"]) == (1, 1, 0)
+    assert stats["last_error"] == "carga 2 rota" and stats["draining"] == []
+
+    # La siguiente recarga buena publica y limpia el error
+    assert manager.reload().value.number == 3
+    assert manager.stats()["last_error"] is None
+
+
+def test_current_version_never_waits_for_a_load():
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_loader() -> State:
+        loading.set()
+        release.wait(5)
+        return State(1)
+
+    manager = SnapshotManager(slow_loader)
+    assert manager.current_version() is None
+    first = threading.Thread(target=manager.current)
+    first.start()
+    assert loading.wait(5)
+    # Con la carga en curso (y su lock tomado) responde al instante, sin cargar ni esperar
+    assert manager.current_version() is None
+    release.set()
+    first.join(5)
+    assert manager.current_version() == 1
+    with manager.pin():
+        manager.reload()
+        assert manager.current_version() == 1
+    assert manager.current_version() == 2
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")
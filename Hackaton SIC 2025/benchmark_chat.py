@@ -0,0 +1,439 @@
+"""
+Benchmark de carga de /api/chat: reproduce un corpus de preguntas legales con N clientes
+concurrentes (cada uno envía la siguiente al recibir la respuesta) y reporta throughput,
+latencia p50/p95/p99, memoria y el tiempo medio de cada etapa según /metrics.
+
+En proceso (por defecto), cada --config arranca un proceso nuevo con sus variables de entorno,
+importa backend/main.py y llama al endpoint directamente: pool de inferencia, cachés, encoder
+y FAISS, sin HTTP ni JSON. Sirve para comparar índices, runtimes del encoder o cachés:
+
+    python benchmark_chat.py --concurrencia 1 4 16 --peticiones 400
+    python benchmark_chat.py --config torch --config int8:LEGALBOT_ENCODER_BACKEND=int8 \\
+        --config sin_cache:LEGALBOT_CACHE_MAX_ENTRIES=0 --config sq8:LEGALBOT_FAISS_ROOT=Dataset/FAISS_sq8
+
+Por HTTP, contra un servidor ya arrancado y con su propia configuración (conexiones keep-alive).
+Sus cachés siguen llenas entre niveles: para medir sin ellas, --unicas.
+
+    python benchmark_chat.py --url http://127.0.0.1:8000 --concurrencia 8 32 --unicas
+
+Las preguntas se repiten al recorrer el corpus más de una vez; con --unicas cada repetición
+lleva un sufijo y no hay aciertos de caché. Los resultados van a Dataset/Benchmarks/chat_<fecha>.json.
+Con --base <json anterior> se compara p95 y throughput por configuración y concurrencia, y
+el script termina con código 1 si alguno empeora más que --tolerancia.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmark_encoder import memoria_mb
+from config import BASE_DIR, BENCHMARKS_DIR
+
+PREGUNTAS = [os.path.join(BASE_DIR, "data/preguntas_router.json"), os.path.join(BASE_DIR, "data/preguntas_carga.json")]
+
+SERIE = re.compile(r"^(\w+)(\{.*\})? (\S+)$")
+ETIQUETA = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def memoria_pico_mb():
+    """Pico de RSS del proceso; None donde no hay ``resource`` (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB en Linux
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cargar_preguntas(rutas):
+    preguntas = []
+    for ruta in rutas:
+        with open(ruta, "r", encoding="utf-8") as f:
+            preguntas += [p["pregunta"] for p in json.load(f)]
+    return preguntas
+
+
+def cuerpos_chat(preguntas, n, unicas, seed, serie=0):
+    """``n`` cuerpos de /api/chat recorriendo el corpus barajado. Con ``unicas``, las repeticiones
+    (y todas las preguntas de una ``serie`` > 0) llevan un sufijo para que ninguna se repita."""
+    orden = np.random.default_rng(seed).permutation(len(preguntas))
+    cuerpos = []
+    for i in range(n):
+        pregunta = preguntas[orden[i % len(preguntas)]]
+        if unicas and (serie or i >= len(preguntas)):
+            pregunta += f" ({serie}.{i})"
+        cuerpos.append({"question": pregunta})
+    return cuerpos
+
+
+# ------------------------------------------------------------
+# /metrics
+# ------------------------------------------------------------
+def leer_metricas(texto):
+    """{(nombre, etiquetas): valor} de un /metrics en formato de texto de Prometheus."""
+    series = {}
+    for linea in texto.splitlines():
+        encontrado = SERIE.match(linea)
+        if linea.startswith("#") or not encontrado:
+            continue
+        nombre, etiquetas, valor = encontrado.groups()
+        series[(nombre, tuple(ETIQUETA.findall(etiquetas or "")))] = float(valor)
+    return series
+
+
+def resumen_metricas(antes, despues):
+    """Lo ocurrido entre dos lecturas de /metrics: media por etapa y por índice, vías de búsqueda
+    y tasa de aciertos de la caché de respuestas."""
+    delta = {clave: valor - antes.get(clave, 0.0) for clave, valor in despues.items()}
+
+    def por(nombre, etiqueta):
+        return {dict(e)[etiqueta]: v for (n, e), v in delta.items() if n == nombre and etiqueta in dict(e)}
+
+    def medias(histograma, etiqueta):
+        sumas, cuentas = por(f"{histograma}_sum", etiqueta), por(f"{histograma}_count", etiqueta)
+        return {
+            clave: {"llamadas": int(cuentas[clave]), "media_ms": round(sumas[clave] / cuentas[clave] * 1000, 3)}
+            for clave in sorted(sumas)
+            if cuentas.get(clave)
+        }
+
+    cache = {dict(e)["result"]: v for (n, e), v in delta.items() if n == "legalbot_cache_requests_total" and dict(e)["cache"] == "answers"}
+    consultas = cache.get("hits", 0) + cache.get("misses", 0)
+    return {
+        "etapas": medias("legalbot_stage_seconds", "stage"),
+        "busqueda": medias("legalbot_search_seconds", "index"),
+        "vias": {via: int(n) for via, n in por("legalbot_queries_total", "route").items() if n},
+        "cache_aciertos": round(cache.get("hits", 0) / consultas, 3) if consultas else None,
+    }
+
+
+def resumen_nivel(concurrencia, latencias, estados, duracion, metricas):
+    ok = np.array([lat for lat, estado in zip(latencias, estados) if estado == 200]) * 1000
+    latencia = None
+    if len(ok):
+        latencia = {
+            "media": round(float(ok.mean()), 3),
+            **{f"p{p}": round(float(np.percentile(ok, p)), 3) for p in (50, 95, 99)},
+            "max": round(float(ok.max()), 3),
+        }
+    return {
+        "concurrencia": concurrencia,
+        "peticiones": len(estados),
+        "errores": dict(Counter(str(estado) for estado in estados if estado != 200)),
+        "duracion_s": round(duracion, 3),
+        "throughput_rps": round(len(ok) / duracion, 2) if duracion else 0.0,
+        "latencia_ms": latencia,
+        **metricas,
+    }
+
+
+# ------------------------------------------------------------
+# En proceso
+# ------------------------------------------------------------
+async def carga_en_proceso(main, cuerpos, concurrencia):
+    """``concurrencia`` clientes sobre el mismo event loop llamando al endpoint /api/chat."""
+    from fastapi import HTTPException
+
+    pendientes = iter(cuerpos)  # compartido: cada cliente toma la siguiente pregunta libre
+    latencias, estados = [], []
+
+    async def cliente():
+        for cuerpo in pendientes:
+            inicio = time.perf_counter()
+            try:
+                await main.chat(main.ChatRequest(**cuerpo))
+                estado = 200
+            except HTTPException as exc:  # 503 (pool saturado) / 504 (timeout)
+                estado = exc.status_code
+            except Exception as exc:
+                print(f"[WARN] {type(exc).__name__}: {exc}")
+                estado = 500
+            latencias.append(time.perf_counter() - inicio)
+            estados.append(estado)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    return latencias, estados, time.perf_counter() - inicio
+
+
+def proceso_config(args, cuerpos):
+    """Mide una configuración (la del entorno de este proceso) en todas las concurrencias."""
+    sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+    memoria_inicio = memoria_mb()
+    inicio = time.perf_counter()
+    import main
+    from indexes import FAISS_ROOT
+
+    main.get_model()
+    indexes = main.get_indexes()
+    carga = time.perf_counter() - inicio
+    memoria_cargado = memoria_mb()
+    asyncio.run(carga_en_proceso(main, cuerpos[: args.calentamiento], 1))
+
+    niveles = []
+    for concurrencia in args.concurrencia:
+        main.invalidate_caches()  # cada nivel empieza con las cachés vacías
+        antes = leer_metricas(main.metrics_registry.render())
+        latencias, estados, duracion = asyncio.run(carga_en_proceso(main, cuerpos, concurrencia))
+        metricas = resumen_metricas(antes, leer_metricas(main.metrics_registry.render()))
+        niveles.append(resumen_nivel(concurrencia, latencias, estados, duracion, metricas))
+    main.inference_pool.shutdown()
+
+    return {
+        "backend": {
+            "encoder": main.ENCODER_BACKEND,
+            "faiss_root": str(FAISS_ROOT),
+            "tipos_indice": sorted({item.index_type for item in indexes.values()}),
+            "cache_max_entradas": main.CACHE_MAX_ENTRIES,
+            "workers_inferencia": main.INFERENCE_WORKERS,
+            "shards": len(main.SHARD_ADDRESSES),
+        },
+        "carga_s": round(carga, 3),
+        "memoria_mb": {
+            "inicio": memoria_inicio,
+            "cargado": memoria_cargado,
+            "final": memoria_mb(),
+            "pico": memoria_pico_mb(),
+        },
+        "niveles": niveles,
+    }
+
+
+def medir_config(nombre, entorno, args):
+    """Lanza ``proceso_config`` en un proceso nuevo con ``entorno`` (el backend lee su
+    configuración al importarse, así que cada configuración necesita su propio proceso)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = os.path.join(tmp, "resultado.json")
+        orden = [
+            sys.executable, os.path.abspath(__file__), "--_proceso", salida,
+            "--peticiones", str(args.peticiones), "--calentamiento", str(args.calentamiento),
+            "--seed", str(args.seed), "--concurrencia", *map(str, args.concurrencia),
+            "--preguntas", *args.preguntas,
+        ] + (["--unicas"] if args.unicas else [])
+        # Sin precarga en segundo plano ni recargas: la carga se mide aparte y no compite con la prueba
+        env = {**os.environ, "LEGALBOT_EAGER_WARMUP": "0", "LEGALBOT_RELOAD_POLL_SECONDS": "0", **entorno}
+        proceso = subprocess.run(orden, env=env, cwd=BASE_DIR)
+        if proceso.returncode != 0 or not os.path.exists(salida):
+            return {"config": nombre, "entorno": entorno, "error": f"el proceso terminó con código {proceso.returncode}"}
+        with open(salida, "r", encoding="utf-8") as f:
+            return {"config": nombre, "entorno": entorno, **json.load(f)}
+
+
+def parsear_config(texto):
+    """``nombre:VAR=valor,VAR=valor`` -> (nombre, {VAR: valor}); ``nombre`` solo = entorno actual."""
+    nombre, _, variables = texto.partition(":")
+    entorno = {}
+    for par in filter(None, variables.split(",")):
+        clave, sep, valor = par.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"variable sin valor en --config {texto!r}: {par!r}")
+        entorno[clave.strip()] = valor.strip()
+    return nombre.strip() or "actual", entorno
+
+
+# ------------------------------------------------------------
+# HTTP
+# ------------------------------------------------------------
+def leer_metricas_http(url):
+    try:
+        with urllib.request.urlopen(f"{url}/metrics", timeout=10) as respuesta:
+            return leer_metricas(respuesta.read().decode("utf-8"))
+    except (urllib.error.URLError, OSError):
+        return {}  # servidor sin /metrics: solo latencias
+
+
+def carga_http(url, cuerpos, concurrencia, timeout):
+    """``concurrencia`` hilos, cada uno con su conexión keep-alive, enviando POST /api/chat."""
+    partes = urlsplit(url)
+    conexion_cls = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+    ruta = partes.path.rstrip("/") + "/api/chat"
+    pendientes = iter(cuerpos)
+    candado = threading.Lock()
+    latencias, estados = [], []
+
+    def siguiente():
+        with candado:
+            return next(pendientes, None)
+
+    def cliente():
+        conexion = conexion_cls(partes.hostname, partes.port, timeout=timeout)
+        while (cuerpo := siguiente()) is not None:
+            datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+            inicio = time.perf_counter()
+            try:
+                conexion.request("POST", ruta, body=datos, headers={"Content-Type": "application/json"})
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                estado = respuesta.status
+            except (OSError, http.client.HTTPException):
+                conexion.close()  # la siguiente petición reconecta
+                estado = 0  # sin respuesta
+            with candado:
+                latencias.append(time.perf_counter() - inicio)
+                estados.append(estado)
+        conexion.close()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        for futuro in [executor.submit(cliente) for _ in range(concurrencia)]:
+            futuro.result()
+    return latencias, estados, time.perf_counter() - inicio
+
+
+def medir_http(args, preguntas):
+    url = args.url.rstrip("/")
+    carga_http(url, cuerpos_chat(preguntas, args.calentamiento, args.unicas, args.seed), 1, args.timeout)
+    niveles = []
+    for serie, concurrencia in enumerate(args.concurrencia, start=1):
+        # Las cachés del servidor no se vacían entre niveles: con --unicas cada nivel usa preguntas nuevas
+        cuerpos = cuerpos_chat(preguntas, args.peticiones, args.unicas, args.seed, serie)
+        antes = leer_metricas_http(url)
+        latencias, estados, duracion = carga_http(url, cuerpos, concurrencia, args.timeout)
+        metricas = resumen_metricas(antes, leer_metricas_http(url)) if antes else {}
+        niveles.append(resumen_nivel(concurrencia, latencias, estados, duracion, metricas))
+    return {"config": "http", "entorno": {}, "niveles": niveles}
+
+
+# ------------------------------------------------------------
+# Informe
+# ------------------------------------------------------------
+def imprimir(resultados):
+    print(
+        f"\n{'config':<14} {'conc':>5} {'pet/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'errores':>8} {'caché':>7} {'pico MB':>8}"
+    )
+    for resultado in resultados:
+        if "error" in resultado:
+            print(f"{resultado['config']:<14} {resultado['error']}")
+            continue
+        pico = (resultado.get("memoria_mb") or {}).get("pico")
+        for nivel in resultado["niveles"]:
+            latencia = nivel["latencia_ms"] or {}
+            cache = nivel.get("cache_aciertos")
+            print(
+                f"{resultado['config']:<14} {nivel['concurrencia']:>5} {nivel['throughput_rps']:>9.1f} "
+                f"{latencia.get('p50', float('nan')):>9.2f} {latencia.get('p95', float('nan')):>9.2f} "
+                f"{latencia.get('p99', float('nan')):>9.2f} {sum(nivel['errores'].values()):>8} "
+                f"{'-' if cache is None else f'{cache:.0%}':>7} {'-' if pico is None else f'{pico:.0f}':>8}"
+            )
+        etapas = resultado["niveles"][-1].get("etapas") if resultado["niveles"] else None
+        if etapas:
+            detalle = ", ".join(f"{etapa} {datos['media_ms']:.2f}" for etapa, datos in etapas.items())
+            print(f"{'':<14} etapas (ms/llamada, última concurrencia): {detalle}")
+
+
+def comparar(actual, base, tolerancia):
+    """p95 y throughput frente a ``base`` por (config, concurrencia); True si alguno empeora más
+    que ``tolerancia`` (0.10 = 10 %)."""
+    previos = {
+        (resultado["config"], nivel["concurrencia"]): nivel
+        for resultado in base.get("resultados", [])
+        for nivel in resultado.get("niveles", [])
+    }
+    print(f"\nFrente a {base.get('fecha', '?')} (commit {base.get('commit') or '?'}):")
+    print(f"{'config':<14} {'conc':>5} {'Δ p95':>8} {'Δ pet/s':>8}")
+    regresion = False
+    for resultado in actual["resultados"]:
+        for nivel in resultado.get("niveles", []):
+            previo = previos.get((resultado["config"], nivel["concurrencia"]))
+            if not previo or not previo["latencia_ms"] or not nivel["latencia_ms"] or not previo["throughput_rps"]:
+                continue
+            p95 = nivel["latencia_ms"]["p95"] / previo["latencia_ms"]["p95"] - 1
+            rps = nivel["throughput_rps"] / previo["throughput_rps"] - 1
+            peor = p95 > tolerancia or rps < -tolerancia
+            regresion |= peor
+            print(f"{resultado['config']:<14} {nivel['concurrencia']:>5} {p95:>+8.1%} {rps:>+8.1%}{'  ← REGRESIÓN' if peor else ''}")
+    return regresion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preguntas", nargs="+", default=PREGUNTAS, help="JSON con [{pregunta, ...}]")
+    parser.add_argument("--peticiones", type=int, default=200, help="peticiones por nivel de concurrencia")
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--calentamiento", type=int, default=10, help="peticiones previas que no se miden")
+    parser.add_argument("--unicas", action="store_true", help="sin preguntas repetidas (sin aciertos de caché)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--config", action="append", type=parsear_config, help="nombre:VAR=valor,... (repetible; en proceso)"
+    )
+    parser.add_argument("--url", help="medir por HTTP contra este servidor en vez de en proceso")
+    parser.add_argument("--timeout", type=float, default=60, help="segundos por petición (HTTP)")
+    parser.add_argument("--salida", help="JSON de resultados (por defecto Dataset/Benchmarks/chat_<fecha>.json)")
+    parser.add_argument("--base", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="empeoramiento admitido frente a --base")
+    parser.add_argument("--_proceso", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    preguntas = cargar_preguntas(args.preguntas)
+
+    if args._proceso:
+        resultado = proceso_config(args, cuerpos_chat(preguntas, args.peticiones, args.unicas, args.seed))
+        with open(args._proceso, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False)
+        return
+
+    print(f"📚 {len(preguntas)} preguntas, {args.peticiones} peticiones por nivel, concurrencia {args.concurrencia}")
+    if args.url:
+        if args.config:
+            parser.error("--config solo aplica en proceso; por HTTP manda la configuración del servidor")
+        resultados = [medir_http(args, preguntas)]
+    else:
+        resultados = []
+        for nombre, entorno in args.config or [("actual", {})]:
+            print(f"\n⏱️  {nombre} {entorno or ''}")
+            resultados.append(medir_config(nombre, entorno, args))
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_actual(),
+        "modo": "http" if args.url else "proceso",
+        "url": args.url,
+        "maquina": {"host": platform.node(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "preguntas": len(preguntas),
+        "peticiones": args.peticiones,
+        "concurrencia": args.concurrencia,
+        "unicas": args.unicas,
+        "seed": args.seed,
+        "resultados": resultados,
+    }
+    imprimir(resultados)
+
+    salida = args.salida or os.path.join(BENCHMARKS_DIR, f"chat_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados en {salida}")
+
+    if args.base:
+        with open(args.base, "r", encoding="utf-8") as f:
+            if comparar(informe, json.load(f), args.tolerancia):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Latencia y throughput del encoder de preguntas por runtime (torch, int8, onnx).
+
+Mide, para cada backend: tiempo de carga, memoria residente añadida, latencia de una
+pregunta (p50/p99, como /api/chat sin batching) y throughput en lotes.
+
+    python benchmark_encoder.py --backends torch int8 onnx --consultas 200 --lote 32
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from config import BASE_DIR, EMBEDDING_MODEL, EMBEDDING_ONNX_DIR
+
+sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+from encoders import ENCODER_BACKENDS, load_encoder  # noqa: E402
+
+PREGUNTAS = os.path.join(BASE_DIR, "data/preguntas_router.json")
+
+
+def memoria_mb():
+    """RSS actual del proceso (Linux); None si no se puede leer."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(ENCODER_BACKENDS), choices=ENCODER_BACKENDS)
+    parser.add_argument("--onnx-dir", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--lote", type=int, default=32)
+    parser.add_argument("--hilos", type=int, default=0, help="torch.set_num_threads (0 = por defecto)")
+    args = parser.parse_args()
+
+    if args.hilos:
+        import torch
+
+        torch.set_num_threads(args.hilos)
+
+    with open(PREGUNTAS, "r", encoding="utf-8") as f:
+        base = [p["pregunta"] for p in json.load(f)]
+    preguntas = [base[i % len(base)] + ("" if i < len(base) else f" ({i})") for i in range(args.consultas)]
+
+    print(f"{'backend':<8} {'carga s':>8} {'+RSS MB':>8} {'p50 ms':>8} {'p99 ms':>8} {'textos/s':>10}")
+    for backend in args.backends:
+        gc.collect()
+        antes = memoria_mb()
+        inicio = time.perf_counter()
+        try:
+            encoder = load_encoder(EMBEDDING_MODEL, backend, args.onnx_dir)
+        except (ImportError, RuntimeError, ValueError, OSError) as exc:
+            print(f"{backend:<8} no disponible: {exc}")
+            continue
+        carga = time.perf_counter() - inicio
+        despues = memoria_mb()
+
+        encoder.encode(preguntas[:2])  # calentamiento
+        latencias = np.empty(len(preguntas))
+        for i, pregunta in enumerate(preguntas):
+            t0 = time.perf_counter()
+            encoder.encode([pregunta])
+            latencias[i] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        encoder.encode(preguntas, batch_size=args.lote)
+        throughput = len(preguntas) / (time.perf_counter() - t0)
+
+        rss = f"{despues - antes:>8.0f}" if antes is not None and despues is not None else f"{'?':>8}"
+        print(
+            f"{backend:<8} {carga:>8.2f} {rss} {np.percentile(latencias, 50):>8.2f} "
+            f"{np.percentile(latencias, 99):>8.2f} {throughput:>10.1f}"
+        )
+        del encoder
+
+
+if __name__ == "__main__":
+    main()
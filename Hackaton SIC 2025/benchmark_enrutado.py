@@ -0,0 +1,121 @@
+"""
+Benchmark del enrutado de preguntas a códigos: palabras clave (CodeDetector) frente a
+centroides de embeddings (CentroidRouter), y la combinación "fallback" del backend.
+
+Usa las preguntas etiquetadas de data/preguntas_router.json y, opcionalmente, preguntas
+sintéticas sacadas del inicio de artículos al azar. Reporta cobertura (preguntas con algún
+código), acierto top-1, recall top-N (el código correcto está entre los N buscados) y la
+latencia del enrutado. El encode de la pregunta no se cuenta: el backend ya lo calcula
+para la búsqueda.
+
+    python benchmark_enrutado.py --top-n 3 --centroides 1 4 8 --sinteticas 300
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from compactar_base import GLOBAL_DIRNAME, _vectores
+from config import BASE_DIR, CODIGOS_CHATBOT, EMBEDDING_MODEL, FAISS_DIR
+from indices_faiss import calcular_centroides
+
+sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+from code_detector import CodeDetector  # noqa: E402
+from router import CentroidRouter  # noqa: E402
+
+PREGUNTAS = os.path.join(BASE_DIR, "data/preguntas_router.json")
+
+
+def cargar_codigos():
+    """Devuelve {codigo: (vectores del índice, docs)} de Dataset/FAISS."""
+    codigos = {}
+    for nombre in sorted(os.listdir(FAISS_DIR)):
+        ruta = os.path.join(FAISS_DIR, nombre)
+        if nombre == GLOBAL_DIRNAME or not os.path.exists(os.path.join(ruta, "index.faiss")):
+            continue
+        with open(os.path.join(ruta, "docs.json"), "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        codigos[nombre] = (_vectores(faiss.read_index(os.path.join(ruta, "index.faiss"))), docs)
+    return codigos
+
+
+def preguntas_sinteticas(codigos, n, rng, palabras=12):
+    """Las primeras ``palabras`` palabras del cuerpo de artículos al azar, etiquetadas con su código."""
+    todas = [(codigo, doc) for codigo, (_, docs) in codigos.items() for doc in docs]
+    preguntas = []
+    for i in rng.choice(len(todas), size=min(n, len(todas)), replace=False):
+        codigo, doc = todas[i]
+        # Se quita la cabecera "Artículo N." para no regalar el número
+        cuerpo = doc["texto"].split(".", 1)[-1].split()
+        preguntas.append({"pregunta": " ".join(cuerpo[:palabras]), "codigo": codigo})
+    return preguntas
+
+
+def evaluar(nombre, enrutar, preguntas, top_n):
+    aciertos = recall = cubiertas = buscados = 0
+    latencias = np.empty(len(preguntas))
+    for i, p in enumerate(preguntas):
+        inicio = time.perf_counter()
+        codigos = enrutar(i)[:top_n]
+        latencias[i] = (time.perf_counter() - inicio) * 1e6
+        if codigos:
+            cubiertas += 1
+            aciertos += codigos[0] == p["codigo"]
+            recall += p["codigo"] in codigos
+        buscados += len(codigos)
+    n = len(preguntas)
+    print(
+        f"{nombre:<18} {cubiertas / n:>9.1%} {aciertos / n:>8.1%} {recall / n:>9.1%} "
+        f"{buscados / n:>8.2f} {np.percentile(latencias, 50):>8.1f} {np.percentile(latencias, 99):>8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preguntas", default=PREGUNTAS, help="JSON con [{pregunta, codigo}]")
+    parser.add_argument("--sinteticas", type=int, default=0, help="añade N preguntas sacadas de artículos")
+    parser.add_argument("--top-n", type=int, default=3, help="códigos buscados por pregunta")
+    parser.add_argument("--centroides", type=int, nargs="+", default=[1, 4, 8], help="centroides por código")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    codigos = cargar_codigos()
+    with open(args.preguntas, "r", encoding="utf-8") as f:
+        preguntas = [p for p in json.load(f) if p["codigo"] in codigos]
+    preguntas += preguntas_sinteticas(codigos, args.sinteticas, np.random.default_rng(args.seed))
+    print(f"📚 {len(codigos)} códigos, {len(preguntas)} preguntas etiquetadas")
+
+    modelo = SentenceTransformer(EMBEDDING_MODEL)
+    inicio = time.perf_counter()
+    vectores = np.asarray(modelo.encode([p["pregunta"] for p in preguntas]), dtype="float32")
+    print(f"🧠 encode: {(time.perf_counter() - inicio) / len(preguntas) * 1000:.2f} ms por pregunta (no se suma abajo)")
+
+    detector = CodeDetector({c: kws for c, kws in CODIGOS_CHATBOT.items() if c in codigos})
+
+    def palabras_clave(i):
+        ranking = detector.rank(preguntas[i]["pregunta"], args.top_n)
+        # Mismo criterio que detect_codes del backend: candidatos con >= la mitad del peso del mejor
+        return [c for c, peso in ranking if peso >= ranking[0][1] * 0.5]
+
+    print(f"\n{'enrutado':<18} {'cobertura':>9} {'top-1':>8} {'recall@' + str(args.top_n):>9} {'códigos':>8} {'p50 µs':>8} {'p99 µs':>8}")
+    evaluar("palabras clave", palabras_clave, preguntas, args.top_n)
+    for k in args.centroides:
+        router = CentroidRouter({c: calcular_centroides(v, k) for c, (v, _) in codigos.items()})
+
+        def centroides(i, router=router):
+            return [c for c, _ in router.route(vectores[i], args.top_n)]
+
+        def combinado(i, centroides=centroides):
+            return palabras_clave(i) or centroides(i)
+
+        evaluar(f"centroides k={k}", centroides, preguntas, args.top_n)
+        evaluar(f"fallback k={k}", combinado, preguntas, args.top_n)
+
+
+if __name__ == "__main__":
+    main()
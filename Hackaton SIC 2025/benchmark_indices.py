@@ -0,0 +1,150 @@
+"""
+Benchmark de índices aproximados (IVF-Flat, IVF-PQ, HNSW) y comprimidos (SQ8, PQ) frente
+al índice exacto (Flat).
+
+Usa los artículos de Dataset/JSON, reporta recall@k respecto a la búsqueda exacta, la
+latencia p50/p99 por consulta y los bytes por artículo que ocupa el índice en RAM. Los
+tipos comprimidos se miden además con re-scoring exacto ("+rescore"), como el backend:
+se piden k × factor candidatos y se reordenan con los vectores float32 (vectors.npy, que
+queda en disco con mmap y no cuenta como RAM).
+
+    python benchmark_indices.py --k 5 --consultas 500
+    python benchmark_indices.py --tipos flat sq8 pq --pq-m 16 48 --rescore 4 8 --desde-faiss
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+import faiss
+
+from config import EMBEDDING_MODEL, FAISS_DIR, JSON_DIR
+from indices_faiss import METRICAS, TIPOS_COMPRIMIDOS, TIPOS_INDICE, crear_indice, preparar_embeddings
+
+
+def cargar_textos():
+    textos = []
+    for ruta in sorted(glob.glob(os.path.join(JSON_DIR, "*.json"))):
+        with open(ruta, "r", encoding="utf-8") as f:
+            textos.extend(a["texto"] for a in json.load(f))
+    return textos
+
+
+def embeddings_corpus(textos, cache_path=None):
+    if cache_path and os.path.exists(cache_path):
+        print(f"📦 Usando embeddings en caché: {cache_path}")
+        return np.load(cache_path)
+    modelo = SentenceTransformer(EMBEDDING_MODEL)
+    embeddings = np.asarray(modelo.encode(textos, show_progress_bar=True), dtype="float32")
+    if cache_path:
+        np.save(cache_path, embeddings)
+    return embeddings
+
+
+def vectores_faiss():
+    """Vectores de los índices ya construidos en Dataset/FAISS (sin cargar el modelo)."""
+    from compactar_base import GLOBAL_DIRNAME, _vectores
+
+    partes = []
+    for nombre in sorted(os.listdir(FAISS_DIR)):
+        ruta = os.path.join(FAISS_DIR, nombre, "index.faiss")
+        if nombre != GLOBAL_DIRNAME and os.path.exists(ruta):
+            partes.append(_vectores(faiss.read_index(ruta)))
+    return np.vstack(partes).astype("float32")
+
+
+def bytes_por_articulo(index):
+    return len(faiss.serialize_index(index)) / max(index.ntotal, 1)
+
+
+def medir_rescore(index, consultas, vectores, k, factor, metrica):
+    """Como ``medir`` pero re-puntuando con distancia exacta los k × factor mejores candidatos."""
+    ids = np.empty((len(consultas), k), dtype="int64")
+    latencias = np.empty(len(consultas))
+    for i, q in enumerate(consultas):
+        inicio = time.perf_counter()
+        _, idx = index.search(q[None, :], k * factor)
+        filas = np.unique(idx[0][idx[0] >= 0])
+        exactos = vectores[filas]
+        if metrica == "ip":
+            orden = np.argsort(-(exactos @ q))[:k]
+        else:
+            orden = np.argsort(((exactos - q) ** 2).sum(axis=1))[:k]
+        latencias[i] = (time.perf_counter() - inicio) * 1000
+        ids[i] = filas[orden]
+    return ids, latencias
+
+
+def medir(index, consultas, k):
+    """Busca consulta por consulta (como el backend) y devuelve ids y latencias en ms."""
+    ids = np.empty((len(consultas), k), dtype="int64")
+    latencias = np.empty(len(consultas))
+    for i, q in enumerate(consultas):
+        inicio = time.perf_counter()
+        _, idx = index.search(q[None, :], k)
+        latencias[i] = (time.perf_counter() - inicio) * 1000
+        ids[i] = idx[0]
+    return ids, latencias
+
+
+def recall_at_k(aprox, exacto):
+    aciertos = sum(len(set(a) & set(e)) for a, e in zip(aprox, exacto))
+    return aciertos / exacto.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--consultas", type=int, default=500, help="artículos usados como consultas")
+    parser.add_argument("--tipos", nargs="+", default=list(TIPOS_INDICE), choices=TIPOS_INDICE)
+    parser.add_argument("--metrica", default="l2", choices=METRICAS)
+    parser.add_argument("--cache", help="ruta .npy para reutilizar los embeddings del corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[16], help="subvectores (bytes/artículo) de pq/ivf_pq")
+    parser.add_argument("--rescore", type=int, nargs="*", default=[4, 8], help="factores de re-scoring a medir")
+    parser.add_argument("--desde-faiss", action="store_true", help="usar los vectores de Dataset/FAISS")
+    args = parser.parse_args()
+
+    if args.desde_faiss:
+        embeddings = vectores_faiss()
+        print(f"📚 {len(embeddings)} vectores leídos de {FAISS_DIR}")
+    else:
+        textos = cargar_textos()
+        print(f"📚 {len(textos)} artículos cargados de {JSON_DIR}")
+        embeddings = embeddings_corpus(textos, args.cache)
+    exactos = preparar_embeddings(embeddings, args.metrica)
+
+    rng = np.random.default_rng(args.seed)
+    muestra = rng.choice(len(embeddings), size=min(args.consultas, len(embeddings)), replace=False)
+    consultas = preparar_embeddings(embeddings[muestra], args.metrica)
+
+    base = crear_indice(embeddings, "flat", metrica=args.metrica)
+    exacto, _ = medir(base, consultas, args.k)
+
+    print(f"\n{'índice':<18} {'build s':>8} {'B/art':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for tipo in args.tipos:
+        variantes = [{"pq_m": m} for m in args.pq_m] if tipo in ("pq", "ivf_pq") else [{}]
+        for params in variantes:
+            nombre = f"{tipo} m={params['pq_m']}" if params else tipo
+            inicio = time.perf_counter()
+            index = crear_indice(embeddings, tipo, params, metrica=args.metrica)
+            construccion = time.perf_counter() - inicio
+            filas = [(nombre, *medir(index, consultas, args.k))]
+            if tipo in TIPOS_COMPRIMIDOS:
+                for factor in args.rescore:
+                    ids, latencias = medir_rescore(index, consultas, exactos, args.k, factor, args.metrica)
+                    filas.append((f"{nombre} +rescore×{factor}", ids, latencias))
+            for etiqueta, ids, latencias in filas:
+                print(
+                    f"{etiqueta:<18} {construccion:>8.2f} {bytes_por_articulo(index):>8.0f} "
+                    f"{recall_at_k(ids, exacto):>10.3f} "
+                    f"{np.percentile(latencias, 50):>8.3f} {np.percentile(latencias, 99):>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
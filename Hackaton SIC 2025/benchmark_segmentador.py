@@ -0,0 +1,73 @@
+"""
+Benchmark del segmentador de artículos sobre el corpus Dataset/TXT.
+
+Compara el segmentador en streaming (segmentador.py) con los dos métodos anteriores
+(re.split sobre el texto completo colapsado y la regex perezosa con DOTALL de
+separar_codigos.py): artículos encontrados, MB/s y pico de memoria (tracemalloc).
+
+    python benchmark_segmentador.py
+"""
+import glob
+import os
+import re
+import time
+import tracemalloc
+
+from segmentador import articulos
+
+TXT_DIR = "Dataset/TXT"
+
+PATRON_SPLIT = r"(Artículo\s+\d+[A-Z]?\s*\.?-?)"
+PATRON_PEREZOSO = re.compile(r"(Artículo\s+\d+\.)(.*?)(?=Artículo\s+\d+\.|$)", re.S)
+
+
+def streaming(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        return sum(1 for _ in articulos(f, colapsar_espacios=True))
+
+
+def split_completo(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        texto = re.sub(r"\s+", " ", f.read())
+    return len(re.split(PATRON_SPLIT, texto)) // 2
+
+
+def regex_perezosa(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        texto = f.read()
+    return sum(1 for _ in PATRON_PEREZOSO.finditer(texto))
+
+
+def medir(fn, ruta):
+    # Tiempo y memoria en pasadas separadas: tracemalloc ralentiza mucho la ejecución.
+    inicio = time.perf_counter()
+    n = fn(ruta)
+    segundos = time.perf_counter() - inicio
+    tracemalloc.start()
+    fn(ruta)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, segundos, pico
+
+
+if __name__ == "__main__":
+    metodos = {"streaming": streaming, "re.split": split_completo, "perezosa": regex_perezosa}
+    totales = {nombre: [0, 0.0, 0] for nombre in metodos}
+    bytes_total = 0
+
+    print(f"{'archivo':<30} {'MB':>6} " + " ".join(f"{m + ' arts':>15} {'MB/s':>7} {'pico MB':>8}" for m in metodos))
+    for ruta in sorted(glob.glob(os.path.join(TXT_DIR, "*.txt"))):
+        mb = os.path.getsize(ruta) / 1e6
+        bytes_total += mb
+        fila = f"{os.path.basename(ruta):<30} {mb:>6.2f} "
+        for nombre, fn in metodos.items():
+            n, segundos, pico = medir(fn, ruta)
+            totales[nombre][0] += n
+            totales[nombre][1] += segundos
+            totales[nombre][2] = max(totales[nombre][2], pico)
+            fila += f"{n:>15} {mb / segundos:>7.1f} {pico / 1e6:>8.2f} "
+        print(fila)
+
+    print()
+    for nombre, (n, segundos, pico) in totales.items():
+        print(f"{nombre:<10} {n:>6} artículos  {bytes_total / segundos:>7.1f} MB/s  pico {pico / 1e6:.2f} MB")
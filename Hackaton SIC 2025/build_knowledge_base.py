@@ -1,31 +1,90 @@
 import os
-import re
+import sys
 import json
+import argparse
+from collections import defaultdict
 import faiss
 import numpy as np
-from langchain_community.document_loaders import PyPDFLoader
-from sentence_transformers import SentenceTransformer
+from indices_faiss import (
+    crear_indice,
+    escribir_manifest,
+    escribir_marca_construccion,
+    escritura_atomica,
+    guardar_centroides,
+    guardar_vectores_rescore,
+    leer_manifest,
+    preparar_embeddings,
+    tipo_indice_para,
+    TIPOS_COMPRIMIDOS,
+)
+from compactar_base import guardar_docs_compactos, guardar_indice_global, guardar_mapa_articulos
+from indice_lexico import NOMBRE_FICHERO as BM25_FICHERO, guardar_indice_lexico
+from extraccion_paralela import extraer_pdfs
+from segmentador import articulos as segmentar_articulos
+from cache_embeddings import cargar_cache, guardar_cache, hash_archivo, hash_texto
 from config import (
     PDF_DIR,
+    TEXTO_DIR,
     JSON_DIR,
     FAISS_DIR,
     CODIGOS_A_PROCESAR,
     EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_DIR,
+    FAISS_METRIC,
+    CHUNK_MAX_PALABRAS,
+    CHUNK_SOLAPE_PALABRAS,
 )
 
+# El encoder (torch / int8 / onnx) es el mismo módulo que usa el backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from encoders import cache_key, load_encoder  # noqa: E402
+
 # ==================================================
 # ASEGURAR DIRECTORIOS
 # ==================================================
 os.makedirs(JSON_DIR, exist_ok=True)
 os.makedirs(FAISS_DIR, exist_ok=True)
 
+# ==================================================
+# MODELO DE EMBEDDINGS (se carga una sola vez)
+# ==================================================
+
+_modelo = None
+
+
+def obtener_modelo():
+    global _modelo
+    if _modelo is None:
+        _modelo = load_encoder(EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR)
+    return _modelo
+
+
+def calcular_embeddings(textos, cache):
+    """Devuelve los embeddings de ``textos``, calculando solo los que no están en la caché."""
+    claves = [hash_texto(t) for t in textos]
+    faltan = {}
+    for clave, texto in zip(claves, textos):
+        if clave not in cache:
+            faltan.setdefault(clave, texto)
+
+    if faltan:
+        nuevos = obtener_modelo().encode(list(faltan.values()), show_progress_bar=True)
+        for clave, vector in zip(faltan, np.asarray(nuevos, dtype="float32")):
+            cache[clave] = vector
+    print(f"🧠 {len(faltan)} embeddings calculados, {len(textos) - len(faltan)} reutilizados de la caché.")
+
+    return np.stack([cache[c] for c in claves]).astype("float32")
+
 # ==================================================
 # FUNCIÓN DE PARSEO DE PDF
 # ==================================================
 
-def parsear_pdf_a_json(codigo_info):
+def parsear_pdf_a_json(codigo_info, ruta_txt=None):
     """
     Parsea un archivo PDF de un código legal, extrae los artículos y los guarda en un archivo JSON.
+
+    ``ruta_txt`` es el texto ya extraído por extraccion_paralela; si no se da, se extrae aquí.
     """
     pdf_path = os.path.join(PDF_DIR, codigo_info["pdf_filename"])
     codigo_nombre = codigo_info["nombre_completo"]
@@ -40,31 +99,18 @@ def parsear_pdf_a_json(codigo_info):
         return False
 
     try:
-        loader = PyPDFLoader(pdf_path)
-        docs = loader.load()
-        texto = "\n".join(d.page_content for d in docs)
-        texto = re.sub(r'\s+', ' ', texto)
-
-        # Regex para encontrar artículos. Puede necesitar ajustes.
-        patron = r'(Artículo\s+\d+[A-Z]?\s*\.?-?)'
-        partes = re.split(patron, texto)
-
+        if ruta_txt is None:
+            ruta_txt = extraer_pdfs([pdf_path], TEXTO_DIR)[pdf_path]["ruta_txt"]
+        # Segmentación en streaming: un artículo cada vez, sin cargar el código completo
         articulos = []
-        for i in range(1, len(partes), 2):
-            numero_raw = partes[i]
-            numero_match = re.search(r'(\d+[A-Z]?)', numero_raw)
-            if not numero_match:
-                continue
-            numero = numero_match.group(1)
-
-            contenido = partes[i+1].strip()
-
-            articulos.append({
-                "codigo": codigo_nombre,
-                "articulo": numero,
-                "rama": rama,
-                "texto": f"Artículo {numero}. {contenido}"
-            })
+        with open(ruta_txt, "r", encoding="utf-8") as f:
+            for numero, texto in segmentar_articulos(f, colapsar_espacios=True):
+                articulos.append({
+                    "codigo": codigo_nombre,
+                    "articulo": numero,
+                    "rama": rama,
+                    "texto": texto
+                })
 
         with open(json_path, "w", encoding="utf-8") as f:
             json.dump(articulos, f, ensure_ascii=False, indent=2)
@@ -76,13 +122,169 @@ def parsear_pdf_a_json(codigo_info):
         print(f"❌ Error procesando {pdf_path}: {e}")
         return False
 
+# ==================================================
+# TROCEADO DE ARTÍCULOS LARGOS
+# ==================================================
+
+def trocear_articulo(doc, max_palabras=CHUNK_MAX_PALABRAS, solape=CHUNK_SOLAPE_PALABRAS):
+    """
+    Divide el texto de un artículo en ventanas de ``max_palabras`` que se solapan ``solape`` palabras.
+    Los artículos cortos devuelven su texto intacto (mismo embedding que sin trocear).
+    Cada ventana posterior a la primera lleva la cabecera "Artículo N." para no perder el contexto.
+    """
+    palabras = doc["texto"].split()
+    if len(palabras) <= max_palabras:
+        return [doc["texto"]]
+
+    paso = max(1, max_palabras - solape)
+    cabecera = f"Artículo {doc['articulo']}."
+    trozos = []
+    for inicio in range(0, len(palabras), paso):
+        ventana = " ".join(palabras[inicio:inicio + max_palabras])
+        trozos.append(ventana if inicio == 0 else f"{cabecera} {ventana}")
+        if inicio + max_palabras >= len(palabras):
+            break
+    return trozos
+
+
+def trocear_articulos(data):
+    """Devuelve (textos de los trozos, artículo padre de cada trozo)."""
+    textos, padres = [], []
+    for i, doc in enumerate(data):
+        trozos = trocear_articulo(doc)
+        textos.extend(trozos)
+        padres.extend([i] * len(trozos))
+    return textos, np.asarray(padres, dtype=np.int32)
+
+
+def cargar_padres(faiss_code_dir, n_docs):
+    ruta = os.path.join(faiss_code_dir, "chunks.npy")
+    return np.load(ruta) if os.path.exists(ruta) else np.arange(n_docs, dtype=np.int32)
+
+
+def guardar_padres(faiss_code_dir, padres, n_docs):
+    """chunks.npy (fila del índice -> artículo) solo hace falta si algún artículo se troceó."""
+    ruta = os.path.join(faiss_code_dir, "chunks.npy")
+    if len(padres) == n_docs:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        return False
+    np.save(ruta, padres.astype(np.int32))
+    return True
+
+
+def hashes_vigentes(codigos):
+    """Hashes de los trozos de los códigos tal como quedan en JSON_DIR (procesados u omitidos)."""
+    vigentes = set()
+    for codigo_info in codigos:
+        json_path = os.path.join(JSON_DIR, f"{codigo_info['id']}.json")
+        if os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                textos, _ = trocear_articulos(json.load(f))
+            vigentes.update(hash_texto(t) for t in textos)
+    return vigentes
+
 # ==================================================
 # FUNCIÓN DE CREACIÓN DE ÍNDICE FAISS
 # ==================================================
 
-def crear_indice_faiss(codigo_id):
+def _clave_doc(doc):
+    return json.dumps(doc, ensure_ascii=False, sort_keys=True)
+
+
+def actualizar_indice(faiss_code_dir, data, embeddings, padres, manifest):
+    """
+    Aplica sobre el índice existente solo las altas y bajas de artículos.
+
+    Los artículos que no cambiaron conservan sus filas; las filas (trozos) de los eliminados se
+    quitan con remove_ids (IndexFlat compacta sin alterar el orden) y los trozos de los nuevos o
+    modificados se añaden al final. ``embeddings``/``padres`` son los trozos de ``data``.
+    Devuelve el índice, los docs y el artículo padre de cada fila, alineados con el índice.
+    """
+    with open(os.path.join(faiss_code_dir, "docs.json"), "r", encoding="utf-8") as f:
+        docs_previos = json.load(f)
+    index = faiss.read_index(os.path.join(faiss_code_dir, "index.faiss"))
+    padres_previos = cargar_padres(faiss_code_dir, len(docs_previos))
+
+    filas_previas = defaultdict(list)
+    for fila, doc in enumerate(docs_previos):
+        filas_previas[_clave_doc(doc)].append(fila)
+
+    nuevos = []
+    for i, doc in enumerate(data):
+        filas = filas_previas[_clave_doc(doc)]
+        if filas:
+            filas.pop(0)
+        else:
+            nuevos.append(i)
+    eliminados = sorted(fila for filas in filas_previas.values() for fila in filas)
+
+    conservar = np.ones(len(docs_previos), dtype=bool)
+    conservar[eliminados] = False
+    # Nueva posición de cada artículo conservado tras compactar
+    nueva_pos = np.cumsum(conservar) - 1
+
+    filas_borrar = np.flatnonzero(~conservar[padres_previos])
+    if len(filas_borrar):
+        index.remove_ids(filas_borrar.astype("int64"))
+    padres_finales = [nueva_pos[padres_previos[conservar[padres_previos]]]]
+
+    base = int(conservar.sum())
+    for k, i in enumerate(nuevos):
+        filas = np.flatnonzero(padres == i)
+        index.add(preparar_embeddings(embeddings[filas], manifest["metric"]))
+        padres_finales.append(np.full(len(filas), base + k, dtype=np.int32))
+
+    docs = [doc for fila, doc in enumerate(docs_previos) if conservar[fila]] + [data[i] for i in nuevos]
+    print(f"♻️ Actualización incremental: {len(nuevos)} altas, {len(eliminados)} bajas.")
+    return index, docs, np.concatenate(padres_finales).astype(np.int32)
+
+
+def admite_actualizacion(faiss_code_dir, tipo):
+    """Solo los índices planos con la misma configuración se pueden actualizar en sitio."""
+    manifest = leer_manifest(faiss_code_dir)
+    if manifest is None or not os.path.exists(os.path.join(faiss_code_dir, "docs.json")):
+        return None
+    if tipo != "flat" or manifest.get("index_type") != tipo:
+        return None
+    if manifest.get("metric") != FAISS_METRIC or manifest.get("model") != EMBEDDING_MODEL:
+        return None
+    if manifest.get("encoder", "torch") != EMBEDDING_BACKEND:
+        return None
+    if manifest.get("chunking") != config_troceado():
+        return None
+    return manifest
+
+
+def config_troceado():
+    return {"max_words": CHUNK_MAX_PALABRAS, "overlap_words": CHUNK_SOLAPE_PALABRAS}
+
+
+def sin_cambios(codigo_info, pdf_sha256):
+    """True si el PDF y la configuración del índice son los mismos de la última construcción."""
+    faiss_code_dir = os.path.join(FAISS_DIR, codigo_info["id"])
+    manifest = leer_manifest(faiss_code_dir)
+    return (
+        manifest is not None
+        and manifest.get("pdf_sha256") == pdf_sha256
+        and manifest.get("index_type") == tipo_indice_para(codigo_info["id"])
+        and manifest.get("metric") == FAISS_METRIC
+        and manifest.get("model") == EMBEDDING_MODEL
+        and manifest.get("encoder", "torch") == EMBEDDING_BACKEND
+        and manifest.get("chunking") == config_troceado()
+        and os.path.exists(os.path.join(faiss_code_dir, "index.faiss"))
+        and os.path.exists(os.path.join(faiss_code_dir, BM25_FICHERO))
+        and os.path.exists(os.path.join(faiss_code_dir, "articles.json"))
+        and os.path.exists(os.path.join(faiss_code_dir, "centroids.npy"))
+    )
+
+
+def crear_indice_faiss(codigo_id, cache=None, incremental=False, pdf_sha256=None):
     """
     Crea un índice FAISS y un archivo docs.json a partir de un archivo JSON de artículos.
+
+    Con ``incremental`` actualiza el índice existente (altas/bajas) en vez de reconstruirlo.
+    Los embeddings se toman de ``cache`` (hash del texto -> vector) cuando están disponibles.
     """
     json_path = os.path.join(JSON_DIR, f"{codigo_id}.json")
     faiss_code_dir = os.path.join(FAISS_DIR, codigo_id)
@@ -101,31 +303,91 @@ def crear_indice_faiss(codigo_id):
         print(f"⚠️ El archivo {json_path} está vacío. Se omite.")
         return
 
-    textos = [a["texto"] for a in data]
-    modelo = SentenceTransformer(EMBEDDING_MODEL)
-    embeddings = modelo.encode(textos, show_progress_bar=True)
-    embeddings = np.array(embeddings).astype("float32")
+    # Un vector por trozo; los artículos cortos son un único trozo
+    textos, padres = trocear_articulos(data)
+    embeddings = calcular_embeddings(textos, cache if cache is not None else {})
 
-    index = faiss.IndexFlatL2(embeddings.shape[1])
-    index.add(embeddings)
+    tipo = tipo_indice_para(codigo_id)
+    manifest = admite_actualizacion(faiss_code_dir, tipo) if incremental else None
+    if manifest is not None:
+        index, data, padres = actualizar_indice(faiss_code_dir, data, embeddings, padres, manifest)
+    else:
+        index = crear_indice(embeddings, tipo)
 
-    faiss.write_index(index, os.path.join(faiss_code_dir, "index.faiss"))
+    # Escritura atómica: un backend con recarga en caliente puede tener el índice anterior abierto con mmap
+    with escritura_atomica(os.path.join(faiss_code_dir, "index.faiss")) as ruta:
+        faiss.write_index(index, ruta)
+    ruta_vectores = os.path.join(faiss_code_dir, "vectors.npy")
+    if tipo in TIPOS_COMPRIMIDOS:
+        # Vectores exactos para el re-scoring (el backend los abre con mmap)
+        guardar_vectores_rescore(embeddings, faiss_code_dir)
+    elif os.path.exists(ruta_vectores):
+        os.remove(ruta_vectores)
+    # Centroides del código para el enrutado de preguntas en el backend
+    guardar_centroides(embeddings, faiss_code_dir)
+    troceado = guardar_padres(faiss_code_dir, padres, len(data))
+    extra = {"pdf_sha256": pdf_sha256} if pdf_sha256 else {}
+    escribir_manifest(
+        faiss_code_dir,
+        index,
+        tipo,
+        chunking=config_troceado(),
+        articles=len(data),
+        chunked=troceado,
+        encoder=EMBEDDING_BACKEND,
+        **extra,
+    )
 
-    # Guardar los documentos originales para referencia
-    with open(os.path.join(faiss_code_dir, "docs.json"), "w", encoding="utf-8") as f:
+    # Guardar los documentos originales para referencia (atómico, como el resto del índice)
+    with escritura_atomica(os.path.join(faiss_code_dir, "docs.json")) as ruta, open(ruta, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    # Copia compacta (JSONL + offsets) que el backend abre con mmap
+    guardar_docs_compactos(data, faiss_code_dir)
+    # Número de artículo -> fila, para responder "artículo 45 del Código ..." sin embeddings
+    guardar_mapa_articulos(data, faiss_code_dir)
+    # Índice invertido BM25 para la búsqueda híbrida
+    guardar_indice_lexico(data, faiss_code_dir)
 
-    print(f"✔ Índice FAISS para {codigo_id} creado con {len(data)} artículos.")
+    print(f"✔ Índice FAISS ({tipo}) para {codigo_id} creado con {len(data)} artículos ({index.ntotal} trozos).")
 
 # ==================================================
 # EJECUCIÓN PRINCIPAL
 # ==================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye la base de conocimiento (JSON + índices FAISS).")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="omite PDFs sin cambios y actualiza los índices con altas/bajas en vez de reconstruirlos",
+    )
+    args = parser.parse_args()
+
     print("🚀 Iniciando la construcción de la base de conocimiento...")
+    # Una caché por modelo y runtime: los vectores int8/onnx difieren ligeramente de los de torch
+    clave_cache = cache_key(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+    cache = cargar_cache(clave_cache)
 
+    pendientes = []
     for codigo_info in CODIGOS_A_PROCESAR:
-        if parsear_pdf_a_json(codigo_info):
-            crear_indice_faiss(codigo_info["id"])
+        pdf_path = os.path.join(PDF_DIR, codigo_info["pdf_filename"])
+        pdf_sha256 = hash_archivo(pdf_path) if os.path.exists(pdf_path) else None
+        if args.incremental and pdf_sha256 and sin_cambios(codigo_info, pdf_sha256):
+            print(f"⏭️ {codigo_info['id']}: PDF sin cambios, se omite.")
+            continue
+        pendientes.append((codigo_info, pdf_path, pdf_sha256))
+
+    # Extracción de texto de todos los PDFs pendientes en paralelo
+    extraidos = extraer_pdfs([pdf for _, pdf, sha in pendientes if sha], TEXTO_DIR)
+
+    for codigo_info, pdf_path, pdf_sha256 in pendientes:
+        ruta_txt = extraidos[pdf_path]["ruta_txt"] if pdf_path in extraidos else None
+        if parsear_pdf_a_json(codigo_info, ruta_txt):
+            crear_indice_faiss(codigo_info["id"], cache, incremental=args.incremental, pdf_sha256=pdf_sha256)
 
+    # Solo se conservan los vectores de textos que siguen en la base
+    guardar_cache(cache, clave_cache, vigentes=hashes_vigentes(CODIGOS_A_PROCESAR))
+    guardar_indice_global()
+    # Lo último: el backend recarga cuando ve la marca nueva, no a mitad de la reconstrucción
+    escribir_marca_construccion(FAISS_DIR)
     print("\n✅ Proceso completado.")
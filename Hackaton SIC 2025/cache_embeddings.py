@@ -0,0 +1,54 @@
+"""
+Caché persistente de embeddings por hash del texto del artículo.
+
+Permite que build_knowledge_base.py solo recalcule los embeddings de artículos nuevos o
+modificados. Hay un fichero .npz por modelo en Dataset/EmbeddingsCache/.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, EMBEDDINGS_CACHE_DIR
+
+
+def hash_texto(texto):
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def hash_archivo(ruta, bloque=1 << 20):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def ruta_cache(modelo=EMBEDDING_MODEL):
+    return os.path.join(EMBEDDINGS_CACHE_DIR, modelo.replace("/", "__") + ".npz")
+
+
+def cargar_cache(modelo=EMBEDDING_MODEL):
+    """Devuelve un dict hash -> vector float32 (vacío si aún no hay caché)."""
+    ruta = ruta_cache(modelo)
+    if not os.path.exists(ruta):
+        return {}
+    datos = np.load(ruta)
+    return dict(zip(datos["hashes"].tolist(), datos["vectores"]))
+
+
+def guardar_cache(cache, modelo=EMBEDDING_MODEL, vigentes=None):
+    """
+    Escribe la caché de forma atómica. Con ``vigentes`` (hashes de los textos que siguen en la base)
+    se descartan antes los vectores de artículos modificados o eliminados; si no, la caché solo crece.
+    """
+    hashes = list(cache) if vigentes is None else [h for h in cache if h in vigentes]
+    if not hashes:
+        return
+    os.makedirs(EMBEDDINGS_CACHE_DIR, exist_ok=True)
+    ruta = ruta_cache(modelo)
+    tmp = ruta + ".tmp.npz"
+    np.savez(tmp, hashes=np.array(hashes), vectores=np.stack([cache[h] for h in hashes]).astype("float32"))
+    os.replace(tmp, ruta)
+    descartados = len(cache) - len(hashes)
+    print(f"💾 Caché de embeddings: {len(hashes)} vectores en {ruta} ({descartados} obsoletos descartados)")
@@ -1,12 +1,12 @@
 import os
-from langchain_community.document_loaders import PyPDFLoader
+from concurrent.futures import ProcessPoolExecutor
 
-RUTA = "Dataset/Codigos"
+from extraccion_paralela import contar_paginas, listar_pdfs
 
-for archivo in os.listdir(RUTA):
-    if archivo.endswith(".pdf"):
-        ruta_pdf = os.path.join(RUTA, archivo)
-        loader = PyPDFLoader(ruta_pdf)
-        documentos = loader.load()
+RUTA = "Dataset/Codigos"
 
-        print(f"{archivo} -> {len(documentos)} páginas cargadas")
+if __name__ == "__main__":
+    rutas = listar_pdfs(RUTA)
+    with ProcessPoolExecutor() as pool:
+        for ruta_pdf, paginas in zip(rutas, pool.map(contar_paginas, rutas)):
+            print(f"{os.path.basename(ruta_pdf)} -> {paginas} páginas cargadas")
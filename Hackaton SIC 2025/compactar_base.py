@@ -0,0 +1,138 @@
+"""
+Formato compacto de la base para que el backend la cargue con mmap.
+
+Por cada código en Dataset/FAISS/<codigo>/ se escribe:
+  - docs.jsonl          un artículo JSON por línea (UTF-8)
+  - docs.offsets.npy    offsets en bytes de cada línea (n + 1 valores, uint64)
+  - articles.json       número de artículo canónico ("45", "12A") -> filas en docs (consulta directa)
+  - centroids.npy       centroides k-means del código para enrutar preguntas
+
+Además se escribe Dataset/FAISS/_global/ con el índice fusionado de todos los códigos
+(index.faiss + codes.json con el orden, número de filas y build_id de cada código + manifest.json),
+que el backend usa para la búsqueda global sin reconstruirlo en cada worker. Al final se escribe
+Dataset/FAISS/build.json, la marca de construcción terminada que vigila la recarga en caliente.
+
+Ejecutado como script convierte los docs.json ya existentes sin recalcular embeddings
+(también el índice BM25 de indice_lexico.py) y añade manifest.json (L2, sin normalizar)
+a los índices antiguos que no lo tienen:
+
+    python compactar_base.py
+"""
+import json
+import os
+import sys
+
+import faiss
+import numpy as np
+
+from config import BASE_DIR, EMBEDDING_MODEL, FAISS_DIR, FAISS_METRIC
+from indice_lexico import guardar_indice_lexico
+from indices_faiss import (
+    TIPOS_COMPRIMIDOS,
+    escribir_manifest,
+    escribir_marca_construccion,
+    escritura_atomica,
+    guardar_centroides,
+    indice_plano,
+    leer_manifest,
+)
+
+# articles.json usa la misma forma canónica ("12-a" -> "12A") con la que consulta el backend
+sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+from articles import build_article_map  # noqa: E402
+
+GLOBAL_DIRNAME = "_global"
+
+
+def guardar_docs_compactos(data, faiss_code_dir):
+    """Guarda los artículos como blob JSONL indexado por offsets."""
+    offsets = [0]
+    # Ambos con escritura atómica: el backend los tiene abiertos con mmap (DocStore)
+    with escritura_atomica(os.path.join(faiss_code_dir, "docs.jsonl")) as ruta, open(ruta, "wb") as f:
+        for doc in data:
+            linea = json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(linea)
+            offsets.append(offsets[-1] + len(linea))
+    with escritura_atomica(os.path.join(faiss_code_dir, "docs.offsets.npy")) as ruta:
+        np.save(ruta, np.asarray(offsets, dtype=np.uint64))
+
+
+def guardar_mapa_articulos(data, faiss_code_dir):
+    """Guarda articles.json: número de artículo -> filas de docs (hay números repetidos en algunos códigos)."""
+    mapa = build_article_map(data)
+    # Atómica: el backend lo lee al cargar o recargar y no debe verlo a medias
+    with escritura_atomica(os.path.join(faiss_code_dir, "articles.json")) as ruta, open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"count": len(data), "articles": mapa}, f, ensure_ascii=False)
+
+
+def _vectores(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def guardar_indice_global(faiss_dir=FAISS_DIR):
+    """Fusiona los índices de cada código en Dataset/FAISS/_global/index.faiss.
+
+    Solo se fusionan índices con el modelo y la métrica configurados (según su manifest.json)
+    y sin compresión (sq8/pq/ivf_pq).
+    """
+    codigos = []
+    global_index = None
+    referencia = (EMBEDDING_MODEL, FAISS_METRIC)
+    for nombre in sorted(os.listdir(faiss_dir)):
+        ruta = os.path.join(faiss_dir, nombre, "index.faiss")
+        if nombre == GLOBAL_DIRNAME or not os.path.exists(ruta):
+            continue
+        manifest = leer_manifest(os.path.join(faiss_dir, nombre))
+        if manifest is None:
+            print(f"⚠️ {nombre} no tiene manifest.json; se omite del índice global.")
+            continue
+        if manifest.get("index_type") in TIPOS_COMPRIMIDOS:
+            # Un índice global plano deshace la compresión: el backend busca código a código.
+            print(f"⚠️ {nombre} usa vectores comprimidos ({manifest['index_type']}); se omite del índice global.")
+            continue
+        clave = (manifest["model"], manifest["metric"])
+        if clave != referencia:
+            print(f"⚠️ {nombre} usa {clave}, distinto de {referencia}; se omite del índice global.")
+            continue
+        index = faiss.read_index(ruta)
+        if global_index is None:
+            global_index = indice_plano(index.d, FAISS_METRIC)
+        global_index.add(_vectores(index))
+        codigos.append([nombre, index.ntotal, manifest.get("build_id")])
+
+    if global_index is None:
+        print("⚠️ No hay índices por código para fusionar.")
+        return
+
+    global_dir = os.path.join(faiss_dir, GLOBAL_DIRNAME)
+    os.makedirs(global_dir, exist_ok=True)
+    with escritura_atomica(os.path.join(global_dir, "index.faiss")) as ruta:
+        faiss.write_index(global_index, ruta)
+    escribir_manifest(global_dir, global_index, "flat")
+    with escritura_atomica(os.path.join(global_dir, "codes.json")) as ruta, open(ruta, "w", encoding="utf-8") as f:
+        json.dump(codigos, f, ensure_ascii=False, indent=2)
+    print(f"✔ Índice global con {global_index.ntotal} artículos de {len(codigos)} códigos.")
+
+
+if __name__ == "__main__":
+    for nombre in sorted(os.listdir(FAISS_DIR)):
+        docs_path = os.path.join(FAISS_DIR, nombre, "docs.json")
+        if not os.path.exists(docs_path):
+            continue
+        code_dir = os.path.join(FAISS_DIR, nombre)
+        with open(docs_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        guardar_docs_compactos(data, code_dir)
+        guardar_mapa_articulos(data, code_dir)
+        guardar_indice_lexico(data, code_dir)
+        index = faiss.read_index(os.path.join(code_dir, "index.faiss"))
+        guardar_centroides(_vectores(index), code_dir)
+        if leer_manifest(code_dir) is None:
+            # Los índices anteriores al manifest se construyeron con IndexFlatL2 sin normalizar.
+            escribir_manifest(code_dir, index, "flat", metrica="l2")
+        print(f"✔ {nombre}: {len(data)} artículos compactados.")
+    guardar_indice_global()
+    escribir_marca_construccion(FAISS_DIR)
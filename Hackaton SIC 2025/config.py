@@ -1,3 +1,4 @@
+import json
 import os
 
 # ==================================================
@@ -5,14 +6,24 @@ import os
 # ==================================================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PDF_DIR = os.path.join(BASE_DIR, "Dataset/Codigos")
+# Texto crudo extraído de PDF_DIR por build_knowledge_base.py (extraccion_paralela)
+TEXTO_DIR = os.path.join(BASE_DIR, "Dataset/Texto")
 JSON_DIR = os.path.join(BASE_DIR, "Dataset/JSON")
 FAISS_DIR = os.path.join(BASE_DIR, "Dataset/FAISS")
+# Caché persistente hash de artículo -> embedding (un fichero por modelo)
+EMBEDDINGS_CACHE_DIR = os.path.join(BASE_DIR, "Dataset/EmbeddingsCache")
+# Resultados JSON de benchmark_chat.py (para comparar entre versiones con --base)
+BENCHMARKS_DIR = os.path.join(BASE_DIR, "Dataset/Benchmarks")
 
 # ==================================================
 # CONFIGURACIÓN DE MODELOS
 # ==================================================
 GEMINI_MODEL = "gemini-1.5-flash"
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Runtime del encoder: "torch" (SentenceTransformer), "int8" (cuantización dinámica de torch)
+# u "onnx" (modelo de exportar_onnx.py en EMBEDDING_ONNX_DIR; usa model_int8.onnx si existe)
+EMBEDDING_BACKEND = "torch"
+EMBEDDING_ONNX_DIR = os.path.join(BASE_DIR, "Dataset/Modelos/all-MiniLM-L6-v2-onnx")
 
 # ==================================================
 # CONFIGURACIÓN DE CÓDIGOS LEGALES
@@ -24,33 +35,81 @@ CODIGOS_A_PROCESAR = [
         "id": "codigo_familia",
         "pdf_filename": "codigo_familia.pdf",
         "nombre_completo": "Código de la Familia",
-        "rama": "Derecho de Familia",
-        "keywords": ["familia", "matrimonio", "alimentos", "adopción", "patria potestad"]
+        "rama": "Derecho de Familia"
     },
     {
         "id": "codigo_penal",
         "pdf_filename": "codigo_penal.pdf",
         "nombre_completo": "Código Penal",
-        "rama": "Derecho Penal",
-        "keywords": ["penal", "delito", "pena", "homicidio", "robo", "hurto", "estafa"]
+        "rama": "Derecho Penal"
     },
     {
         "id": "codigo_trabajo",
         "pdf_filename": "codigo_trabajo.pdf",
         "nombre_completo": "Código de Trabajo",
-        "rama": "Derecho Laboral",
-        "keywords": ["trabajo", "laboral", "trabajador", "contrato", "despido", "salario"]
+        "rama": "Derecho Laboral"
     },
     {
         "id": "codigo_civil",
         "pdf_filename": "codigo_civil.pdf",
         "nombre_completo": "Código Civil",
-        "rama": "Derecho Civil",
-        "keywords": ["civil", "contrato", "obligación", "propiedad", "herencia"]
+        "rama": "Derecho Civil"
     }
 ]
 
-# Mapeo para la detección de códigos en el chatbot
-CODIGOS_CHATBOT = {
-    codigo["id"]: codigo["keywords"] for codigo in CODIGOS_A_PROCESAR
+# Palabras clave (con peso) para la detección de códigos en el chatbot. Es la misma tabla que usan
+# backend/code_detector.py y detectar_codigo.py, para que no diverjan.
+CODE_KEYWORDS_PATH = os.path.join(BASE_DIR, "data/code_keywords.json")
+with open(CODE_KEYWORDS_PATH, "r", encoding="utf-8") as _f:
+    CODIGOS_CHATBOT = {codigo: palabras for codigo, palabras in json.load(_f).items() if not codigo.startswith("_")}
+
+# ==================================================
+# TROCEADO DE ARTÍCULOS LARGOS
+# ==================================================
+
+# MiniLM trunca a 256 tokens (~160 palabras en español): los artículos más largos se indexan
+# en ventanas solapadas, cada una apuntando a su artículo.
+CHUNK_MAX_PALABRAS = 160
+CHUNK_SOLAPE_PALABRAS = 40
+
+# ==================================================
+# ÍNDICE LÉXICO (BM25)
+# ==================================================
+
+# Saturación de la frecuencia de término y normalización por longitud del artículo
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# ==================================================
+# ENRUTADO POR CENTROIDES
+# ==================================================
+
+# Centroides k-means por código (centroids.npy) para enrutar la pregunta a los códigos más parecidos
+ROUTER_CENTROIDES = 4
+
+# ==================================================
+# CONFIGURACIÓN DE ÍNDICES FAISS
+# ==================================================
+
+# Métrica de los índices: "l2" (distancia euclídea sobre vectores crudos) o
+# "ip" (producto interno sobre vectores normalizados = similitud coseno)
+FAISS_METRIC = "l2"
+
+# Tipo de índice por defecto: "flat" (exacto), "ivf_flat", "ivf_pq", "hnsw" o los comprimidos
+# "sq8" (8 bits por dimensión) y "pq" (pq_m bytes por artículo). Los comprimidos (también ivf_pq)
+# guardan además vectors.npy para re-puntuar de forma exacta los mejores candidatos.
+FAISS_INDEX_TYPE = "flat"
+
+# Tipo de índice por código (sobrescribe FAISS_INDEX_TYPE), p. ej. {"codigo_civil": "hnsw"}
+FAISS_INDEX_POR_CODIGO = {}
+
+# Parámetros de construcción y búsqueda de los índices aproximados
+FAISS_INDEX_PARAMS = {
+    "nlist": 64,            # listas invertidas (IVF)
+    "nprobe": 8,            # listas visitadas por consulta (IVF)
+    "pq_m": 16,             # subvectores PQ (debe dividir la dimensión, 384) = bytes por artículo
+    "pq_nbits": 8,          # bits por subvector PQ
+    "hnsw_m": 32,           # vecinos por nodo (HNSW)
+    "ef_construction": 80,  # amplitud de construcción (HNSW)
+    "ef_search": 64,        # amplitud de búsqueda (HNSW)
 }
@@ -1,16 +1,28 @@
-def detectar_codigo(pregunta: str):
-    p = pregunta.lower()
+"""
+Detección del código legal de una pregunta, con el mismo detector que el backend
+(backend/code_detector.py) y la tabla de palabras clave de data/code_keywords.json.
+
+    python detectar_codigo.py "¿Cuántos días de licencia por maternidad?"
+"""
+import os
+import sys
+
+from config import CODIGOS_CHATBOT
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from code_detector import CodeDetector  # noqa: E402
 
-    if "trabajo" in p or "laboral" in p or "empleador" in p or "trabajador" in p:
-        return "codigo_trabajo"
+_detector = CodeDetector(CODIGOS_CHATBOT)
 
-    if "penal" in p or "delito" in p or "pena" in p or "hurto" in p:
-        return "codigo_penal"
 
-    if "civil" in p or "contrato" in p or "obligación" in p or "responsabilidad" in p:
-        return "codigo_civil"
+def detectar_codigos(pregunta: str, limite: int = 3):
+    """Lista de (codigo_id, peso) de los códigos candidatos, de más a menos probable."""
+    return _detector.rank(pregunta, limite)
+
+
+def detectar_codigo(pregunta: str):
+    return _detector.detect(pregunta)
 
-    if "familia" in p or "matrimonio" in p or "divorcio" in p:
-        return "codigo_familia"
 
-    return None
+if __name__ == "__main__":
+    print(detectar_codigos(" ".join(sys.argv[1:])))
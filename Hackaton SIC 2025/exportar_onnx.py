@@ -0,0 +1,76 @@
+"""
+Exporta el modelo de embeddings a ONNX (fp32) y una versión cuantizada a int8 dinámica,
+para usarlos con EMBEDDING_BACKEND = "onnx" (build) o LEGALBOT_ENCODER_BACKEND=onnx (backend).
+
+Escribe en EMBEDDING_ONNX_DIR:
+  - model.onnx          transformer exportado (salida: embeddings por token)
+  - model_int8.onnx     pesos int8 (onnxruntime.quantization.quantize_dynamic)
+  - tokenizer*          tokenizer de Hugging Face
+  - encoder.json        modelo de origen, max_seq_length y si se normaliza tras el mean pooling
+
+    python exportar_onnx.py
+    python test_paridad_encoder.py --backend onnx   # comprobar paridad antes de usarlo
+
+Requiere onnx y onnxruntime (no están en requirements: solo hacen falta para este backend).
+"""
+import argparse
+import json
+import os
+
+import torch
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import Normalize
+
+from config import EMBEDDING_MODEL, EMBEDDING_ONNX_DIR
+
+
+def exportar(destino=EMBEDDING_ONNX_DIR, modelo_id=EMBEDDING_MODEL, cuantizar=True):
+    os.makedirs(destino, exist_ok=True)
+    modelo = SentenceTransformer(modelo_id, device="cpu")
+    transformer = modelo[0].auto_model.eval()
+    tokenizer = modelo.tokenizer
+
+    ejemplo = tokenizer(["Artículo 1. Texto de ejemplo."], return_tensors="pt")
+    entradas = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in ejemplo]
+    ejes = {n: {0: "batch", 1: "tokens"} for n in entradas}
+    ejes["token_embeddings"] = {0: "batch", 1: "tokens"}
+
+    ruta_onnx = os.path.join(destino, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(ejemplo[n] for n in entradas),
+            ruta_onnx,
+            input_names=entradas,
+            output_names=["token_embeddings"],
+            dynamic_axes=ejes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(destino)
+    with open(os.path.join(destino, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "model": modelo_id,
+                "max_seq_length": modelo.max_seq_length,
+                "normalize": any(isinstance(m, Normalize) for m in modelo),
+                "pooling": "mean",
+            },
+            f,
+            indent=2,
+        )
+    print(f"✔ {ruta_onnx}")
+
+    if cuantizar:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        ruta_int8 = os.path.join(destino, "model_int8.onnx")
+        quantize_dynamic(ruta_onnx, ruta_int8, weight_type=QuantType.QInt8)
+        print(f"✔ {ruta_int8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el encoder a ONNX (+ int8).")
+    parser.add_argument("--destino", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--sin-int8", action="store_true", help="solo el modelo fp32")
+    args = parser.parse_args()
+    exportar(args.destino, cuantizar=not args.sin_int8)
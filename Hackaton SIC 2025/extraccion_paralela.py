@@ -0,0 +1,137 @@
+"""
+Extracción de texto de PDFs en paralelo con un pool de procesos.
+
+Cada PDF se divide en rangos de páginas; cada rango lo procesa un proceso distinto y
+escribe su texto página a página en un fichero parcial, sin acumular el documento en
+memoria. Al terminar todos los rangos de un PDF, las partes se concatenan en orden en
+el .txt final (equivalente a "\\n".join(texto de cada página), como PyPDFLoader).
+
+    python extraccion_paralela.py Dataset/Legislacion Dataset/TXT --procesos 8
+"""
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pypdf import PdfReader
+
+PAGINAS_POR_TAREA = 40
+
+
+def contar_paginas(ruta_pdf):
+    return len(PdfReader(ruta_pdf).pages)
+
+
+def _extraer_rango(ruta_pdf, inicio, fin, ruta_parte):
+    """Extrae las páginas [inicio, fin) a ``ruta_parte``. Devuelve (caracteres, segundos)."""
+    t0 = time.perf_counter()
+    lector = PdfReader(ruta_pdf)
+    caracteres = 0
+    with open(ruta_parte, "w", encoding="utf-8") as f:
+        for n in range(inicio, fin):
+            if n > inicio:
+                f.write("\n")
+            texto = lector.pages[n].extract_text() or ""
+            f.write(texto)
+            caracteres += len(texto)
+    return caracteres, time.perf_counter() - t0
+
+
+def _unir_partes(partes, destino):
+    with open(destino, "w", encoding="utf-8") as salida:
+        for i, parte in enumerate(partes):
+            if i:
+                salida.write("\n")
+            with open(parte, "r", encoding="utf-8") as f:
+                shutil.copyfileobj(f, salida)
+            os.remove(parte)
+
+
+def nombres_salida(rutas_pdf):
+    """
+    Nombre (sin extensión) del .txt de cada PDF. Las salidas van todas a un mismo directorio,
+    así que dos PDFs con el mismo nombre en carpetas distintas se pisarían: se rechazan.
+    """
+    nombres, usados = {}, {}
+    for ruta in rutas_pdf:
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        # Sin distinguir mayúsculas: en Windows/macOS "Codigo.pdf" y "codigo.PDF" son el mismo .txt
+        otra = usados.setdefault(nombre.lower(), ruta)
+        if os.path.abspath(otra) != os.path.abspath(ruta):
+            raise ValueError(f"{ruta} y {otra} escribirían el mismo {nombre}.txt; renombra uno de los dos")
+        nombres[ruta] = nombre
+    return nombres
+
+
+def extraer_pdfs(rutas_pdf, destino_dir, procesos=None, paginas_por_tarea=PAGINAS_POR_TAREA):
+    """
+    Extrae el texto de varios PDFs a ``destino_dir/<nombre>.txt`` en paralelo,
+    repartiendo tanto los archivos como los rangos de páginas de los PDFs grandes.
+    Falla antes de empezar si dos PDFs comparten ``<nombre>``.
+
+    Devuelve un dict ruta_pdf -> estadísticas (páginas, caracteres, segundos, ruta_txt).
+    """
+    nombres = nombres_salida(rutas_pdf)
+    os.makedirs(destino_dir, exist_ok=True)
+    inicio_total = time.perf_counter()
+    estado = {}
+    tareas = []
+
+    for ruta, nombre in nombres.items():
+        paginas = contar_paginas(ruta)
+        rangos = [(a, min(a + paginas_por_tarea, paginas)) for a in range(0, paginas, paginas_por_tarea)]
+        partes = [os.path.join(destino_dir, f".{nombre}.parte{i:04d}") for i in range(len(rangos))]
+        estado[ruta] = {
+            "paginas": paginas,
+            "caracteres": 0,
+            "segundos_cpu": 0.0,
+            "segundos": 0.0,
+            "pendientes": len(rangos),
+            "partes": partes,
+            "ruta_txt": os.path.join(destino_dir, f"{nombre}.txt"),
+        }
+        tareas.extend((ruta, a, b, parte) for (a, b), parte in zip(rangos, partes))
+        if not rangos:
+            open(estado[ruta]["ruta_txt"], "w", encoding="utf-8").close()
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(_extraer_rango, *tarea): tarea[0] for tarea in tareas}
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            info = estado[ruta]
+            caracteres, segundos = futuro.result()
+            info["caracteres"] += caracteres
+            info["segundos_cpu"] += segundos
+            info["pendientes"] -= 1
+            if info["pendientes"] == 0:
+                _unir_partes(info["partes"], info["ruta_txt"])
+                info["segundos"] = time.perf_counter() - inicio_total
+                print(
+                    f"📄 {os.path.basename(ruta)}: {info['paginas']} págs, {info['caracteres']:,} caracteres, "
+                    f"{info['paginas'] / max(info['segundos_cpu'], 1e-9):.1f} págs/s por proceso, "
+                    f"listo a los {info['segundos']:.1f}s"
+                )
+
+    total_paginas = sum(info["paginas"] for info in estado.values())
+    duracion = time.perf_counter() - inicio_total
+    print(f"✔ {len(estado)} PDFs, {total_paginas} páginas en {duracion:.1f}s ({total_paginas / max(duracion, 1e-9):.1f} págs/s)")
+
+    for info in estado.values():
+        del info["pendientes"], info["partes"]
+    return estado
+
+
+def listar_pdfs(directorio):
+    return sorted(os.path.join(directorio, a) for a in os.listdir(directorio) if a.lower().endswith(".pdf"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrae el texto de todos los PDFs de un directorio en paralelo.")
+    parser.add_argument("origen", help="directorio con PDFs")
+    parser.add_argument("destino", help="directorio de salida para los .txt")
+    parser.add_argument("--procesos", type=int, default=None, help="por defecto, uno por CPU")
+    parser.add_argument("--paginas-por-tarea", type=int, default=PAGINAS_POR_TAREA)
+    args = parser.parse_args()
+
+    extraer_pdfs(listar_pdfs(args.origen), args.destino, args.procesos, args.paginas_por_tarea)
@@ -16,6 +16,8 @@ const drawers = {
 // Ejemplo en consola: window.LEGALBOT_API_URL = "http://localhost:8000/api/chat";
 const DEFAULT_API_URL = "http://localhost:8000/api/chat";
 const API_URL = window.LEGALBOT_API_URL || DEFAULT_API_URL;
+// Variante por server-sent events (mismo cuerpo); null la desactiva y se usa solo API_URL.
+const STREAM_URL = window.LEGALBOT_STREAM_URL === undefined ? `${API_URL}/stream` : window.LEGALBOT_STREAM_URL;
 
 const knowledgeBase = [
   {
@@ -52,12 +54,7 @@ const knowledgeBase = [
   },
 ];
 
-function renderMessage(role, text, { citations = [] } = {}) {
-  const wrapper = document.createElement("div");
-  wrapper.className = `message ${role}`;
-
-  const bubble = document.createElement("div");
-  bubble.className = "bubble";
+function fillBubble(bubble, text, citations = []) {
   bubble.innerHTML = text.replace(/\n/g, "<br>");
 
   if (citations.length) {
@@ -71,10 +68,20 @@ function renderMessage(role, text, { citations = [] } = {}) {
     });
     bubble.appendChild(sourceWrap);
   }
+}
+
+function renderMessage(role, text, { citations = [] } = {}) {
+  const wrapper = document.createElement("div");
+  wrapper.className = `message ${role}`;
+
+  const bubble = document.createElement("div");
+  bubble.className = "bubble";
+  fillBubble(bubble, text, citations);
 
   wrapper.appendChild(bubble);
   chatLog.appendChild(wrapper);
   chatLog.scrollTop = chatLog.scrollHeight;
+  return bubble;
 }
 
 function showLoading() {
@@ -130,6 +137,103 @@ async function callBackend(question) {
   }
 }
 
+function parseSseBlock(block) {
+  let event = "message";
+  const data = [];
+  block.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data.push(line.slice(5).trim());
+  });
+  return data.length ? { event, data: JSON.parse(data.join("\n")) } : null;
+}
+
+// Lee /api/chat/stream y llama a onEvent(evento, datos) según llegan. Devuelve la ChatResponse del
+// evento "done"; lanza si el stream no se puede abrir o termina sin respuesta.
+async function streamBackend(question, onEvent) {
+  const res = await fetch(STREAM_URL, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify({
+      question,
+      strict: strictMode.checked,
+      citations: citationsToggle.checked,
+    }),
+  });
+  if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let final = null;
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let cut;
+    while ((cut = buffer.indexOf("\n\n")) >= 0) {
+      const parsed = parseSseBlock(buffer.slice(0, cut));
+      buffer = buffer.slice(cut + 2);
+      if (!parsed) continue;
+      if (parsed.event === "done") final = parsed.data;
+      onEvent(parsed.event, parsed.data);
+    }
+  }
+  if (!final) throw new Error("El stream terminó sin respuesta");
+  return final;
+}
+
+// Burbuja que se va llenando: cabecera con el código, viñetas de evidencia y texto generado.
+function createStreamingBubble() {
+  const bubble = renderMessage("assistant", "");
+  const header = document.createElement("p");
+  header.textContent = "Buscando artículos relevantes...";
+  const generated = document.createElement("p");
+  const list = document.createElement("div");
+  bubble.append(header, generated, list);
+
+  const scroll = () => {
+    chatLog.scrollTop = chatLog.scrollHeight;
+  };
+  return {
+    bubble,
+    onEvent(event, data) {
+      if (event === "code") {
+        header.textContent = data.codes.length ? `Código detectado: ${data.codes.join(", ")}` : "Buscando en todos los códigos...";
+      } else if (event === "evidence") {
+        const item = document.createElement("p");
+        item.textContent = data.bullet;
+        list.appendChild(item);
+      } else if (event === "token") {
+        generated.textContent += data.text;
+      } else if (event === "error") {
+        const note = document.createElement("p");
+        note.textContent = data.detail;
+        bubble.appendChild(note);
+      }
+      scroll();
+    },
+  };
+}
+
+async function answerWithStream(question, loadingNode) {
+  let live = null;
+  try {
+    const response = await streamBackend(question, (event, data) => {
+      if (!live) {
+        removeLoading(loadingNode);
+        live = createStreamingBubble();
+      }
+      live.onEvent(event, data);
+    });
+    fillBubble(live.bubble, response.answer || "Respuesta recibida.", response.sources || []);
+    return true;
+  } catch (err) {
+    // Si ya se mostró algo (p. ej. error 503 del servidor) se deja; si no, se usa /api/chat o el mock.
+    console.error("Streaming no disponible:", err);
+    return live !== null;
+  }
+}
+
 function buildMockAnswer(question) {
   const match = detectContext(question);
   const baseCitations = match
@@ -171,7 +275,7 @@ function resetChat() {
   });
 }
 
-chatForm.addEventListener("submit", (event) => {
+chatForm.addEventListener("submit", async (event) => {
   event.preventDefault();
   const question = userQuestion.value.trim();
   if (!question) return;
@@ -181,6 +285,10 @@ chatForm.addEventListener("submit", (event) => {
 
   const loadingNode = showLoading();
 
+  if (STREAM_URL) {
+    if (await answerWithStream(question, loadingNode)) return;
+  }
+
   setTimeout(async () => {
     const backendResponse = await callBackend(question);
     let text = "";
@@ -0,0 +1,108 @@
+"""
+Índice invertido BM25 sobre los artículos de cada código (Dataset/FAISS/<codigo>/bm25.npz).
+
+El backend lo combina con la búsqueda vectorial (backend/lexical.py): las consultas con
+números de artículo o términos exactos ("fuero de maternidad") son las que mejor resuelve.
+
+Formato (np.savez, sin pickle):
+  - terms      términos ordenados (str)
+  - indptr     inicio de las postings de cada término (n_terms + 1, int64)
+  - postings   fila del artículo en docs.json (int32)
+  - weights    peso BM25 ya calculado de cada posting (float32), así una consulta es
+               solo sumar pesos por artículo
+  - stopwords  palabras que se ignoran en la consulta
+  - n_docs, k1, b, version
+
+    python indice_lexico.py   # (re)construye bm25.npz para todos los códigos ya indexados
+"""
+import json
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+from config import BASE_DIR, BM25_B, BM25_K1, FAISS_DIR
+
+# Consulta y construcción deben tokenizar igual: se usa el tokenizador del backend.
+sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+from lexical import tokenize as tokenizar  # noqa: E402
+
+VERSION = 1
+NOMBRE_FICHERO = "bm25.npz"
+
+STOPWORDS = (
+    "a al ante con contra de del desde el en entre es la las le les lo los o para por que se sin "
+    "su sus un una uno y"
+).split()
+
+
+def construir_bm25(textos, k1=BM25_K1, b=BM25_B):
+    """Devuelve los arrays del índice BM25 de ``textos`` (uno por artículo)."""
+    vocabulario = {}
+    terminos, filas, frecuencias = [], [], []
+    longitudes = np.zeros(len(textos), dtype=np.float32)
+    vacias = set(STOPWORDS)
+
+    for fila, texto in enumerate(textos):
+        tokens = [t for t in tokenizar(texto) if t not in vacias]
+        longitudes[fila] = len(tokens)
+        for termino, tf in Counter(tokens).items():
+            terminos.append(vocabulario.setdefault(termino, len(vocabulario)))
+            filas.append(fila)
+            frecuencias.append(tf)
+
+    terminos = np.asarray(terminos, dtype=np.int64)
+    filas = np.asarray(filas, dtype=np.int32)
+    tf = np.asarray(frecuencias, dtype=np.float32)
+
+    # Vocabulario ordenado alfabéticamente y postings agrupadas por término
+    ordenados = sorted(vocabulario)
+    nuevo_id = np.empty(len(vocabulario), dtype=np.int64)
+    for posicion, termino in enumerate(ordenados):
+        nuevo_id[vocabulario[termino]] = posicion
+    terminos = nuevo_id[terminos]
+    orden = np.argsort(terminos, kind="stable")
+    terminos, filas, tf = terminos[orden], filas[orden], tf[orden]
+
+    n_docs = len(textos)
+    df = np.bincount(terminos, minlength=len(vocabulario)).astype(np.float32)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    media = float(longitudes.mean()) if n_docs else 0.0
+    norma = k1 * (1 - b + b * longitudes[filas] / max(media, 1e-9))
+    pesos = idf[terminos] * tf * (k1 + 1) / (tf + norma)
+
+    indptr = np.zeros(len(vocabulario) + 1, dtype=np.int64)
+    np.cumsum(df.astype(np.int64), out=indptr[1:])
+    return {
+        "terms": np.asarray(ordenados, dtype=str),
+        "indptr": indptr,
+        "postings": filas,
+        "weights": pesos.astype(np.float32),
+        "stopwords": np.asarray(STOPWORDS, dtype=str),
+        "n_docs": np.int64(n_docs),
+        "k1": np.float32(k1),
+        "b": np.float32(b),
+        "version": np.int64(VERSION),
+    }
+
+
+def guardar_indice_lexico(data, directorio):
+    """Escribe ``directorio/bm25.npz`` para la lista de artículos ``data`` (mismo orden que docs.json)."""
+    arrays = construir_bm25([doc.get("texto", "") for doc in data])
+    # np.savez añade ".npz" si el nombre no lo lleva
+    tmp = os.path.join(directorio, NOMBRE_FICHERO + ".tmp.npz")
+    np.savez(tmp, **arrays)
+    os.replace(tmp, os.path.join(directorio, NOMBRE_FICHERO))
+    return len(arrays["terms"])
+
+
+if __name__ == "__main__":
+    for nombre in sorted(os.listdir(FAISS_DIR)):
+        docs_path = os.path.join(FAISS_DIR, nombre, "docs.json")
+        if not os.path.exists(docs_path):
+            continue
+        with open(docs_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        n_terminos = guardar_indice_lexico(data, os.path.join(FAISS_DIR, nombre))
+        print(f"✔ {nombre}: BM25 con {len(data)} artículos y {n_terminos} términos.")
@@ -0,0 +1,201 @@
+import json
+import math
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from config import (
+    EMBEDDING_MODEL,
+    FAISS_INDEX_PARAMS,
+    FAISS_INDEX_POR_CODIGO,
+    FAISS_INDEX_TYPE,
+    FAISS_METRIC,
+    ROUTER_CENTROIDES,
+)
+
+TIPOS_INDICE = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "pq")
+# Tipos que guardan los vectores comprimidos: se acompañan de vectors.npy (float32) para que el
+# backend re-puntúe de forma exacta los mejores candidatos leyendo solo esas filas (mmap).
+TIPOS_COMPRIMIDOS = ("sq8", "pq", "ivf_pq")
+METRICAS = ("l2", "ip")
+
+# Versión del formato en disco (index.faiss + manifest.json); el backend rechaza versiones mayores.
+FORMATO_VERSION = 1
+# Marca de construcción terminada en la raíz de Dataset/FAISS: se escribe la última, así el backend
+# (LEGALBOT_RELOAD_POLL_SECONDS) solo vigila este fichero y no recarga un árbol a medio reconstruir.
+MARCA_CONSTRUCCION = "build.json"
+
+
+@contextmanager
+def escritura_atomica(ruta):
+    """
+    Ruta temporal junto a ``ruta`` (misma extensión) que se renombra sobre ella al terminar sin errores.
+
+    El backend abre index.faiss, vectors.npy y docs.jsonl con mmap y puede recargarlos en caliente:
+    con ``os.replace`` las consultas en curso siguen leyendo el fichero anterior en vez de verlo truncado.
+    """
+    base, extension = os.path.splitext(ruta)
+    temporal = f"{base}.tmp{extension}"
+    try:
+        yield temporal
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def tipo_indice_para(codigo_id):
+    """Devuelve el tipo de índice configurado para un código."""
+    return FAISS_INDEX_POR_CODIGO.get(codigo_id, FAISS_INDEX_TYPE)
+
+
+def _nbits_pq(n, nbits):
+    # Con pocos artículos no hay datos para entrenar 2^nbits centroides por subvector.
+    return min(nbits, int(math.log2(max(n // 39, 2))))
+
+
+def _nlist_para(n, nlist):
+    # FAISS recomienda ~39 vectores de entrenamiento por centroide.
+    return max(1, min(nlist, n // 39))
+
+
+def preparar_embeddings(embeddings, metrica=FAISS_METRIC):
+    """Convierte a float32 contiguo y, con métrica "ip", normaliza cada vector (norma L2 = 1)."""
+    embeddings = np.array(embeddings, dtype="float32", order="C")
+    if metrica == "ip":
+        faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def indice_plano(dim, metrica=FAISS_METRIC):
+    return faiss.IndexFlatIP(dim) if metrica == "ip" else faiss.IndexFlatL2(dim)
+
+
+def crear_indice(embeddings, tipo="flat", params=None, metrica=FAISS_METRIC):
+    """
+    Crea y entrena un índice FAISS del tipo pedido con los embeddings dados.
+
+    Con metrica="ip" los embeddings se normalizan y el índice usa producto interno (coseno).
+    Los parámetros de búsqueda (nprobe, efSearch) quedan guardados en el propio índice,
+    así el backend los usa al leerlo con faiss.read_index.
+    """
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"Tipo de índice desconocido: {tipo} (opciones: {', '.join(TIPOS_INDICE)})")
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica desconocida: {metrica} (opciones: {', '.join(METRICAS)})")
+
+    p = dict(FAISS_INDEX_PARAMS)
+    p.update(params or {})
+    embeddings = preparar_embeddings(embeddings, metrica)
+    n, dim = embeddings.shape
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metrica == "ip" else faiss.METRIC_L2
+
+    if tipo == "flat":
+        index = indice_plano(dim, metrica)
+
+    elif tipo == "sq8":
+        # 1 byte por dimensión (384 B por artículo en vez de 1536)
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+        index.train(embeddings)
+
+    elif tipo == "pq":
+        # pq_m bytes por artículo con nbits=8 (16 B con pq_m=16)
+        index = faiss.IndexPQ(dim, p["pq_m"], _nbits_pq(n, p["pq_nbits"]), faiss_metric)
+        index.train(embeddings)
+
+    elif tipo == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, p["hnsw_m"], faiss_metric)
+        index.hnsw.efConstruction = p["ef_construction"]
+        index.hnsw.efSearch = p["ef_search"]
+
+    else:
+        nlist = _nlist_para(n, p["nlist"])
+        quantizer = indice_plano(dim, metrica)
+        if tipo == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, p["pq_m"], _nbits_pq(n, p["pq_nbits"]), faiss_metric)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+        index.train(embeddings)
+        index.nprobe = min(p["nprobe"], nlist)
+
+    index.add(embeddings)
+    return index
+
+
+def guardar_vectores_rescore(embeddings, directorio, metrica=FAISS_METRIC):
+    """vectors.npy: los vectores exactos (float32, ya normalizados con "ip") en el orden del índice."""
+    with escritura_atomica(os.path.join(directorio, "vectors.npy")) as ruta:
+        np.save(ruta, preparar_embeddings(embeddings, metrica))
+
+
+def calcular_centroides(embeddings, k=ROUTER_CENTROIDES, seed=0):
+    """
+    Hasta ``k`` centroides k-means (esféricos, norma 1) de los embeddings de un código.
+
+    El backend los usa para enrutar una pregunta a los códigos más parecidos por coseno,
+    independientemente de la métrica del índice.
+    """
+    vectores = preparar_embeddings(embeddings, "ip")
+    k = max(1, min(k, len(vectores) // 39))
+    if k == 1:
+        centroides = vectores.mean(axis=0, keepdims=True)
+    else:
+        kmeans = faiss.Kmeans(vectores.shape[1], k, niter=20, seed=seed, spherical=True)
+        kmeans.train(vectores)
+        centroides = kmeans.centroids
+    return preparar_embeddings(centroides, "ip")
+
+
+def guardar_centroides(embeddings, directorio, k=ROUTER_CENTROIDES):
+    np.save(os.path.join(directorio, "centroids.npy"), calcular_centroides(embeddings, k))
+
+
+def escribir_manifest(directorio, index, tipo, metrica=FAISS_METRIC, modelo=EMBEDDING_MODEL, **extra):
+    """Guarda manifest.json junto a index.faiss con lo necesario para no mezclar índices incompatibles.
+
+    ``extra`` añade campos informativos (p. ej. ``pdf_sha256`` para la reconstrucción incremental).
+    ``build_id`` cambia en cada escritura: _global/codes.json guarda el de cada código que fusionó y el
+    backend lo compara para no servir vectores globales de una versión anterior del código.
+    """
+    manifest = {
+        "format_version": FORMATO_VERSION,
+        "model": modelo,
+        "dim": index.d,
+        "metric": metrica,
+        "normalized": metrica == "ip",
+        "index_type": tipo,
+        "count": index.ntotal,
+        "build_id": uuid.uuid4().hex,
+        **extra,
+    }
+    with escritura_atomica(os.path.join(directorio, "manifest.json")) as ruta, open(ruta, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def leer_manifest(directorio):
+    ruta = os.path.join(directorio, "manifest.json")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def escribir_marca_construccion(faiss_dir):
+    """Escribe ``faiss_dir/build.json`` al terminar una construcción, con el ``build_id`` de cada código.
+
+    Debe ser lo último que se escribe: hasta entonces el backend sigue con el snapshot anterior.
+    """
+    codigos = {}
+    for nombre in sorted(os.listdir(faiss_dir)):
+        manifest = leer_manifest(os.path.join(faiss_dir, nombre)) if os.path.isdir(os.path.join(faiss_dir, nombre)) else None
+        if manifest is not None:
+            codigos[nombre] = manifest.get("build_id")
+    marca = {"build_id": uuid.uuid4().hex, "finished_at": time.time(), "codes": codigos}
+    with escritura_atomica(os.path.join(faiss_dir, MARCA_CONSTRUCCION)) as ruta, open(ruta, "w", encoding="utf-8") as f:
+        json.dump(marca, f, ensure_ascii=False, indent=2)
+    return marca
@@ -1,5 +1,6 @@
 import os
-import re
+
+from segmentador import normalizar_cabeceras
 
 TXT_DIR = "Dataset/TXT"
 
@@ -8,13 +9,16 @@ for archivo in os.listdir(TXT_DIR):
         continue
 
     ruta = os.path.join(TXT_DIR, archivo)
-    with open(ruta, "r", encoding="utf-8") as f:
-        texto = f.read()
-
-    texto = re.sub(r"\n{2,}", "\n", texto)
-    texto = re.sub(r"ART[IÍ]CULO", "Artículo", texto, flags=re.I)
+    tmp = ruta + ".tmp"
 
-    with open(ruta, "w", encoding="utf-8") as f:
-        f.write(texto)
+    # Línea a línea a un temporal: elimina líneas vacías repetidas y normaliza "ARTÍCULO" -> "Artículo".
+    with open(ruta, "r", encoding="utf-8") as f, open(tmp, "w", encoding="utf-8") as salida:
+        salto_previo = False
+        for linea in f:
+            if linea == "\n" and salto_previo:
+                continue
+            salida.write(normalizar_cabeceras(linea))
+            salto_previo = linea.endswith("\n")
 
+    os.replace(tmp, ruta)
     print(f" Limpio: {archivo}")
@@ -0,0 +1,83 @@
+"""
+Segmentador de artículos en streaming, compartido por build_knowledge_base.py y separar_codigos.py.
+
+Lee el texto por bloques y emite cada artículo en cuanto encuentra la cabecera del siguiente,
+así la memoria depende del tamaño del artículo más largo y no del código completo.
+
+Cabeceras reconocidas (todas normalizadas al número canónico "12" o "12A"):
+    Artículo 12.   ARTÍCULO 12.   Artículo 12-A.   Artículo 12A.   Artículo 12 A.-   Artículo 12º.
+Las referencias dentro del texto ("el Artículo 12 de la Ley...") no cuentan como cabecera
+porque no van seguidas de punto o dos puntos.
+"""
+import re
+
+CABECERA = re.compile(
+    r"(?:Art[ií]culo|ART[IÍ]CULO)\s+(\d+)"
+    r"(?:\s?-?\s?([A-Z])(?![A-Za-zÁÉÍÓÚÑáéíóúñ]))?"
+    r"\s*[º°]?\s*[.:]-?"
+)
+ARTICULO_MAYUSCULAS = re.compile(r"ART[IÍ]CULO", re.I)
+
+TAM_BLOQUE = 1 << 16
+# Longitud máxima razonable de una cabecera: lo que se deja sin analizar al final de cada bloque
+# por si la cabecera quedó partida entre dos lecturas.
+MARGEN = 256
+
+
+def numero_canonico(match):
+    numero, letra = match.group(1), match.group(2)
+    return f"{int(numero)}{letra or ''}"
+
+
+def normalizar_cabeceras(texto):
+    """ARTICULO / ARTÍCULO / artículo -> Artículo (lo que antes hacía limpiar_texto.py)."""
+    return ARTICULO_MAYUSCULAS.sub("Artículo", texto)
+
+
+def segmentar(fuente, tam_bloque=TAM_BLOQUE):
+    """
+    Genera ``(numero, cuerpo)`` por cada artículo de ``fuente`` (un fichero de texto abierto
+    o cualquier objeto con ``read(n)``). ``numero`` es la forma canónica ("12", "12A") y
+    ``cuerpo`` el texto entre esta cabecera y la siguiente, sin recortar.
+    """
+    buffer = ""
+    inicio = 0  # donde empieza, dentro de buffer, el cuerpo del artículo actual
+    actual = None
+    pos = 0
+    while True:
+        bloque = fuente.read(tam_bloque)
+        fin = not bloque
+        # Se descarta lo ya emitido una sola vez por bloque (no por artículo).
+        buffer = buffer[inicio:] + bloque
+        pos -= inicio
+        inicio = 0
+        # Sin llegar al final, una cabecera pegada al borde podría continuar en el bloque siguiente.
+        corte = len(buffer) if fin else len(buffer) - MARGEN
+
+        for m in CABECERA.finditer(buffer, pos):
+            if m.end() > corte:
+                break
+            if actual is not None:
+                yield actual, buffer[inicio : m.start()]
+            actual = numero_canonico(m)
+            inicio = m.end()
+
+        if fin:
+            if actual is not None:
+                yield actual, buffer[inicio:]
+            return
+        if actual is None:
+            # Preámbulo antes del primer artículo: no hace falta conservarlo, salvo la zona en la
+            # que puede empezar una cabecera aplazada por el ``m.end() > corte`` de arriba.
+            inicio = max(0, len(buffer) - 2 * MARGEN)
+        pos = max(inicio, len(buffer) - 2 * MARGEN)
+
+
+def articulos(fuente, colapsar_espacios=False, tam_bloque=TAM_BLOQUE):
+    """
+    Genera ``(numero, texto)`` con el texto ya con cabecera canónica: "Artículo 12A. cuerpo".
+    Con ``colapsar_espacios`` cualquier secuencia de espacios/saltos queda en un solo espacio.
+    """
+    for numero, cuerpo in segmentar(fuente, tam_bloque):
+        cuerpo = " ".join(cuerpo.split()) if colapsar_espacios else cuerpo.strip()
+        yield numero, f"Artículo {numero}. {cuerpo}"
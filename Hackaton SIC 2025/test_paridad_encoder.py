@@ -0,0 +1,103 @@
+"""
+Paridad del encoder cuantizado/ONNX frente al SentenceTransformer de referencia (torch).
+
+Codifica artículos al azar y las preguntas de data/preguntas_router.json con ambos runtimes,
+compara coseno fila a fila y cuánto coinciden los top-k de cada pregunta sobre esos artículos.
+Sale con código 1 si la paridad no alcanza los umbrales.
+
+    python test_paridad_encoder.py --backend int8
+    python test_paridad_encoder.py --backend onnx --fp32
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+from config import BASE_DIR, EMBEDDING_MODEL, EMBEDDING_ONNX_DIR, FAISS_DIR
+
+sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+from encoders import OnnxEncoder, load_encoder  # noqa: E402
+
+PREGUNTAS = os.path.join(BASE_DIR, "data/preguntas_router.json")
+
+
+def cargar_muestra(n, seed):
+    textos = []
+    for ruta in sorted(glob.glob(os.path.join(FAISS_DIR, "*", "docs.json"))):
+        with open(ruta, "r", encoding="utf-8") as f:
+            textos.extend(doc["texto"] for doc in json.load(f))
+    rng = np.random.default_rng(seed)
+    articulos = [textos[i] for i in rng.choice(len(textos), size=min(n, len(textos)), replace=False)]
+    with open(PREGUNTAS, "r", encoding="utf-8") as f:
+        preguntas = [p["pregunta"] for p in json.load(f)]
+    return articulos, preguntas
+
+
+def cosenos(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def solapamiento_top_k(consultas_ref, consultas_cand, corpus_ref, corpus_cand, k):
+    """Fracción media del top-k (L2, como los índices) que se conserva con el encoder candidato."""
+
+    def top_k(q, c):
+        distancias = ((q[:, None, :] - c[None, :, :]) ** 2).sum(axis=2)
+        return np.argsort(distancias, axis=1)[:, :k]
+
+    ref, cand = top_k(consultas_ref, corpus_ref), top_k(consultas_cand, corpus_cand)
+    return float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref, cand)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("int8", "onnx"), default="int8")
+    parser.add_argument("--fp32", action="store_true", help="con onnx, usar model.onnx en vez de model_int8.onnx")
+    parser.add_argument("--onnx-dir", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--articulos", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--umbral-media", type=float, default=0.99, help="coseno medio mínimo")
+    parser.add_argument("--umbral-min", type=float, default=0.95, help="coseno mínimo de cualquier texto")
+    parser.add_argument("--umbral-top-k", type=float, default=0.9, help="solapamiento medio mínimo del top-k")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    articulos, preguntas = cargar_muestra(args.articulos, args.seed)
+    referencia = load_encoder(EMBEDDING_MODEL, "torch")
+    if args.backend == "onnx":
+        candidato = OnnxEncoder(args.onnx_dir, quantized=not args.fp32)
+        nombre = f"onnx ({candidato.onnx_file})"
+    else:
+        candidato = load_encoder(EMBEDDING_MODEL, "int8")
+        nombre = "int8 (torch dinámico)"
+
+    corpus_ref = np.asarray(referencia.encode(articulos), dtype="float32")
+    corpus_cand = np.asarray(candidato.encode(articulos), dtype="float32")
+    consultas_ref = np.asarray(referencia.encode(preguntas), dtype="float32")
+    consultas_cand = np.asarray(candidato.encode(preguntas), dtype="float32")
+
+    c = cosenos(np.vstack([corpus_ref, consultas_ref]), np.vstack([corpus_cand, consultas_cand]))
+    solape = solapamiento_top_k(consultas_ref, consultas_cand, corpus_ref, corpus_cand, args.k)
+    print(f"🔬 {nombre} frente a torch: {len(articulos)} artículos + {len(preguntas)} preguntas")
+    print(f"   coseno medio {c.mean():.5f} | p1 {np.percentile(c, 1):.5f} | mínimo {c.min():.5f}")
+    print(f"   top-{args.k} conservado: {solape:.1%}")
+
+    fallos = []
+    if c.mean() < args.umbral_media:
+        fallos.append(f"coseno medio {c.mean():.4f} < {args.umbral_media}")
+    if c.min() < args.umbral_min:
+        fallos.append(f"coseno mínimo {c.min():.4f} < {args.umbral_min}")
+    if solape < args.umbral_top_k:
+        fallos.append(f"top-{args.k} conservado {solape:.3f} < {args.umbral_top_k}")
+    if fallos:
+        print("❌ Paridad insuficiente: " + "; ".join(fallos))
+        sys.exit(1)
+    print("✅ Paridad OK")
+
+
+if __name__ == "__main__":
+    main()
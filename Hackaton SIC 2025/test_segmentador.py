@@ -0,0 +1,47 @@
+"""
+Pruebas del segmentador en streaming (segmentador.py).
+
+Desliza la cabecera del primer artículo por los bordes de bloque: con un bloque pequeño cada
+posición del preámbulo cae en algún momento sobre el ``MARGEN`` que se deja sin analizar.
+
+    python test_segmentador.py
+    python -m pytest test_segmentador.py
+"""
+import io
+
+from segmentador import MARGEN, TAM_BLOQUE, segmentar
+
+CUERPO = " texto del artículo" * 40
+
+
+def numeros(texto, tam_bloque=TAM_BLOQUE):
+    return [numero for numero, _ in segmentar(io.StringIO(texto), tam_bloque)]
+
+
+def test_cabecera_en_el_borde_del_primer_bloque():
+    # Preámbulo que deja "Artículo 1." a caballo del corte del primer bloque de 64 KB
+    texto = "x" * (TAM_BLOQUE - MARGEN - 10) + "Artículo 1." + CUERPO + "Artículo 2." + CUERPO
+    assert numeros(texto) == ["1", "2"]
+
+
+def test_cabecera_deslizada_por_los_bordes():
+    tam_bloque = 300
+    for cabecera in ("Artículo 1.", "ARTÍCULO 1.-", "Artículo 1 A.-"):
+        esperado = ["1A" if "A." in cabecera else "1", "2"]
+        for preambulo in range(3 * tam_bloque):
+            texto = "x" * preambulo + cabecera + CUERPO + "Artículo 2." + CUERPO
+            assert numeros(texto, tam_bloque) == esperado, (cabecera, preambulo)
+
+
+def test_cuerpos_completos_entre_bloques():
+    articulos = [(str(n), f" cuerpo {n}" * (n * 7)) for n in range(1, 30)]
+    texto = "Preámbulo. " + "".join(f"Artículo {n}.{cuerpo}" for n, cuerpo in articulos)
+    for tam_bloque in (300, 1000, TAM_BLOQUE):
+        assert list(segmentar(io.StringIO(texto), tam_bloque)) == articulos
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_"):
+            prueba()
+            print(f"ok  {nombre}")